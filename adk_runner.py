@@ -0,0 +1,75 @@
+from typing import Any, Dict, List, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+# Small helpers for running an ADK agent on one message outside `adk run` / `adk web`.
+
+APP_NAME = "agentic_patterns"
+
+
+def user_message(text: str) -> types.Content:
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def event_text(event) -> str:
+    parts = getattr(event.content, "parts", None) or []
+    return "".join(part.text for part in parts if getattr(part, "text", None))
+
+
+def make_runner(agent: BaseAgent, session_service=None, app_name: str = APP_NAME) -> Runner:
+    return Runner(app_name=app_name, agent=agent, session_service=session_service or InMemorySessionService())
+
+
+async def run_agent(agent: BaseAgent, text: str, runner: Optional[Runner] = None, user_id: str = "user",
+                    session_id: Optional[str] = None, state: Optional[Dict[str, Any]] = None) -> dict:
+    """
+    Sends `text` to `agent` and runs it to completion. A new session (seeded with
+    `state`) is created unless session_id names an existing one in the runner's
+    session service. Returns {"text", "state", "session_id", "events"}, where text
+    is the last final response.
+    """
+    runner = runner or make_runner(agent)
+    service = runner.session_service
+    if session_id is None:
+        session = await service.create_session(app_name=runner.app_name, user_id=user_id, state=state or {})
+        session_id = session.id
+    events: List = []
+    text_out = ""
+    async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=user_message(text)):
+        events.append(event)
+        if event.is_final_response() and event_text(event):
+            text_out = event_text(event)
+    session = await service.get_session(app_name=runner.app_name, user_id=user_id, session_id=session_id)
+    return {"text": text_out, "state": dict(session.state), "session_id": session_id, "events": events}
+
+
+async def continue_session(agent: BaseAgent, runner: Runner, session_id: str, user_id: str = "user",
+                           invocation_id: Optional[str] = None, user_content: Optional[types.Content] = None) -> dict:
+    """
+    Runs `agent` (the runner's root or one of its sub-agents) on an existing session
+    without a new user message, the way a SequentialAgent runs its next sub-agent:
+    the agent sees the session's events and state as they are, and its own events
+    are appended to the session. invocation_id and user_content continue an earlier
+    run's invocation. Returns the same dict as run_agent, plus "invocation_id".
+    """
+    service = runner.session_service
+    session = await service.get_session(app_name=runner.app_name, user_id=user_id, session_id=session_id)
+    if session is None:
+        raise ValueError(f"unknown session: {session_id}")
+    # Runner's documented extension point for building contexts; run_async insists on a new message.
+    ctx = runner._new_invocation_context(session, invocation_id=invocation_id, new_message=user_content)
+    events: List = []
+    text_out = ""
+    async for event in agent.run_async(ctx):
+        if not event.partial:
+            await service.append_event(session=session, event=event)
+        events.append(event)
+        if event.is_final_response() and event_text(event):
+            text_out = event_text(event)
+    session = await service.get_session(app_name=runner.app_name, user_id=user_id, session_id=session_id)
+    return {"text": text_out, "state": dict(session.state), "session_id": session_id,
+            "invocation_id": ctx.invocation_id, "events": events}
+
@@ -0,0 +1,63 @@
+"""
+Importable entry point for the agentic design patterns in this repository.
+
+Each pattern stays a top-level script (`python routing.py` still works). This
+package names the patterns and imports each one the first time it is used, so
+`import agentic_patterns` loads nothing beyond the standard library:
+
+    import agentic_patterns
+    agent = agentic_patterns.routing.build_coordinator_agent(...)
+    agentic_patterns.load("reflection").run_reflection_loop()
+
+The pattern modules also create their model clients on first use (see lazy.py).
+Importing one makes no client, reads no API key and calls no API.
+
+Command line:
+
+    python -m agentic_patterns --list
+    python -m agentic_patterns routing --input requests.jsonl
+"""
+import importlib
+from types import ModuleType
+from typing import Dict, List, NamedTuple
+
+
+class Pattern(NamedTuple):
+    module: str
+    description: str
+    cli: bool = True  # has a __main__ block that `python -m agentic_patterns <name>` can run
+
+
+PATTERNS: Dict[str, Pattern] = {
+    "prompt_chaining": Pattern("prompt_chaining", "extract -> transform chain, packed batch mode"),
+    "routing": Pattern("routing", "hybrid local/LLM router with a checkpointed batch runner"),
+    "parallelisation": Pattern("parallelisation", "parallel branches + streamed synthesis"),
+    "reflection": Pattern("reflection", "generate -> critique -> refine loop, best-of-N"),
+    "reflection_adk": Pattern("reflection_using_google_adk", "ADK draft writer + fact checker pipeline"),
+    "tool_calling": Pattern("tool_calling", "tool-calling agent over the knowledge store"),
+    "goal_setting": Pattern("goal_setting_and_monitoring", "code agent that iterates until its goals are met"),
+    "exception_handling": Pattern("exception_handling_and_recovery", "ADK agent with retries, breakers and fallbacks",
+                                  cli=False),
+    "context_retrieval": Pattern("context_retrieval", "embed and bulk-insert chunks into the vector store"),
+    "hybrid_retrieval": Pattern("hybrid_retrieval", "BM25 + vector search with rank fusion"),
+    "doc_parser": Pattern("tensorlake_doc_parser", "parse papers into RAG chunks and structured data"),
+}
+
+
+def load(name: str) -> ModuleType:
+    """Imports (once) and returns the module implementing the named pattern."""
+    try:
+        pattern = PATTERNS[name]
+    except KeyError:
+        raise KeyError(f"unknown pattern {name!r}; choose from {', '.join(PATTERNS)}") from None
+    return importlib.import_module(pattern.module)
+
+
+def __getattr__(name: str) -> ModuleType:
+    if name in PATTERNS:
+        return load(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted([*globals(), *PATTERNS])
@@ -0,0 +1,34 @@
+import sys
+import runpy
+import argparse
+from typing import List, Optional
+
+from agentic_patterns import PATTERNS
+
+# python -m agentic_patterns <pattern> [pattern args...]
+# Runs the pattern's script as __main__ with the remaining arguments, exactly as
+# `python <module>.py [args...]` would.
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m agentic_patterns",
+                                     description="Run one of the agentic design patterns.")
+    parser.add_argument("--list", action="store_true", help="list the patterns and exit")
+    parser.add_argument("pattern", nargs="?", choices=sorted(name for name, p in PATTERNS.items() if p.cli))
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="arguments passed on to the pattern")
+    args = parser.parse_args(argv)
+
+    if args.list or not args.pattern:
+        width = max(map(len, PATTERNS))
+        for name, pattern in PATTERNS.items():
+            note = "" if pattern.cli else "  (library only)"
+            print(f"{name:<{width}}  {pattern.description}{note}")
+        return
+
+    module = PATTERNS[args.pattern].module
+    sys.argv = [f"{module}.py", *args.args]
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+if __name__ == "__main__":
+    main()
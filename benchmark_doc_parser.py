@@ -0,0 +1,83 @@
+import os
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+from fake_document_ai import FakeDocumentAI
+from metrics import percentile
+from tensorlake_doc_parser import parse_document, parse_documents
+
+# Sequential parse_document (upload, parse, blocking wait per file) against batch
+# parse_documents on FakeDocumentAI with random upload and parse latencies.
+# Reports wall-clock time, time to the first finished document, and poll calls.
+
+
+def make_documents(directory: str, n: int):
+    paths = []
+    for i in range(n):
+        path = os.path.join(directory, f"paper_{i:05d}.pdf")
+        with open(path, "wb") as f:
+            f.write(f"%PDF-1.7 fake paper {i}\n".encode() * 64)
+        paths.append(path)
+    return paths
+
+
+def fake_doc_ai(args) -> FakeDocumentAI:
+    return FakeDocumentAI(upload_latency=(args.upload_min, args.upload_max),
+                          parse_latency=(args.parse_min, args.parse_max), seed=args.seed)
+
+
+def run_sequential(paths, args) -> dict:
+    doc_ai = fake_doc_ai(args)
+    start = time.perf_counter()
+    finished = []
+    for path in paths:
+        parse_document(path, doc_ai=doc_ai)
+        finished.append(time.perf_counter() - start)
+    return {"total_s": finished[-1], "first_s": finished[0], "p50_done_s": percentile(finished, 50),
+            "polls": doc_ai.calls["get_parsed_result"], "peak_uploads": 1}
+
+
+async def run_batch(paths, args) -> dict:
+    doc_ai = fake_doc_ai(args)
+    start = time.perf_counter()
+    finished = []
+    async for parsed in parse_documents(paths, doc_ai=doc_ai, upload_concurrency=args.upload_concurrency,
+                                        max_outstanding=args.max_outstanding, poll_interval=args.poll_interval):
+        assert "error" not in parsed, parsed
+        finished.append(time.perf_counter() - start)
+    return {"total_s": finished[-1], "first_s": finished[0], "p50_done_s": percentile(finished, 50),
+            "polls": doc_ai.calls["get_parsed_result"], "peak_uploads": doc_ai.peak_uploads_in_flight}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batch document parsing against the sequential loop.")
+    parser.add_argument("--n", type=int, default=40, help="number of documents")
+    parser.add_argument("--upload-min", type=float, default=0.02)
+    parser.add_argument("--upload-max", type=float, default=0.2)
+    parser.add_argument("--parse-min", type=float, default=0.2)
+    parser.add_argument("--parse-max", type=float, default=1.5)
+    parser.add_argument("--upload-concurrency", type=int, default=8)
+    parser.add_argument("--max-outstanding", type=int, default=64)
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="doc_parser_bench_")
+    try:
+        paths = make_documents(workdir, args.n)
+        rows = []
+        if not args.skip_sequential:
+            rows.append(("sequential", run_sequential(paths, args)))
+        rows.append(("batch", asyncio.run(run_batch(paths, args))))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.n} documents, upload {args.upload_min}-{args.upload_max}s, parse {args.parse_min}-{args.parse_max}s")
+    print(f"{'mode':<12} {'total s':>8} {'first s':>8} {'p50 done s':>11} {'docs/s':>7} {'polls':>6} {'peak uploads':>13}")
+    for name, r in rows:
+        print(f"{name:<12} {r['total_s']:>8.2f} {r['first_s']:>8.2f} {r['p50_done_s']:>11.2f} "
+              f"{args.n / r['total_s']:>7.1f} {r['polls']:>6} {r['peak_uploads']:>13}")
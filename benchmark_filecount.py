@@ -0,0 +1,115 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+from filecount_5877 import TreeCounter
+
+# Synthetic deep tree: os.walk vs the parallel scandir counter, cold and
+# incremental. --latency-ms adds a sleep to every directory listing (os.scandir,
+# which os.walk uses as well) to stand in for a network filesystem round trip.
+# Stat calls are not slowed down. With 0 the tree is read from the local page
+# cache, where listings are so cheap that the pool only breaks even with os.walk.
+
+
+def build_tree(root: str, depth: int, fanout: int, files_per_dir: int) -> int:
+    """Creates fanout**level directories per level with files_per_dir empty files each; returns the file count."""
+    total = 0
+    level = [root]
+    for d in range(depth + 1):
+        next_level = []
+        for path in level:
+            for i in range(files_per_dir):
+                open(os.path.join(path, f"f{i}.txt"), "w").close()
+            total += files_per_dir
+            if d < depth:
+                for i in range(fanout):
+                    child = os.path.join(path, f"d{i}")
+                    os.mkdir(child)
+                    next_level.append(child)
+        level = next_level
+    return total
+
+
+def walk_count(directory: str) -> int:
+    """The original single-threaded implementation."""
+    total_files = 0
+    for root, dirs, files in os.walk(directory):
+        total_files += len(files)
+    return total_files
+
+
+@contextlib.contextmanager
+def simulated_latency(ms: float):
+    if not ms:
+        yield
+        return
+    real_scandir = os.scandir
+
+    def slow_scandir(path="."):
+        time.sleep(ms / 1000)
+        return real_scandir(path)
+
+    os.scandir = slow_scandir
+    try:
+        yield
+    finally:
+        os.scandir = real_scandir
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark os.walk against the parallel scandir counter.")
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--files-per-dir", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="simulated per-listing latency")
+    parser.add_argument("--dir", help="build the tree here instead of a temporary directory")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="filecount-", dir=args.dir)
+    try:
+        expected, build_s = timed(lambda: build_tree(root, args.depth, args.fanout, args.files_per_dir))
+        dirs = sum(args.fanout ** d for d in range(args.depth + 1))
+        print(f"tree: {dirs} directories, {expected} files (built in {build_s:.1f}s), "
+              f"latency {args.latency_ms} ms per listing")
+        print(f"{'method':<28} {'files':>9} {'seconds':>8} {'speedup':>8}")
+
+        with simulated_latency(args.latency_ms):
+            count, baseline_s = timed(lambda: walk_count(root))
+            print(f"{'os.walk':<28} {count:>9} {baseline_s:>8.2f} {1:>7.1f}x")
+            assert count == expected, (count, expected)
+
+            for workers in args.workers:
+                stats = TreeCounter(workers).count(root)
+                assert stats["files"] == expected, (stats, expected)
+                print(f"{f'scandir, {workers} workers':<28} {stats['files']:>9} {stats['seconds']:>8.2f} "
+                      f"{baseline_s / stats['seconds']:>7.1f}x")
+
+            # Incremental: back-date the tree so no directory is "racy", then a cold run
+            # fills the cache and a warm run reuses it; one new file invalidates one directory.
+            old = time.time() - 3600
+            for path, _, _ in os.walk(root):
+                os.utime(path, (old, old))
+            cache_path = os.path.join(root, ".filecount-cache.json")
+            counter = TreeCounter(max(args.workers), cache_path=cache_path, exclude=[".filecount-cache.json*"])
+            for label in ("incremental, cold", "incremental, warm"):
+                stats = counter.count(root)
+                assert stats["files"] == expected, (stats, expected)
+                print(f"{label:<28} {stats['files']:>9} {stats['seconds']:>8.2f} "
+                      f"{baseline_s / stats['seconds']:>7.1f}x  ({stats['cached_dirs']} cached dirs)")
+            open(os.path.join(root, "d0", "new.txt"), "w").close()
+            stats = counter.count(root)
+            assert stats["files"] == expected + 1, (stats, expected)
+            print(f"{'incremental, 1 dir changed':<28} {stats['files']:>9} {stats['seconds']:>8.2f} "
+                  f"{baseline_s / stats['seconds']:>7.1f}x  ({stats['cached_dirs']} cached dirs)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
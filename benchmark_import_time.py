@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import List
+
+from agentic_patterns import PATTERNS
+
+# Cold import time of each pattern module. Every sample is a fresh interpreter
+# (no module cache, bytecode already compiled) with the API keys removed from the
+# environment, so a module that builds a client, reads a key or calls an API at
+# import shows up as slow or failing. --max-s turns the report into a gate that
+# exits non-zero when any module is over budget.
+
+_PROBE = """
+import io, sys, json, time, contextlib
+out = io.StringIO()
+start = time.perf_counter()
+with contextlib.redirect_stdout(out):
+    import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start, "modules": len(sys.modules),
+                  "printed_lines": len(out.getvalue().splitlines()),
+                  "providers": sorted(m for m in ("langchain_openai", "langchain_google_genai", "langchain.agents",
+                                                  "sympy", "pymilvus") if m in sys.modules)}}))
+"""
+
+SCRUBBED_ENV = ("OPENAI_API_KEY", "GOOGLE_API_KEY", "TENSORLAKE_API_KEY", "LLM_CACHE_PATH", "TRACE_PATH")
+
+
+def measure(module: str, repeats: int) -> dict:
+    env = {k: v for k, v in os.environ.items() if k not in SCRUBBED_ENV}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                      env.get("PYTHONPATH")]))
+    samples: List[dict] = []
+    for _ in range(repeats):
+        proc = subprocess.run([sys.executable, "-W", "ignore", "-c", _PROBE.format(module=module)],
+                              capture_output=True, text=True, env=env)
+        if proc.returncode != 0:
+            error = (proc.stderr.strip().splitlines() or [f"exit code {proc.returncode}"])[-1]
+            return {"module": module, "error": error}
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {"module": module, "seconds": statistics.median(s["seconds"] for s in samples),
+            "modules": samples[-1]["modules"], "printed_lines": samples[-1]["printed_lines"],
+            "providers": samples[-1]["providers"]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold import time of the pattern modules.")
+    parser.add_argument("patterns", nargs="*", help="pattern names (default: all)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-s", type=float, help="fail when any import takes longer than this")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    names = args.patterns or ["agentic_patterns"] + list(PATTERNS)
+    modules = [PATTERNS[n].module if n in PATTERNS else n for n in names]
+    results = [measure(module, args.repeats) for module in modules]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'module':<34} {'import s':>8} {'modules':>7} {'printed':>7}  heavy imports")
+        for r in results:
+            if "error" in r:
+                print(f"{r['module']:<34} {'-':>8} {'-':>7} {'-':>7}  failed: {r['error']}")
+            else:
+                print(f"{r['module']:<34} {r['seconds']:>8.3f} {r['modules']:>7} {r['printed_lines']:>7}  "
+                      f"{', '.join(r['providers']) or '-'}")
+
+    # A missing third-party package is an environment problem, not an import-time regression.
+    failed = [r["module"] for r in results if "error" in r and not r["error"].startswith("ModuleNotFoundError")]
+    if args.max_s is not None:
+        failed += [r["module"] for r in results if "error" not in r and r["seconds"] > args.max_s]
+    if failed:
+        print(f"\nover budget or failing: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
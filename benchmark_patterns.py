@@ -0,0 +1,270 @@
+import os
+import io
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
+
+from fake_models import FakeChatModel
+from metrics import percentile
+
+# Offline load test for the LangChain patterns. Each pattern is rebuilt on
+# FakeChatModel (simulated time to first token, token rate and failure rate), then
+# driven with a fixed number of requests at increasing concurrency. Reports
+# throughput, latency percentiles, LLM calls and tokens per request, and saves
+# the run under benchmark_results/ keyed by git commit so a later run can be
+# compared against it with --compare. The fakes are assigned before any pattern
+# builds its own client, so no API key or network access is needed.
+
+RESULTS_DIR = "benchmark_results"
+
+ROUTING_REQUESTS = ["Book me a flight to London", "What is the capital of Italy?", "Maybe later",
+                    "Can you sort out a hotel near the venue?", "hmm", "Tell me about the Eiffel tower"]
+SPEC_TEXT = "The new laptop has a 3.5 GHz octa-core processor, 16GB of RAM and a 1TB NVMe SSD."
+TOPICS = ["The history of space exploration", "Renewable energy storage", "Coral reef ecology"]
+QUESTIONS = ["What is the capital of france?", "weather in london?", "Tell me something about india"]
+GOALS = ["Code simple to understand", "Functionally correct", "Handles edge cases"]
+
+
+# --- Responders: what the fake model "says" for each pattern ---
+
+def _last_text(messages) -> str:
+    return str(messages[-1].content) if messages else ""
+
+
+def routing_responder(messages, tools):
+    text = _last_text(messages).lower()
+    if "book" in text or "hotel" in text or "flight" in text:
+        return "booker"
+    return "unclear" if len(text.split()) < 3 else "info"
+
+
+def reflection_responder(seed: int):
+    rng = random.Random(seed)
+
+    def respond(messages, tools):
+        if isinstance(messages[0], SystemMessage) and "CODE_IS_PERFECT" in str(messages[0].content):
+            return "CODE_IS_PERFECT" if rng.random() < 0.4 else "- Missing type hints\n- No test for n=0"
+        return "```python\ndef calculate_factorial(n):\n    return 1 if n == 0 else n * calculate_factorial(n - 1)\n```"
+    return respond
+
+
+def tool_calling_responder(messages, tools):
+    if tools and not any(isinstance(m, ToolMessage) for m in messages):
+        query = _last_text(messages)
+        return AIMessage(content="", tool_calls=[{"name": "search_information", "args": {"query": query},
+                                                  "id": f"call_{abs(hash(query)) % 10**8}"}])
+    return f"Here is what I found: {_last_text(messages)[:80]}"
+
+
+def goal_review_responder(seed: int):
+    rng = random.Random(seed)
+
+    def respond(messages, tools):
+        if not tools:
+            return "```python\ndef binary_gap(n):\n    return max(map(len, bin(n)[2:].strip('0').split('1')))\n```"
+        goals = re.findall(r"^\s*- (.+)$", _last_text(messages), re.MULTILINE)
+        met = rng.random() < 0.5
+        review = {"goals": [{"goal": g, "met": met, "reason": "checked"} for g in goals],
+                  "critique": "Looks reasonable.", "goals_met": met}
+        return AIMessage(content="", tool_calls=[{"name": tools[0]["function"]["name"], "args": review,
+                                                  "id": "call_review"}])
+    return respond
+
+
+# --- Patterns: each returns (the fake models, an async call for request i) ---
+
+Pattern = Tuple[List[FakeChatModel], Callable[[int], Awaitable]]
+
+
+def _fake(responder, **model_kwargs) -> FakeChatModel:
+    return FakeChatModel(responder=responder, cache=False, **model_kwargs)
+
+
+def _in_thread(pool: ThreadPoolExecutor, fn, *args):
+    return asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+
+def prompt_chaining_pattern(model_kwargs: dict, pool: ThreadPoolExecutor, seed: int) -> Pattern:
+    import prompt_chaining
+    fake = _fake(None, **model_kwargs)
+    chain = prompt_chaining.build_full_chain(fake)
+    return [fake], lambda i: chain.ainvoke({"text_input": SPEC_TEXT})
+
+
+def routing_pattern(model_kwargs: dict, pool: ThreadPoolExecutor, seed: int) -> Pattern:
+    import routing
+    from local_router import LocalRouter, RoutingMetrics
+    fake = _fake(routing_responder, **model_kwargs)
+    hybrid = routing.build_hybrid_router(routing.build_router_chain(fake), LocalRouter.load(), RoutingMetrics())
+    agent = routing.build_coordinator_agent(hybrid)
+    return [fake], lambda i: agent.ainvoke({"request": ROUTING_REQUESTS[i % len(ROUTING_REQUESTS)]})
+
+
+def parallelisation_pattern(model_kwargs: dict, pool: ThreadPoolExecutor, seed: int) -> Pattern:
+    import parallelisation
+    fake = _fake(None, **model_kwargs)
+    chain = parallelisation.build_parallel_chain(fake)
+    return [fake], lambda i: chain.ainvoke(TOPICS[i % len(TOPICS)])
+
+
+def tool_calling_pattern(model_kwargs: dict, pool: ThreadPoolExecutor, seed: int) -> Pattern:
+    import tool_calling
+    fake = _fake(tool_calling_responder, **model_kwargs)
+    executor = tool_calling.build_agent_executor(fake, verbose=False)
+    return [fake], lambda i: executor.ainvoke({"input": QUESTIONS[i % len(QUESTIONS)]})
+
+
+def reflection_pattern(model_kwargs: dict, pool: ThreadPoolExecutor, seed: int) -> Pattern:
+    import reflection
+    fake = _fake(reflection_responder(seed), **model_kwargs)
+    reflection.llm = fake  # run_reflection_loop calls the module-level model
+    return [fake], lambda i: _in_thread(pool, reflection.run_reflection_loop)
+
+
+def reflection_best_of_3_pattern(model_kwargs: dict, pool: ThreadPoolExecutor, seed: int) -> Pattern:
+    import reflection
+    fake = _fake(reflection_responder(seed), **model_kwargs)
+    reflection.llm = fake
+    return [fake], lambda i: reflection.run_best_of_n(n=3)
+
+
+def goal_review_pattern(model_kwargs: dict, pool: ThreadPoolExecutor, seed: int) -> Pattern:
+    """One generate + structured review round of run_code_agent (the sandboxed run is left out)."""
+    import goal_setting_and_monitoring as goals
+    fake = _fake(goal_review_responder(seed), **model_kwargs)
+    goals.llm = fake
+
+    def round_trip(i: int):
+        code = goals.llm.invoke(goals.generate_prompt("Find the binary gap of a positive integer", GOALS)).content
+        if goals.review_code(goals.clean_code_block(code), GOALS) is None:
+            raise ValueError("structured review unusable")
+    return [fake], lambda i: _in_thread(pool, round_trip, i)
+
+
+PATTERNS: Dict[str, Callable[[dict, ThreadPoolExecutor, int], Pattern]] = {
+    "prompt_chaining": prompt_chaining_pattern,
+    "routing": routing_pattern,
+    "parallelisation": parallelisation_pattern,
+    "tool_calling": tool_calling_pattern,
+    "reflection": reflection_pattern,
+    "reflection_best_of_3": reflection_best_of_3_pattern,
+    "goal_review": goal_review_pattern,
+}
+
+
+# --- Driver ---
+
+async def drive(build, model_kwargs: dict, requests: int, concurrency: int, seed: int) -> dict:
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        fakes, call = build(model_kwargs, pool, seed)
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, errors = [], 0
+
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await call(i)
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        wall_s = time.perf_counter() - start
+
+    calls = sum(f.calls for f in fakes)
+    tokens = sum(f.input_tokens_total + f.output_tokens_total for f in fakes)
+    return {"concurrency": concurrency, "requests": requests, "wall_s": wall_s,
+            "throughput_rps": requests / wall_s, "p50_s": percentile(latencies, 50),
+            "p95_s": percentile(latencies, 95), "p99_s": percentile(latencies, 99),
+            "error_rate": errors / requests, "llm_calls_per_request": calls / requests,
+            "tokens_per_request": tokens / requests}
+
+
+def git_commit() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(run: dict, results_dir: str = RESULTS_DIR) -> str:
+    """Writes patterns-<commit>.json and appends the run to patterns.jsonl; returns the json path."""
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"patterns-{run['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2)
+    with open(os.path.join(results_dir, "patterns.jsonl"), "a") as f:
+        f.write(json.dumps(run) + "\n")
+    return path
+
+
+def print_results(run: dict, baseline: Optional[dict] = None) -> None:
+    base = {(r["pattern"], r["concurrency"]): r for r in (baseline or {}).get("results", [])}
+    header = f"{'pattern':<22} {'conc':>4} {'req/s':>7} {'p50 s':>6} {'p95 s':>6} {'p99 s':>6} " \
+             f"{'calls/req':>9} {'tok/req':>8} {'errors':>6}"
+    if baseline:
+        header += f" {'d req/s':>8} {'d p95':>7}"
+    print(header)
+    for r in run["results"]:
+        line = (f"{r['pattern']:<22} {r['concurrency']:>4} {r['throughput_rps']:>7.1f} {r['p50_s']:>6.2f} "
+                f"{r['p95_s']:>6.2f} {r['p99_s']:>6.2f} {r['llm_calls_per_request']:>9.2f} "
+                f"{r['tokens_per_request']:>8.0f} {r['error_rate']:>6.1%}")
+        old = base.get((r["pattern"], r["concurrency"]))
+        if old:
+            line += (f" {r['throughput_rps'] / old['throughput_rps'] - 1:>+8.1%}"
+                     f" {r['p95_s'] / old['p95_s'] - 1 if old['p95_s'] else 0:>+7.1%}")
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the agentic patterns against simulated models.")
+    parser.add_argument("--patterns", nargs="+", choices=sorted(PATTERNS), default=list(PATTERNS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=64, help="requests per pattern and concurrency level")
+    parser.add_argument("--latency", type=float, default=0.2, help="median time to first token, seconds")
+    parser.add_argument("--sigma", type=float, default=0.3, help="lognormal spread of time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=200.0)
+    parser.add_argument("--output-tokens", type=int, default=100)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", help="earlier results json (e.g. benchmark_results/patterns-<commit>.json)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    model_kwargs = {"latency_s": args.latency, "sigma": args.sigma, "tokens_per_s": args.tokens_per_s,
+                    "output_tokens": args.output_tokens, "failure_rate": args.failure_rate, "seed": args.seed}
+    run = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+           "params": {**model_kwargs, "requests": args.requests}, "results": []}
+    for name in args.patterns:
+        for concurrency in args.concurrency:
+            # The patterns print progress on every call; keep the report readable.
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = asyncio.run(drive(PATTERNS[name], model_kwargs, args.requests, concurrency, args.seed))
+            run["results"].append({"pattern": name, **result})
+            print(f"{name} @ {concurrency}: {result['throughput_rps']:.1f} req/s", file=sys.stderr)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"comparing {run['commit']} against {baseline['commit']} ({baseline['timestamp']})")
+    print_results(run, baseline)
+    if not args.no_save:
+        print(f"\nsaved to {save_results(run)}")
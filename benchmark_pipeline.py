@@ -0,0 +1,45 @@
+import time
+import asyncio
+import argparse
+
+from fake_adk_llm import StubLlm
+from pipeline_executor import run_one_by_one, run_pipelined
+from reflection_using_google_adk import build_review_pipeline
+
+# Offline comparison of running WriteAndReview_Pipeline once per subject against
+# the pipelined executor, with StubLlm models standing in for Gemini.
+
+
+def stub_pipeline(draft_s: float, review_s: float, jitter: float, seed: int):
+    return build_review_pipeline(
+        generator_model=StubLlm(model="stub-writer", latency_s=draft_s, jitter=jitter * draft_s, seed=seed,
+                                reply=lambda prompt: f"A short paragraph about {prompt}."),
+        reviewer_model=StubLlm(model="stub-checker", latency_s=review_s, jitter=jitter * review_s, seed=seed + 1,
+                               reply=lambda prompt: '{"status": "ACCURATE", "reasoning": "stub"}'))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pipelined vs one-by-one ADK pipeline runs.")
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--draft-s", type=float, default=0.2)
+    parser.add_argument("--review-s", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.3, help="latency jitter as a fraction of the mean")
+    parser.add_argument("--queue-size", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    subjects = [f"subject {i}" for i in range(args.items)]
+    start = time.monotonic()
+    baseline = asyncio.run(run_one_by_one(stub_pipeline(args.draft_s, args.review_s, args.jitter, args.seed), subjects))
+    baseline_s = time.monotonic() - start
+    assert all(r["state"].get("review_output") for r in baseline)
+    print(f"one by one: {args.items} items in {baseline_s:.2f}s")
+
+    for writers, checkers in ((1, 1), (1, 2), (2, 3)):
+        pipeline = stub_pipeline(args.draft_s, args.review_s, args.jitter, args.seed)
+        results, executor = asyncio.run(run_pipelined(
+            pipeline, subjects, workers={"DraftWriter": writers, "FactChecker": checkers}, queue_size=args.queue_size))
+        assert all(r["error"] is None and r["value"]["state"].get("review_output") for r in results)
+        print(f"\npipelined, {writers} writer(s) / {checkers} checker(s): "
+              f"{baseline_s / executor.wall_s:.1f}x faster than one by one")
+        print(executor.format_metrics())
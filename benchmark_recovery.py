@@ -0,0 +1,86 @@
+import time
+import random
+import asyncio
+import argparse
+
+from fake_models import FaultInjectingModel
+from metrics import percentile
+from recovery import CircuitBreaker, Fallback, FallbackChain, retry_async
+
+# Offline brownout drill for the recovery layer. The primary model is healthy,
+# then degraded (errors, hangs, slow answers), then healthy again; the fast model
+# stays healthy throughout. Compares calling the primary directly, retries alone,
+# and the full chain (retries + breaker, fast-model fallback, cached answer).
+
+PHASES = [("healthy", 0.05, 0.0, 0.0), ("brownout", 0.15, 0.5, 0.2), ("recovered", 0.05, 0.0, 0.0)]
+
+
+def make_models(seed: int):
+    return (FaultInjectingModel("primary", hang_s=5.0, rate_limit_share=0.3, seed=seed),
+            FaultInjectingModel("fast", latency_s=0.02, seed=seed + 1))
+
+
+async def drive(call, primary, requests_per_phase: int, concurrency: int, prompts: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, ok = [], 0
+
+    async def one(prompt: str):
+        nonlocal ok
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                await call(prompt)
+                ok += 1
+            except Exception:
+                pass
+            latencies.append(time.monotonic() - start)
+
+    for _, latency_s, failure_rate, hang_rate in PHASES:
+        primary.set_health(latency_s, failure_rate, hang_rate)
+        await asyncio.gather(*(one(f"question {rng.randrange(prompts)}") for _ in range(requests_per_phase)))
+    n = len(latencies)
+    return {"success": ok / n, "p50_s": percentile(latencies, 50), "p95_s": percentile(latencies, 95),
+            "p99_s": percentile(latencies, 99), "max_s": max(latencies)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate a provider brownout against the recovery layer.")
+    parser.add_argument("--requests", type=int, default=300, help="requests per phase")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--prompts", type=int, default=50, help="distinct prompts (cache hit potential)")
+    parser.add_argument("--deadline", type=float, default=1.0, help="total retry deadline per step, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    def strategies():
+        primary, fast = make_models(args.seed)
+        yield "primary only", primary, lambda prompt: asyncio.wait_for(primary.ainvoke(prompt), 10.0), None
+
+        primary, fast = make_models(args.seed)
+        yield "retries", primary, lambda prompt: retry_async(
+            lambda: primary.ainvoke(prompt), deadline_s=args.deadline, attempt_timeout_s=0.5), None
+
+        primary, fast = make_models(args.seed)
+        chain = FallbackChain([
+            Fallback("primary", primary.ainvoke,
+                     breaker=CircuitBreaker("primary", reset_timeout_s=0.5, slow_call_s=0.4),
+                     retry={"attempts": 2, "deadline_s": args.deadline / 2, "attempt_timeout_s": 0.5}),
+            Fallback("fast", fast.ainvoke, breaker=CircuitBreaker("fast"),
+                     retry={"deadline_s": args.deadline / 2, "attempt_timeout_s": 0.25}),
+        ], cache_size=1000)
+        yield "chain", primary, chain.call, chain
+
+    print(f"{len(PHASES)} phases x {args.requests} requests, concurrency {args.concurrency}")
+    print(f"{'strategy':<14} {'success':>7} {'p50 s':>6} {'p95 s':>6} {'p99 s':>6} {'max s':>6}")
+    for name, primary, call, chain in strategies():
+        r = asyncio.run(drive(call, primary, args.requests, args.concurrency, args.prompts, args.seed))
+        print(f"{name:<14} {r['success']:>7.1%} {r['p50_s']:>6.2f} {r['p95_s']:>6.2f} {r['p99_s']:>6.2f} "
+              f"{r['max_s']:>6.2f}")
+    snapshot = chain.snapshot()
+    print(f"\nchain served by: {snapshot['served']}")
+    print(f"fallback reasons: {snapshot['fallback_reasons']}")
+    print("breaker transitions:")
+    for event in chain.telemetry.events:
+        if event["event"] == "breaker":
+            print(f"  {event['name']}: {event['previous']} -> {event['state']} ({event['reason']})")
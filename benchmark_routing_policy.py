@@ -0,0 +1,184 @@
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import List, Optional, Tuple
+
+from fake_models import FakeTieredModel
+from local_router import HashedNgramClassifier
+from metrics import percentile
+from model_pricing import estimate_tokens
+from routing_policy import AdaptivePolicy, ComplexityScorer, ExecutionMetrics, RoutingPolicy, WordCountPolicy
+from routing_policy import heuristic_confidence, run_cascade, run_hedged
+
+# Offline comparison of QueryRouterAgent routing policies on a labeled query set
+# (routing_queries.jsonl: {"query", "label": "simple" | "complex", "split": "tune" | "heldout"}).
+# ComplexityScorer's weights and the classifier are fit on the tune split only; the
+# policy and mode tables run on the held-out split.
+# Each routed call is simulated by a FakeTieredModel, so latency, cost and
+# answer quality come out of the same run without any API calls.
+# The second table compares QueryRouterAgent's execution modes (route, cascade,
+# hedge) on the adaptive policy, with fake latencies scaled down by --time-scale.
+
+CHEAP, STRONG = "gemini-2.5-flash", "gemini-2.5-pro"
+
+
+def load_queries(path: str, split: Optional[str] = None) -> List[Tuple[str, str]]:
+    with open(path) as f:
+        return [(r["query"], r["label"]) for r in map(json.loads, filter(str.strip, f))
+                if split is None or r.get("split") == split]
+
+
+class _FixedPolicy(RoutingPolicy):
+    def __init__(self, model: str, **kwargs):
+        super().__init__([CHEAP, STRONG], **kwargs)
+        self.model = model
+
+    def choose(self, query: str, session_id: str = "default"):
+        return self._decide(self.model, 0.0, "fixed", session_id, estimate_tokens(query))
+
+
+def simulate(policy: RoutingPolicy, workload: List[Tuple[str, str]], seed: int) -> dict:
+    models = {CHEAP: FakeTieredModel(CHEAP, latency_s=1.2, skill=0.35, seed=seed),
+              STRONG: FakeTieredModel(STRONG, latency_s=6.0, skill=0.95, seed=seed + 1)}
+    latencies, costs, correct, routed_right, to_strong = [], [], 0, 0, 0
+    for i, (query, label) in enumerate(workload):
+        session_id = f"session-{i // 20}"  # 20 queries per session
+        decision = policy.choose(query, session_id)
+        result = models[decision.model].sample(query, complex=label == "complex")
+        costs.append(policy.observe(decision, result["latency_s"], result["output_tokens"]))
+        latencies.append(result["latency_s"])
+        correct += result["correct"]
+        to_strong += decision.model == STRONG
+        routed_right += (decision.model == STRONG) == (label == "complex")
+    n = len(workload)
+    return {"routing_acc": routed_right / n, "answer_acc": correct / n, "strong_share": to_strong / n,
+            "cost_usd": sum(costs), "mean_s": sum(latencies) / n, "p95_s": percentile(latencies, 95)}
+
+
+def scorer_accuracy(scorer: ComplexityScorer, queries: List[Tuple[str, str]], threshold: float) -> float:
+    """Share of queries whose score falls on the right side of threshold for their label."""
+    return sum((scorer.score(q) >= threshold) == (label == "complex") for q, label in queries) / len(queries)
+
+
+def classifier_scores(train: List[Tuple[str, str]], queries: List[Tuple[str, str]]) -> dict:
+    """Blended complexity score per query, from a classifier trained on `train`."""
+    classifier = HashedNgramClassifier(["simple", "complex"]).fit(train)
+    scorer = ComplexityScorer(classifier=classifier)
+    return {query: scorer.score(query) for query, _ in queries}
+
+
+class _PrecomputedScorer(ComplexityScorer):
+    def __init__(self, scores: dict):
+        super().__init__()
+        self.scores = scores
+
+    def score(self, query: str) -> float:
+        return self.scores[query]
+
+
+async def simulate_mode(mode: str, workload: List[Tuple[str, str]], seed: int, time_scale: float,
+                        concurrency: int = 64, cascade_margin: float = 0.2, accept: float = 0.6) -> dict:
+    """
+    Mirrors QueryRouterAgent._run_async_impl with FakeTieredModel calls in place of
+    the sub-agents; the cascade judges the fake answer text with heuristic_confidence,
+    the agent's default self_check.
+    """
+    policy = AdaptivePolicy(CHEAP, STRONG)
+    models = {CHEAP: FakeTieredModel(CHEAP, latency_s=1.2, skill=0.35, sigma=0.6, seed=seed),
+              STRONG: FakeTieredModel(STRONG, latency_s=6.0, skill=0.95, sigma=0.6, seed=seed + 1)}
+    metrics = ExecutionMetrics()
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = []
+
+    async def call(decision, complex, charges: List[float]):
+        start = time.monotonic()
+        try:
+            result = await models[decision.model].ainvoke(decision.reason, complex, time_scale)
+        except asyncio.CancelledError:
+            charges.append(policy.observe_cancelled(decision, (time.monotonic() - start) / time_scale))
+            raise
+        # Record latency in unscaled seconds so hedge delays and percentiles read naturally.
+        charges.append(policy.observe(decision, (time.monotonic() - start) / time_scale, result["output_tokens"]))
+        return result
+
+    async def handle(query: str, label: str):
+        complex = label == "complex"
+        charges: List[float] = []
+        async with semaphore:
+            start = time.monotonic()
+            decision = policy.choose(query)
+            if mode == "cascade" and abs(decision.score - policy.threshold) <= cascade_margin:
+                def attempt(model, reason):
+                    return call(policy.decision_for(model, query, "default", reason, decision.score), complex, charges)
+
+                result, _ = await run_cascade(lambda: attempt(CHEAP, "cascade"), lambda: attempt(STRONG, "escalation"),
+                                              confidence=lambda r: heuristic_confidence(r["text"]), accept=accept, metrics=metrics)
+            elif mode == "hedge":
+                backup = policy.hedge_model(decision.model)
+                result, _ = await run_hedged(
+                    lambda: call(decision, complex, charges),
+                    lambda: call(policy.decision_for(backup, query, "default", "hedge", decision.score), complex,
+                                 charges),
+                    delay_s=policy.hedge_delay(decision.model) * time_scale, metrics=metrics)
+            else:
+                result = await call(decision, complex, charges)
+            latency = (time.monotonic() - start) / time_scale
+            if mode == "route":
+                metrics.observe("route", latency)
+            outcomes.append((result["correct"], sum(charges), latency))
+
+    await asyncio.gather(*(handle(q, label) for q, label in workload))
+    latencies = [o[2] for o in outcomes]
+    summary = metrics.summary()
+    return {"answer_acc": sum(o[0] for o in outcomes) / len(outcomes), "cost_usd": sum(o[1] for o in outcomes),
+            "escalation_rate": summary["escalation_rate"], "hedge_fire_rate": summary["hedge_fire_rate"],
+            "hedge_win_rate": summary["hedge_win_rate"], "p50_s": percentile(latencies, 50),
+            "p95_s": percentile(latencies, 95), "p99_s": percentile(latencies, 99)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark routing policies offline with fake model tiers.")
+    parser.add_argument("--queries", default="routing_queries.jsonl")
+    parser.add_argument("--repeats", type=int, default=20, help="passes over the labeled set")
+    parser.add_argument("--budget", type=float, default=0.02, help="per-session budget (USD) for the budgeted policy")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-scale", type=float, default=0.01, help="fake latency multiplier for the mode comparison")
+    args = parser.parse_args()
+
+    tune, queries = load_queries(args.queries, "tune"), load_queries(args.queries, "heldout")
+    rng = random.Random(args.seed)
+    workload = [pair for _ in range(args.repeats) for pair in rng.sample(queries, len(queries))]
+    held_out_scores = classifier_scores(tune, queries)
+
+    policies = {
+        "always flash": lambda: _FixedPolicy(CHEAP),
+        "always pro": lambda: _FixedPolicy(STRONG),
+        "word count < 20": lambda: WordCountPolicy(CHEAP, STRONG),
+        "adaptive (lexical)": lambda: AdaptivePolicy(CHEAP, STRONG),
+        "adaptive (+classifier)": lambda: AdaptivePolicy(CHEAP, STRONG, scorer=_PrecomputedScorer(held_out_scores)),
+        f"adaptive (${args.budget}/session)": lambda: AdaptivePolicy(CHEAP, STRONG, budget_usd=args.budget),
+    }
+    threshold = AdaptivePolicy(CHEAP, STRONG).threshold
+    print(f"lexical scorer routing accuracy: tune {scorer_accuracy(ComplexityScorer(), tune, threshold):.2f} "
+          f"({len(tune)} queries), held-out {scorer_accuracy(ComplexityScorer(), queries, threshold):.2f} "
+          f"({len(queries)} queries)")
+    print(f"\n{len(queries)} held-out queries x {args.repeats} passes")
+    print(f"{'policy':<26} {'route acc':>9} {'answer acc':>10} {'to pro':>7} {'cost $':>8} {'mean s':>7} {'p95 s':>6}")
+    for name, make_policy in policies.items():
+        r = simulate(make_policy(), workload, args.seed)
+        print(f"{name:<26} {r['routing_acc']:>9.2f} {r['answer_acc']:>10.2f} {r['strong_share']:>7.2f} "
+              f"{r['cost_usd']:>8.3f} {r['mean_s']:>7.2f} {r['p95_s']:>6.2f}")
+
+    print(f"\nexecution modes (adaptive policy; cost includes the input tokens of cancelled hedge requests)")
+    print(f"{'mode':<10} {'answer acc':>10} {'cost $':>8} {'escalated':>9} {'hedged':>7} {'backup won':>10} "
+          f"{'p50 s':>6} {'p95 s':>6} {'p99 s':>6}")
+    modes = {}
+    for mode in ("route", "cascade", "hedge"):
+        r = modes[mode] = asyncio.run(simulate_mode(mode, workload, args.seed, args.time_scale))
+        print(f"{mode:<10} {r['answer_acc']:>10.2f} {r['cost_usd']:>8.3f} {r['escalation_rate']:>9.2f} "
+              f"{r['hedge_fire_rate']:>7.2f} {r['hedge_win_rate']:>10.2f} {r['p50_s']:>6.2f} {r['p95_s']:>6.2f} "
+              f"{r['p99_s']:>6.2f}")
+    print(f"hedge vs route: answer acc {modes['hedge']['answer_acc'] - modes['route']['answer_acc']:+.2f}, p95 {1 - modes['hedge']['p95_s'] / modes['route']['p95_s']:+.0%}, "
+          f"p99 {1 - modes['hedge']['p99_s'] / modes['route']['p99_s']:+.0%} tail-latency improvement")
@@ -0,0 +1,124 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+from numpy_vector_store import NumpyVectorClient, _normalize
+
+# Recall@k and QPS of numpy_vector_store (exact scan and IVF) against Milvus Lite with
+# the IVF_FLAT / COSINE index that context_retrieval.create_collection defines.
+# Data is synthetic and clustered, so IVF behaves roughly like it does on real embeddings.
+# Ground truth is the exact top-k, computed with the numpy store's flat scan.
+
+COLLECTION = "bench"
+
+
+def make_data(n: int, dim: int, queries: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = _normalize(rng.standard_normal((clusters, dim)).astype(np.float32))
+    labels = rng.integers(0, clusters, n + queries)
+    points = centers[labels] + 1.5 / np.sqrt(dim) * rng.standard_normal((n + queries, dim)).astype(np.float32)
+    points = _normalize(points).astype(np.float32)
+    return points[:n], points[n:]
+
+
+def recall_at_k(found, truth, k: int) -> float:
+    hits = sum(len(set(list(f)[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (k * len(truth))
+
+
+def timed_search(search, queries: np.ndarray, batch: int):
+    ids = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        ids.extend(search(queries[i:i + batch]))
+    return ids, len(queries) / (time.perf_counter() - start)
+
+
+def bench_numpy(root: str, vectors: np.ndarray, queries: np.ndarray, k: int, nlist: int, nprobes, batch: int):
+    client = NumpyVectorClient(root, indexed_fields=())
+    client.create_collection(COLLECTION, dimension=vectors.shape[1], vector_field_name="embedding")
+    start = time.perf_counter()
+    for i in range(0, len(vectors), 10_000):
+        client.insert(COLLECTION, [{"embedding": v} for v in vectors[i:i + 10_000]])
+    print(f"numpy   insert: {time.perf_counter() - start:.1f}s")
+
+    def search(nprobe=None):
+        params = {"params": {"nprobe": nprobe}} if nprobe else None
+        return lambda q: [[hit["id"] for hit in hits]
+                          for hits in client.search(COLLECTION, q, limit=k, search_params=params)]
+
+    truth, qps = timed_search(search(), queries, batch)
+    rows = [("numpy flat", 1.0, qps)]
+    start = time.perf_counter()
+    client.build_ivf(COLLECTION, nlist=nlist)
+    print(f"numpy   IVF build (nlist={nlist}): {time.perf_counter() - start:.1f}s")
+    for nprobe in nprobes:
+        found, qps = timed_search(search(nprobe), queries, batch)
+        rows.append((f"numpy IVF nprobe={nprobe}", recall_at_k(found, truth, k), qps))
+    return truth, rows
+
+
+def bench_milvus(uri: str, vectors: np.ndarray, queries: np.ndarray, truth, k: int, nlist: int, nprobes, batch: int):
+    from pymilvus import MilvusClient, DataType
+
+    client = MilvusClient(uri)
+    schema = client.create_schema(auto_id=False)
+    schema.add_field("id", DataType.INT64, is_primary=True)
+    schema.add_field("embedding", DataType.FLOAT_VECTOR, dim=vectors.shape[1])
+    index_params = client.prepare_index_params()
+    index_params.add_index("embedding", index_type="IVF_FLAT", metric_type="COSINE", params={"nlist": nlist})
+    client.create_collection(COLLECTION, schema=schema, index_params=index_params)
+
+    start = time.perf_counter()
+    for i in range(0, len(vectors), 10_000):
+        client.insert(COLLECTION, [{"id": i + j, "embedding": v.tolist()} for j, v in enumerate(vectors[i:i + 10_000])])
+    client.flush(COLLECTION)
+    print(f"milvus  insert + index: {time.perf_counter() - start:.1f}s")
+
+    rows = []
+    for nprobe in nprobes:
+        def search(q, nprobe=nprobe):
+            hits = client.search(COLLECTION, q.tolist(), limit=k, anns_field="embedding",
+                                 search_params={"metric_type": "COSINE", "params": {"nprobe": nprobe}})
+            return [[hit["id"] for hit in row] for row in hits]
+
+        found, qps = timed_search(search, queries, batch)
+        rows.append((f"milvus IVF_FLAT nprobe={nprobe}", recall_at_k(found, truth, k), qps))
+    client.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare numpy_vector_store with Milvus Lite IVF_FLAT.")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--batch", type=int, default=32, help="queries per search call")
+    parser.add_argument("--skip-milvus", action="store_true")
+    args = parser.parse_args()
+
+    vectors, queries = make_data(args.n, args.dim, args.queries, clusters=args.nlist * 2)
+    workdir = tempfile.mkdtemp(prefix="vector_bench_")
+    try:
+        truth, rows = bench_numpy(os.path.join(workdir, "numpy"), vectors, queries, args.k, args.nlist,
+                                  args.nprobe, args.batch)
+        if not args.skip_milvus:
+            try:
+                rows += bench_milvus(os.path.join(workdir, "milvus.db"), vectors, queries, truth, args.k,
+                                     args.nlist, args.nprobe, args.batch)
+            except ImportError:
+                print("pymilvus is not installed; skipping the Milvus Lite comparison")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{args.n} vectors x {args.dim} dims, {args.queries} queries, batch {args.batch}")
+    print(f"{'index':<28} {'recall@' + str(args.k):>10} {'QPS':>10}")
+    for name, recall, qps in rows:
+        print(f"{name:<28} {recall:>10.3f} {qps:>10.0f}")
@@ -1,17 +1,208 @@
-from pymilvus import MilvusClient, DataType
-
-client = MilvusClient("research_paper.db")
-schema = client.create_schema(
-    auto_id=True,
-    enable_dynamic_fields= True,
-)
-schema.add_field("embedding", DataType.FLOAT_VECTOR, dim=1024)
-schema.add_field("text", DataType.VARCHAR, max_length=65535)
-
-index_params = client.prepare_index_params()
-index_params.add_index("embedding", index_type="IVF_FLAT", metric_type="COSINE")
-
-client.create_collection(
-    collection_name="context_engineering",
-    data = [{"text":chunk,"embedding":emb}]
-)
\ No newline at end of file
+import os
+import sys
+import json
+import time
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Optional, Union
+
+from lazy import lazy_attributes
+
+if TYPE_CHECKING:
+    from pymilvus import MilvusClient
+    from numpy_vector_store import NumpyVectorClient
+
+COLLECTION_NAME = "context_engineering"
+EMBEDDING_DIM = 1024
+
+# "milvus" (Milvus Lite / server) or "numpy" (numpy_vector_store, no Milvus dependency).
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "milvus")
+
+
+def get_client(backend: str = VECTOR_BACKEND) -> Union["MilvusClient", "NumpyVectorClient"]:
+    if backend == "numpy":
+        from numpy_vector_store import NumpyVectorClient
+        return NumpyVectorClient(os.getenv("CONTEXT_DB_URI", "research_paper_vectors"))
+    from pymilvus import MilvusClient
+    return MilvusClient(os.getenv("CONTEXT_DB_URI", "research_paper.db"))
+
+
+# The default client opens its database on first use, not at import.
+_lazy, __getattr__ = lazy_attributes(globals(), {"client": get_client})
+
+
+def create_collection(client, collection_name: str = COLLECTION_NAME) -> None:
+    if client.has_collection(collection_name):
+        return
+    if not hasattr(client, "create_schema"):
+        # numpy_vector_store: fixed COSINE metric, the IVF lists are built separately via build_ivf.
+        client.create_collection(collection_name, dimension=EMBEDDING_DIM, metric_type="COSINE",
+                                 vector_field_name="embedding")
+        return
+    from pymilvus import DataType
+
+    schema = client.create_schema(
+        auto_id=True,
+        enable_dynamic_field=True,
+    )
+    schema.add_field("id", DataType.INT64, is_primary=True)
+    schema.add_field("embedding", DataType.FLOAT_VECTOR, dim=EMBEDDING_DIM)
+    schema.add_field("text", DataType.VARCHAR, max_length=65535)
+    schema.add_field("content_hash", DataType.VARCHAR, max_length=64)
+
+    index_params = client.prepare_index_params()
+    index_params.add_index("embedding", index_type="IVF_FLAT", metric_type="COSINE")
+    # Scalar index so the content-hash dedup lookups during ingestion stay cheap.
+    index_params.add_index("content_hash", index_type="INVERTED")
+
+    client.create_collection(
+        collection_name=collection_name,
+        schema=schema,
+        index_params=index_params,
+    )
+
+
+def openai_embedder(model: str = "text-embedding-3-large",
+                    dimensions: int = EMBEDDING_DIM) -> Callable[[List[str]], List[List[float]]]:
+    """Batch embedding function producing EMBEDDING_DIM-sized vectors."""
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model=model, dimensions=dimensions).embed_documents
+
+
+# Ingestion
+# Chunks are streamed from any iterable (e.g. tensorlake_doc_parser's rag_chunks),
+# deduplicated by content hash against the collection *before* embedding (one query
+# per dedup batch), embedded
+# in batches on a thread pool with a bounded number of batches in flight, and
+# bulk-inserted in large batches. Memory stays bounded by the in-flight window and
+# the insert buffer, so the corpus never has to fit in RAM.
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _existing_hashes(client, collection_name: str, hashes: List[str]) -> set:
+    rows = client.query(
+        collection_name,
+        filter=f"content_hash in {json.dumps(hashes)}",
+        output_fields=["content_hash"],
+        consistency_level="Strong",
+    )
+    return {row["content_hash"] for row in rows}
+
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def ingest_chunks(chunks: Iterable[str], embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                  client=None, collection_name: str = COLLECTION_NAME,
+                  embed_batch_size: int = 64, insert_batch_size: int = 2048, dedup_batch_size: int = 1024, workers: int = 4,
+                  max_in_flight: Optional[int] = None, report_every: int = 10_000) -> dict:
+    """
+    Embeds and inserts every new chunk; chunks whose content hash is already stored
+    (or repeated within the run) are skipped, so reruns only pay for new content.
+    Returns counts, throughput in chunks per second and peak RSS.
+    """
+    embed_fn = embed_fn or openai_embedder()
+    client = client if client is not None else _lazy("client")
+    max_in_flight = max_in_flight or workers * 2
+    create_collection(client, collection_name)
+
+    stats = {"seen": 0, "skipped": 0, "embedded": 0, "inserted": 0}
+    pending_hashes = set()  # hashes embedded or buffered but not inserted yet
+    buffer: List[dict] = []
+    in_flight = deque()
+    start = time.perf_counter()
+    last_report = 0
+
+    def flush() -> None:
+        nonlocal last_report
+        if not buffer:
+            return
+        client.insert(collection_name, buffer)
+        stats["inserted"] += len(buffer)
+        pending_hashes.difference_update(row["content_hash"] for row in buffer)
+        buffer.clear()
+        if stats["seen"] - last_report >= report_every:
+            last_report = stats["seen"]
+            elapsed = time.perf_counter() - start
+            print(f"[ingest] seen {stats['seen']}, inserted {stats['inserted']}, skipped {stats['skipped']}, "
+                  f"{stats['seen'] / elapsed:.0f} chunks/s, peak RSS {_peak_rss_mb():.0f} MB")
+
+    def collect_oldest() -> None:
+        texts, hashes, future = in_flight.popleft()
+        vectors = future.result()
+        stats["embedded"] += len(texts)
+        buffer.extend({"text": t, "content_hash": h, "embedding": v} for t, h, v in zip(texts, hashes, vectors))
+        if len(buffer) >= insert_batch_size:
+            flush()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in _batched(chunks, dedup_batch_size):
+            stats["seen"] += len(batch)
+            unique = {}
+            for text in batch:
+                if text and text.strip():
+                    unique.setdefault(content_hash(text), text)
+            stored = _existing_hashes(client, collection_name, list(unique)) if unique else set()
+            new = [(h, t) for h, t in unique.items() if h not in stored and h not in pending_hashes]
+            stats["skipped"] += len(batch) - len(new)
+            pending_hashes.update(h for h, _ in new)
+            for embed_batch in _batched(new, embed_batch_size):
+                hashes, texts = [h for h, _ in embed_batch], [t for _, t in embed_batch]
+                in_flight.append((texts, hashes, pool.submit(embed_fn, texts)))
+                while len(in_flight) >= max_in_flight:
+                    collect_oldest()
+        while in_flight:
+            collect_oldest()
+        flush()
+
+    elapsed = time.perf_counter() - start
+    return {
+        **stats,
+        "seconds": elapsed,
+        "chunks_per_s": stats["seen"] / elapsed if elapsed else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def iter_jsonl_chunks(path: str) -> Iterator[str]:
+    """Streams chunks from a JSONL file of strings or {"text": ...} objects."""
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield record if isinstance(record, str) else record["text"]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Embed and bulk-insert chunks into the context_engineering collection.")
+    parser.add_argument("chunks", help="JSONL file of chunks (strings or {\"text\": ...} objects)")
+    parser.add_argument("--embed-batch-size", type=int, default=64)
+    parser.add_argument("--insert-batch-size", type=int, default=2048)
+    parser.add_argument("--dedup-batch-size", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    summary = ingest_chunks(iter_jsonl_chunks(args.chunks), embed_batch_size=args.embed_batch_size,
+                            insert_batch_size=args.insert_batch_size, dedup_batch_size=args.dedup_batch_size,
+                            workers=args.workers)
+    print(json.dumps(summary, indent=2))
@@ -1,7 +1,91 @@
-from google.adk.agents import Agent, SequentialAgent
+import os
+from typing import Any, AsyncGenerator, List
+
+from google.adk.agents import Agent, BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.genai import types
+from pydantic import Field
+
+from recovery import AllFallbacksFailed, CircuitBreaker, Fallback, FallbackChain
+from routing_policy import RoutingTelemetry
+from tracing import enable_tracing_from_env, instrument_agent
 
 primary_handler = Agent(
     name = "primary_handler",
     model = "gemini-2.0-flash-exp",
-    instruction= """""
-)
\ No newline at end of file
+    instruction= """
+    Answer the user's request accurately and completely.
+    """
+)
+
+fallback_handler = Agent(
+    name = "fallback_handler",
+    model = "gemini-2.0-flash-lite",
+    instruction= """
+    The primary assistant is unavailable. Answer the user's request briefly and
+    say if the answer may be incomplete.
+    """
+)
+
+# Recovery path: each handler is retried with jittered backoff inside a deadline and
+# guarded by its own circuit breaker; when every handler fails, the last good answer
+# to the same request is served, and only then an apology.
+
+def _content_text(content) -> str:
+    parts = getattr(content, "parts", None) or []
+    return "".join(part.text for part in parts if getattr(part, "text", None))
+
+
+class RecoveringAgent(BaseAgent):
+    """Runs sub_agents in order as a FallbackChain; breaker states and fallback reasons go to `telemetry`."""
+    name: str = "RecoveringAgent"
+    description: str = "Answers with the first healthy handler, falling back to faster models and cached answers"
+    deadline_s: float = 30.0
+    cache_size: int = 256
+    telemetry: Any = Field(default_factory=lambda: RoutingTelemetry(os.getenv("RECOVERY_TELEMETRY_PATH")))
+    chain: Any = None
+
+    def model_post_init(self, __context) -> None:
+        super().model_post_init(__context)
+        steps = [Fallback(agent.name, self._step(agent),
+                          breaker=CircuitBreaker(agent.name, reset_timeout_s=30.0, slow_call_s=self.deadline_s / 2),
+                          retry={"attempts": 3, "deadline_s": self.deadline_s / 2})
+                 for agent in self.sub_agents]
+        self.chain = FallbackChain(steps, cache_size=self.cache_size, key_fn=lambda query, context: query,
+                                   deadline_s=self.deadline_s, telemetry=self.telemetry)
+
+    @staticmethod
+    def _step(agent: BaseAgent):
+        async def run(query: str, context: InvocationContext) -> List[Event]:
+            # Buffered, so a failed attempt never leaves half an answer in the session.
+            return [event async for event in agent.run_async(context)]
+        return run
+
+    def _message(self, context: InvocationContext, text: str) -> Event:
+        return Event(invocation_id=context.invocation_id, author=self.name,
+                     content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+    async def _run_async_impl(self, context: InvocationContext) -> AsyncGenerator[Event, None]:
+        query = _content_text(context.user_content)
+        try:
+            events = await self.chain.call(query, context)
+        except AllFallbacksFailed as e:
+            print(f"Recovery: {e}")
+            yield self._message(context, "Sorry, I can't answer right now. Please try again in a moment.")
+            return
+        served_by = self.chain.last_attempts[-1]["step"]
+        if served_by != self.chain.steps[0].name:
+            print(f"Recovery: served by {served_by} after {self.chain.last_attempts[:-1]}")
+        if served_by == "cache":
+            # Cached events belong to an earlier invocation; replay only their text.
+            yield self._message(context, "".join(_content_text(e.content) for e in events))
+            return
+        for event in events:
+            yield event
+
+
+robust_agent = RecoveringAgent(sub_agents=[primary_handler, fallback_handler])
+tracer = enable_tracing_from_env()
+if tracer:
+    instrument_agent(robust_agent, tracer)
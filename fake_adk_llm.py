@@ -0,0 +1,58 @@
+import random
+import asyncio
+from typing import Callable, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from fake_models import FakeProviderError
+from model_pricing import estimate_tokens
+
+# Offline stand-in for a Gemini model inside ADK LlmAgents: LlmAgent(model=StubLlm(...)).
+
+
+def _last_user_text(llm_request) -> str:
+    for content in reversed(llm_request.contents):
+        if content.role == "user":
+            return "".join(part.text for part in content.parts or [] if part.text)
+    return ""
+
+
+class StubLlm(BaseLlm):
+    """
+    Answers reply(prompt) after latency_s (+/- jitter) seconds, or raises a 503
+    FakeProviderError with probability failure_rate. Counts calls and peak concurrency.
+    """
+
+    model: str = "stub"
+    latency_s: float = 0.1
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+    reply: Optional[Callable[[str], str]] = None
+    seed: Optional[int] = None
+    calls: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+    def model_post_init(self, __context) -> None:
+        self._rng = random.Random(self.seed)
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(max(0.0, self.latency_s + self._rng.uniform(-self.jitter, self.jitter)))
+        finally:
+            self.in_flight -= 1
+        if self._rng.random() < self.failure_rate:
+            raise FakeProviderError(503)
+        prompt = _last_user_text(llm_request)
+        text = self.reply(prompt) if self.reply else f"[{self.model}] {prompt}"
+        prompt_tokens = sum(estimate_tokens(part.text) for content in llm_request.contents
+                            for part in content.parts or [] if part.text)
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens, candidates_token_count=estimate_tokens(text),
+            total_token_count=prompt_tokens + estimate_tokens(text))
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]), usage_metadata=usage)
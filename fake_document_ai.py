@@ -0,0 +1,119 @@
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+from typing import Any, List, Optional, Tuple, Union
+
+# Offline stand-in for tensorlake.documentai.DocumentAI.
+# It implements the calls tensorlake_doc_parser makes (upload, parse,
+# get_parsed_result, wait_for_completion and their _async variants) with
+# configurable latencies, and returns deterministic chunks derived from the file bytes.
+# A latency is either fixed seconds or a (low, high) range sampled uniformly per call.
+
+Latency = Union[float, Tuple[float, float]]
+
+
+class FakeChunk:
+    def __init__(self, page_number: int, content: str):
+        self.page_number = page_number
+        self.content = content
+
+
+class FakeStructuredData:
+    def __init__(self, data: Any, page_numbers: List[int], schema_name: Optional[str]):
+        self.data = data
+        self.page_numbers = page_numbers
+        self.schema_name = schema_name
+
+    def model_dump(self, exclude_none: bool = False) -> dict:
+        return {"data": self.data, "page_numbers": self.page_numbers, "schema_name": self.schema_name}
+
+
+class FakeParseResult:
+    def __init__(self, parse_id: str, status: str, chunks=None, structured_data=None, error: Optional[str] = None):
+        self.parse_id = parse_id
+        self.status = status
+        self.chunks = chunks
+        self.structured_data = structured_data
+        self.error = error
+
+
+class FakeDocumentAI:
+    """Parse jobs become "successful" parse_latency seconds after they are submitted."""
+
+    def __init__(self, upload_latency: Latency = 0.05, parse_latency: Latency = 0.5, chunks_per_document: int = 8,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.upload_latency = upload_latency
+        self.parse_latency = parse_latency
+        self.chunks_per_document = chunks_per_document
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.files = {}
+        self.jobs = {}
+        self.calls = {"upload": 0, "parse": 0, "get_parsed_result": 0}
+        self.uploads_in_flight = 0
+        self.peak_uploads_in_flight = 0
+
+    def _sample(self, latency: Latency) -> float:
+        return self.rng.uniform(*latency) if isinstance(latency, tuple) else latency
+
+    def _register_file(self, path: str) -> str:
+        with open(path, "rb") as f:
+            data = f.read()
+        file_id = f"file_{uuid.uuid4().hex[:12]}"
+        self.files[file_id] = (path, hashlib.sha256(data).hexdigest())
+        return file_id
+
+    def upload(self, path: str) -> str:
+        self.calls["upload"] += 1
+        time.sleep(self._sample(self.upload_latency))
+        return self._register_file(path)
+
+    async def upload_async(self, path: str) -> str:
+        self.calls["upload"] += 1
+        self.uploads_in_flight += 1
+        self.peak_uploads_in_flight = max(self.peak_uploads_in_flight, self.uploads_in_flight)
+        try:
+            await asyncio.sleep(self._sample(self.upload_latency))
+        finally:
+            self.uploads_in_flight -= 1
+        return self._register_file(path)
+
+    def parse(self, file: str, parsing_options=None, structured_extraction_options=None, **kwargs) -> str:
+        self.calls["parse"] += 1
+        if file not in self.files:
+            raise ValueError(f"unknown file id: {file}")
+        parse_id = f"parse_{uuid.uuid4().hex[:12]}"
+        schema_name = getattr(structured_extraction_options, "schema_name", None)
+        failed = self.rng.random() < self.failure_rate
+        self.jobs[parse_id] = (file, schema_name, time.monotonic() + self._sample(self.parse_latency), failed)
+        return parse_id
+
+    async def parse_async(self, file: str, parsing_options=None, structured_extraction_options=None, **kwargs) -> str:
+        return self.parse(file, parsing_options, structured_extraction_options, **kwargs)
+
+    def _result(self, parse_id: str) -> FakeParseResult:
+        file_id, schema_name, ready_at, failed = self.jobs[parse_id]
+        if time.monotonic() < ready_at:
+            return FakeParseResult(parse_id, "processing")
+        if failed:
+            return FakeParseResult(parse_id, "failure", error="fake parse failure")
+        path, digest = self.files[file_id]
+        chunks = [FakeChunk(i // 2 + 1, f"Section {i + 1} of {path} ({digest[:8]})")
+                  for i in range(self.chunks_per_document)]
+        structured = [FakeStructuredData({"title": f"Document {digest[:8]}", "authors": "", "abstract": "",
+                                          "sections": ""}, [1], schema_name)] if schema_name else []
+        return FakeParseResult(parse_id, "successful", chunks, structured)
+
+    def get_parsed_result(self, parse_id: str) -> FakeParseResult:
+        self.calls["get_parsed_result"] += 1
+        return self._result(parse_id)
+
+    async def get_parsed_result_async(self, parse_id: str) -> FakeParseResult:
+        return self.get_parsed_result(parse_id)
+
+    def wait_for_completion(self, parse_id: str) -> FakeParseResult:
+        _, _, ready_at, _ = self.jobs[parse_id]
+        time.sleep(max(0.0, ready_at - time.monotonic()))
+        return self._result(parse_id)
@@ -0,0 +1,234 @@
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Callable, List, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from model_pricing import estimate_tokens
+
+# Offline stand-ins for LLM providers, used by the schedulers' demos and benchmarks.
+
+
+class FakeRateLimitError(Exception):
+    """Shaped like provider SDK errors: an HTTP status code and a Retry-After hint."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"429 Too Many Requests, retry after {retry_after:.2f}s")
+        self.status_code = 429
+        self.retry_after = retry_after
+
+
+class FakeRateLimitedModel:
+    """Async fake model that rejects calls beyond `max_requests` within any sliding `window` seconds."""
+
+    def __init__(self, max_requests: int, window: float = 60.0, latency: float = 0.05):
+        self.max_requests = max_requests
+        self.latency = latency
+        self.window = window
+        self.reset()
+
+    def reset(self) -> None:
+        self.accepted = deque()
+        self.calls = 0
+        self.rejected = 0
+
+    def _admit(self, now: float) -> Optional[float]:
+        while self.accepted and self.accepted[0] <= now - self.window:
+            self.accepted.popleft()
+        if len(self.accepted) >= self.max_requests:
+            return self.accepted[0] + self.window - now
+        self.accepted.append(now)
+        return None
+
+    async def ainvoke(self, prompt: str) -> str:
+        self.calls += 1
+        retry_after = self._admit(time.monotonic())
+        if retry_after is not None:
+            self.rejected += 1
+            raise FakeRateLimitError(retry_after)
+        await asyncio.sleep(self.latency)
+        return f"response to: {prompt[:40]}"
+
+
+class FakeTieredModel:
+    """
+    Offline stand-in for one model tier, for routing benchmarks.
+
+    Latency is lognormal around latency_s. Simple queries are always answered
+    correctly; complex ones with probability `skill`. The answer text carries the
+    signals a text self-check (routing_policy.heuristic_confidence) reads: wrong
+    answers are usually hedged or terse, and some right ones are hedged too.
+    """
+
+    def __init__(self, model: str, latency_s: float, skill: float, sigma: float = 0.35,
+                 output_tokens: int = 400, seed: Optional[int] = None):
+        self.model = model
+        self.latency_s = latency_s
+        self.skill = skill
+        self.sigma = sigma
+        self.output_tokens = output_tokens
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.cancelled = 0
+
+    def sample(self, prompt: str, complex: bool = False) -> dict:
+        self.calls += 1
+        correct = not complex or self.rng.random() < self.skill
+        style = self.rng.random()
+        if correct:
+            text = (f"It depends, but {self.model} would answer: {prompt[:40]}" if style < 0.1
+                    else f"Here is the {self.model} answer to: {prompt[:40]}")
+        elif style < 0.6:
+            text = f"I'm not sure, but {self.model} would guess: {prompt[:40]}"
+        elif style < 0.8:
+            text = "Probably yes."
+        else:
+            text = f"Here is the {self.model} answer to: {prompt[:40]}"
+        tokens = int(self.output_tokens * (2.0 if complex else 1.0) * self.rng.uniform(0.7, 1.3))
+        return {"model": self.model, "text": text, "correct": correct, "output_tokens": tokens,
+                "latency_s": self.latency_s * self.rng.lognormvariate(0, self.sigma)}
+
+    async def ainvoke(self, prompt: str, complex: bool = False, time_scale: float = 1.0) -> dict:
+        result = self.sample(prompt, complex)
+        try:
+            await asyncio.sleep(result["latency_s"] * time_scale)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return result
+
+
+class FakeProviderError(Exception):
+    """A 5xx from the provider (e.g. 503 during a brownout)."""
+
+    def __init__(self, status_code: int = 503):
+        super().__init__(f"{status_code} Service Unavailable")
+        self.status_code = status_code
+
+
+class FaultInjectingModel:
+    """
+    Async fake model whose health can be changed at runtime, for recovery tests.
+
+    Each call fails with probability failure_rate (a 503, or a 429 with
+    Retry-After for rate_limit_share of failures) and hangs for hang_s with
+    probability hang_rate, as an overloaded provider that never answers does.
+    set_health() switches between healthy and brownout behaviour mid-run.
+    """
+
+    def __init__(self, name: str, latency_s: float = 0.05, failure_rate: float = 0.0, hang_rate: float = 0.0,
+                 hang_s: float = 30.0, rate_limit_share: float = 0.0, retry_after: float = 0.1,
+                 seed: Optional[int] = None):
+        self.name = name
+        self.rng = random.Random(seed)
+        self.hang_s = hang_s
+        self.rate_limit_share = rate_limit_share
+        self.retry_after = retry_after
+        self.set_health(latency_s, failure_rate, hang_rate)
+        self.calls = 0
+        self.failures = 0
+        self.hangs = 0
+
+    def set_health(self, latency_s: float, failure_rate: float = 0.0, hang_rate: float = 0.0) -> None:
+        self.latency_s = latency_s
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+
+    async def ainvoke(self, prompt: str) -> str:
+        self.calls += 1
+        roll = self.rng.random()
+        if roll < self.hang_rate:
+            self.hangs += 1
+            await asyncio.sleep(self.hang_s)
+        await asyncio.sleep(self.latency_s * self.rng.uniform(0.5, 1.5))
+        if roll >= 1 - self.failure_rate:
+            self.failures += 1
+            if self.rng.random() < self.rate_limit_share:
+                raise FakeRateLimitError(self.retry_after)
+            raise FakeProviderError(503)
+        return f"{self.name} answer to: {prompt[:40]}"
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    LangChain chat model that simulates a provider, for offline benchmarks.
+
+    Each call takes lognormal(latency_s, sigma) time to first token plus
+    output_tokens / tokens_per_s to generate (output_tokens varies +/-50%), and
+    fails with a 503 with probability failure_rate. responder(messages, tools)
+    returns the reply: a string, or an AIMessage (e.g. with tool_calls). Tools
+    bound with bind_tools / with_structured_output arrive as OpenAI tool schemas.
+    """
+
+    responder: Optional[Callable[[List[BaseMessage], Optional[list]], Any]] = None
+    model_name: str = "fake-chat"
+    latency_s: float = 0.2
+    sigma: float = 0.3
+    tokens_per_s: float = 100.0
+    output_tokens: int = 200
+    failure_rate: float = 0.0
+    seed: Optional[int] = None
+    calls: int = 0
+    failures: int = 0
+    input_tokens_total: int = 0
+    output_tokens_total: int = 0
+
+    def model_post_init(self, __context) -> None:
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name}
+
+    def bind_tools(self, tools: Sequence[Any], tool_choice: Any = None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _plan(self, messages: List[BaseMessage], tools: Optional[list]):
+        """Draws the latency and outcome of one call; returns (delay_s, message or exception)."""
+        with self._lock:
+            self.calls += 1
+            first_token = self.latency_s * self._rng.lognormvariate(0, self.sigma)
+            output_tokens = max(1, int(self.output_tokens * self._rng.uniform(0.5, 1.5)))
+            failed = self._rng.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        if failed:
+            return first_token, FakeProviderError(503)
+        reply = self.responder(messages, tools) if self.responder else f"{self.model_name} reply"
+        message = reply if isinstance(reply, AIMessage) else AIMessage(content=reply)
+        input_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        with self._lock:
+            self.input_tokens_total += input_tokens
+            self.output_tokens_total += output_tokens
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                  "total_tokens": input_tokens + output_tokens}
+        message.response_metadata = {"model_name": self.model_name}
+        return first_token + output_tokens / self.tokens_per_s, message
+
+    @staticmethod
+    def _result(outcome) -> ChatResult:
+        if isinstance(outcome, Exception):
+            raise outcome
+        return ChatResult(generations=[ChatGeneration(message=outcome)],
+                          llm_output={"model_name": outcome.response_metadata["model_name"]})
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        delay, outcome = self._plan(messages, tools)
+        time.sleep(delay)
+        return self._result(outcome)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        delay, outcome = self._plan(messages, tools)
+        await asyncio.sleep(delay)
+        return self._result(outcome)
@@ -1,19 +1,180 @@
 # This Python program implements the following use case:
 #Write code to count the number of files in current directory and all its nested directories, and print the total count
 
-```python
 import os
+import sys
+import json
+import time
+import queue
+import fnmatch
+import argparse
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Directories are scanned with os.scandir on a pool of threads, so on network
+# filesystems many directory listings are in flight at once instead of one. Each
+# worker only counts the entries of a directory and queues its subdirectories; no
+# per-directory file lists are built. A file is anything os.walk would put in
+# `files` (every entry that is not a directory, symlinks included), so the totals
+# match os.walk.
+#
+# Incremental mode keeps {directory: [mtime_ns, file count, subdirectory names]} in
+# a JSON cache. A directory's mtime changes whenever an entry is added, removed or
+# renamed in it, so on a rerun an unchanged directory costs one stat instead of a
+# listing. Entries modified within RACY_WINDOW_NS of the scan are not cached, as a
+# change in the same mtime tick would be invisible.
+
+RACY_WINDOW_NS = 2_000_000_000
+CACHE_VERSION = 1
+
+
+def _excluded(name: str, patterns: Iterable[str]) -> bool:
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+
+class TreeCounter:
+    """
+    Parallel file counter.
+
+    follow_symlinks descends into symlinked directories, skipping any directory
+    (by device and inode) already visited, which also breaks symlink loops.
+    exclude holds fnmatch patterns matched against entry names; excluded files
+    are not counted and excluded directories are not entered. cache_path turns
+    on incremental mode.
+    """
+
+    def __init__(self, workers: Optional[int] = None, follow_symlinks: bool = False,
+                 exclude: Iterable[str] = (), cache_path: Optional[str] = None):
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.follow_symlinks = follow_symlinks
+        self.exclude = tuple(exclude)
+        self.cache_path = cache_path
+
+    def _options(self) -> dict:
+        return {"follow_symlinks": self.follow_symlinks, "exclude": sorted(self.exclude)}
+
+    def _load_cache(self, root: str) -> Dict[str, list]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+        except ValueError:
+            return {}
+        if cache.get("version") != CACHE_VERSION or cache.get("root") != root or cache.get("options") != self._options():
+            return {}
+        return cache["dirs"]
+
+    def _save_cache(self, root: str, dirs: Dict[str, list]) -> None:
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": CACHE_VERSION, "root": root, "options": self._options(), "dirs": dirs}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def count(self, directory: str = ".") -> dict:
+        """Returns {files, dirs, cached_dirs, errors, skipped_loops, seconds} for the tree under directory."""
+        root = os.path.abspath(directory)
+        cached = self._load_cache(root)
+        incremental = self.cache_path is not None
+        scan_start_ns = time.time_ns()
+        visited, visited_lock = set(), threading.Lock()
+        work: "queue.Queue[Optional[str]]" = queue.Queue()
+
+        def worker(stats: dict, new_cache: Dict[str, list]) -> None:
+            while True:
+                path = work.get()
+                if path is None:
+                    return
+                try:
+                    self._visit(path, root, stats, new_cache, cached, incremental, scan_start_ns,
+                                visited, visited_lock, work)
+                finally:
+                    work.task_done()
+
+        start = time.perf_counter()
+        results = [({"files": 0, "dirs": 0, "cached_dirs": 0, "errors": 0, "skipped_loops": 0}, {})
+                   for _ in range(self.workers)]
+        threads = [threading.Thread(target=worker, args=result, daemon=True) for result in results]
+        for thread in threads:
+            thread.start()
+        work.put(root)
+        work.join()
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+
+        totals = {key: sum(stats[key] for stats, _ in results) for key in results[0][0]}
+        if incremental:
+            self._save_cache(root, {rel: entry for _, new_cache in results for rel, entry in new_cache.items()})
+        totals["seconds"] = time.perf_counter() - start
+        return totals
+
+    def _visit(self, path: str, root: str, stats: dict, new_cache: Dict[str, list], cached: Dict[str, list],
+               incremental: bool, scan_start_ns: int, visited: set, visited_lock: threading.Lock,
+               work: queue.Queue) -> None:
+        try:
+            st = os.stat(path) if incremental or self.follow_symlinks else None
+            if self.follow_symlinks:
+                with visited_lock:
+                    if (st.st_dev, st.st_ino) in visited:
+                        stats["skipped_loops"] += 1
+                        return
+                    visited.add((st.st_dev, st.st_ino))
+            rel = os.path.relpath(path, root)
+            entry = cached.get(rel)
+            if entry is not None and entry[0] == st.st_mtime_ns:
+                files, subdirs = entry[1], entry[2]
+                stats["cached_dirs"] += 1
+            else:
+                files, subdirs = self._scan(path)
+            if incremental and st.st_mtime_ns < scan_start_ns - RACY_WINDOW_NS:
+                new_cache[rel] = [st.st_mtime_ns, files, subdirs]
+        except OSError:
+            stats["errors"] += 1
+            return
+        stats["dirs"] += 1
+        stats["files"] += files
+        for name in subdirs:
+            work.put(os.path.join(path, name))
+
+    def _scan(self, path: str) -> Tuple[int, List[str]]:
+        files, subdirs = 0, []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if self.exclude and _excluded(entry.name, self.exclude):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    files += 1
+                elif self.follow_symlinks or not entry.is_symlink():
+                    subdirs.append(entry.name)
+        return files, subdirs
+
+
+def count_files_in_directory(directory, workers: Optional[int] = None, follow_symlinks: bool = False,
+                             exclude: Iterable[str] = (), cache_path: Optional[str] = None) -> int:
+    stats = TreeCounter(workers, follow_symlinks, exclude, cache_path).count(directory)
+    if stats["errors"]:
+        print(f"Error accessing {stats['errors']} director{'y' if stats['errors'] == 1 else 'ies'}", file=sys.stderr)
+    return stats["files"]
 
-def count_files_in_directory(directory):
-    total_files = 0
-    try:
-        for root, dirs, files in os.walk(directory):
-            total_files += len(files)
-    except Exception as e:
-        print(f"Error accessing directory: {e}")
-    return total_files
 
 if __name__ == "__main__":
-    current_directory = os.getcwd()
-    total_count = count_files_in_directory(current_directory)
-    print(f"Total number of files: {total_count}")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Count the files in a directory tree.")
+    parser.add_argument("directory", nargs="?", default=os.getcwd())
+    parser.add_argument("--workers", type=int, help="directory listings in flight (default: cpu count + 4, max 32)")
+    parser.add_argument("--follow-symlinks", action="store_true", help="descend into symlinked directories")
+    parser.add_argument("--exclude", action="append", default=[], help="fnmatch pattern for names to skip (repeatable)")
+    parser.add_argument("--cache", help="JSON cache of per-directory counts for incremental reruns")
+    parser.add_argument("--stats", action="store_true", help="print walk statistics to stderr")
+    args = parser.parse_args()
+
+    counter = TreeCounter(args.workers, args.follow_symlinks, args.exclude, args.cache)
+    stats = counter.count(args.directory)
+    if args.stats or stats["errors"]:
+        print(json.dumps(stats), file=sys.stderr)
+    print(f"Total number of files: {stats['files']}")
@@ -1,25 +1,42 @@
 import os
 import re
+import ast
+import sys
 import random
+import tempfile
+import subprocess
 from pathlib import Path
-from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, Field, ValidationError
 from dotenv import load_dotenv, find_dotenv
-from typing import List
+from typing import List, Optional
+from lazy import lazy_attributes
 
 _ = load_dotenv(find_dotenv())
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+def _create_llm():
+    from langchain_openai import ChatOpenAI
+    from llm_cache import enable_llm_cache_from_env
+    from tracing import enable_tracing_from_env
 
-if not OPENAI_API_KEY:
-    raise EnvironmentError("Please set OPENAI API KEY env variable")
+    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    if not OPENAI_API_KEY:
+        raise EnvironmentError("Please set OPENAI API KEY env variable")
+    # The model runs at temperature 0.3, which the cache skips by default:
+    # set LLM_CACHE_ALL_TEMPERATURES=1 along with LLM_CACHE_PATH to cache its calls.
+    enable_llm_cache_from_env()
+    enable_tracing_from_env()
 
-print("initializing OPENAI LLM gpt-4o")
+    print("initializing OPENAI LLM gpt-4o")
+    return ChatOpenAI(model= "gpt-4o",
+                      temperature=0.3,
+                      openai_api_key = OPENAI_API_KEY
+    )
+
+# Created on first use; assign goal_setting_and_monitoring.llm beforehand to use another model.
+_lazy, __getattr__ = lazy_attributes(globals(), {"llm": _create_llm})
 
-llm = ChatOpenAI(model= "gpt-4o",
-                 temperature=0.3,
-                 openai_api_key = OPENAI_API_KEY
-)
-          
+def get_llm():
+    return _lazy("llm")
 
 
 
@@ -44,7 +61,32 @@ def generate_prompt(use_case:str, goals:List[str],previous_code:str="", feedback
     base_prompt += "\nPlease return only the revised Python code.Do not include comments or explanations outside the code. "
     return base_prompt
 
-def get_code_feedback(code:str, goals:List[str]) -> str:
+# Call accounting, so the reviewer modes can be compared per iteration
+def new_call_stats() -> dict:
+    return {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+
+def _record_usage(stats:Optional[dict], message) -> None:
+    if stats is None:
+        return
+    usage = getattr(message, "usage_metadata", None) or {}
+    stats["calls"] += 1
+    stats["input_tokens"] += usage.get("input_tokens", 0)
+    stats["output_tokens"] += usage.get("output_tokens", 0)
+
+def _message_capture():
+    """Callback handler that keeps the last chat message the model returned, so its usage can
+    be recorded even when turning it into structured output fails afterwards."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class MessageCapture(BaseCallbackHandler):
+        message = None
+
+        def on_llm_end(self, response, **kwargs):
+            self.message = getattr(response.generations[0][0], "message", None)
+
+    return MessageCapture()
+
+def get_code_feedback(code:str, goals:List[str], stats:Optional[dict]=None) -> str:
     print(f" Evaluating code against the goals...")
     feedback_prompt = f"""
     You are a Python code reviewer . A Code snippet is shown below.Based on the following goals:
@@ -56,9 +98,11 @@ def get_code_feedback(code:str, goals:List[str]) -> str:
     Code:
     {code}
     """
-    return llm.invoke(feedback_prompt)
+    feedback = get_llm().invoke(feedback_prompt)
+    _record_usage(stats, feedback)
+    return feedback
 
-def goals_met(feedback_text:str, goals:List[str]) -> bool:
+def goals_met(feedback_text:str, goals:List[str], stats:Optional[dict]=None) -> bool:
     """
     Uses the LLM to evaluate whether the goals have been met based on the feedback text.
     Return True or False (Parsed from LLM output) 
@@ -84,18 +128,153 @@ def goals_met(feedback_text:str, goals:List[str]) -> bool:
     Respond with only one word: True or False
     """
     
-    response = llm.invoke(review_prompt).content.strip().lower()
-    return response == "true"
+    response = get_llm().invoke(review_prompt)
+    _record_usage(stats, response)
+    return response.content.strip().lower() == "true"
+
+
+# Single-call structured review
+class GoalAssessment(BaseModel):
+    goal: str = Field(description="The goal being assessed, copied verbatim from the list")
+    met: bool = Field(description="Whether the code fully meets this goal")
+    reason: str = Field(description="Short justification for the verdict on this goal")
+
+
+class CodeReview(BaseModel):
+    goals: List[GoalAssessment] = Field(description="One assessment per goal, in the order given")
+    critique: str = Field(description="Critique covering clarity, simplicity, correctness, edge case handling and test coverage")
+    goals_met: bool = Field(description="True only if every goal is met")
+
+
+def review_code(code:str, goals:List[str], stats:Optional[dict]=None) -> Optional[CodeReview]:
+    """
+    Critiques the code and decides whether the goals are met in one LLM call.
+    Returns None when the response cannot be parsed or fails the schema checks,
+    so the caller can fall back to get_code_feedback + goals_met.
+    """
+    print(f" Reviewing code against the goals (structured, single call)...")
+    review_prompt = f"""
+    You are a Python code reviewer. A code snippet is shown below. Assess it against each of these goals:
+    {chr(10).join(f"- {g.strip()}" for g in goals)}
+
+    For every goal say whether it is met and why. Then write a critique that mentions any improvements
+    needed for clarity, simplicity, correctness, edge case handling, or test coverage.
+    Finally give the overall verdict: goals_met is true only if every goal is met.
+
+    Code:
+    {code}
+    """
+    reviewer = get_llm().with_structured_output(CodeReview, include_raw=True)
+    capture = _message_capture()
+    try:
+        result = reviewer.invoke(review_prompt, config={"callbacks": [capture]})
+    except ValidationError as e:
+        # The call was made and billed; count it before the caller falls back to two more.
+        if capture.message is not None:
+            _record_usage(stats, capture.message)
+        print(f" Structured review failed validation: {e}")
+        return None
+    _record_usage(stats, result["raw"])
+
+    review = result.get("parsed")
+    if result.get("parsing_error") or review is None:
+        print(f" Structured review could not be parsed: {result.get('parsing_error')}")
+        return None
+    if len(review.goals) != len(goals):
+        print(f" Structured review assessed {len(review.goals)} goals, expected {len(goals)}")
+        return None
+    # The overall verdict must agree with the per-goal verdicts.
+    review.goals_met = review.goals_met and all(g.met for g in review.goals)
+    return review
+
+def format_review(review:CodeReview) -> str:
+    lines = [f"- [{'PASS' if g.met else 'FAIL'}] {g.goal}: {g.reason}" for g in review.goals]
+    return "\n".join(lines) + f"\n\n{review.critique.strip()}"
 
 
 def clean_code_block(code:str) -> str:
+    fenced = re.search(r"```(?:python|py)?[ \t]*\n(.*?)```", code, re.DOTALL)
+    if fenced:
+        return fenced.group(1).strip()
     lines = code.strip().splitlines()
-    if lines and lines[0].strip().startswith(" ```"):
+    if lines and lines[0].strip().startswith("```"):
         lines = lines[1:]
     if lines and lines[-1].strip() == "```":
         lines = lines[:-1]
     return "\n".join(lines).strip()
 
+
+# Local validation gate
+def _limit_resources(cpu_seconds:int, memory_bytes:int):
+    """Returns a preexec_fn that caps CPU time and address space of the sandboxed child (POSIX only)."""
+    def apply_limits():
+        import resource
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    return apply_limits
+
+def _run_sandboxed(script_path:Path, args:List[str], stdin_text:str, timeout:float) -> subprocess.CompletedProcess:
+    # Isolated interpreter (-I), throwaway cwd and a minimal environment so generated
+    # code never sees our API keys or the user's site-packages configuration.
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONIOENCODING": "utf-8"}
+    preexec_fn = None
+    if os.name == "posix":
+        preexec_fn = _limit_resources(cpu_seconds=max(1, int(timeout) + 1), memory_bytes=1024 * 1024 * 1024)
+    return subprocess.run(
+        [sys.executable, "-I", *args],
+        input=stdin_text,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+        cwd=script_path.parent,
+        env=env,
+        preexec_fn=preexec_fn,
+    )
+
+def _tail(text:str, limit:int=1500) -> str:
+    text = text.strip()
+    return text if len(text) <= limit else "..." + text[-limit:]
+
+def validate_code_locally(code:str, example_inputs:Optional[List[str]]=None, timeout:float=10.0) -> Optional[str]:
+    """
+    Cheap local checks run before any LLM review call.
+
+    1. The code must parse (ast.parse).
+    2. The module must import cleanly in a sandboxed subprocess (run under a
+       non-__main__ name, so scripts waiting on input() or sys.argv are not triggered).
+    3. Each example input, if given, is fed on stdin to a full run of the script.
+
+    Returns None when every check passes, otherwise feedback text for the next generation.
+    """
+    print(" Validating code locally...")
+    try:
+        ast.parse(code)
+    except SyntaxError as e:
+        return f"The code does not parse: SyntaxError at line {e.lineno}: {e.msg}\n{e.text or ''}".strip()
+
+    with tempfile.TemporaryDirectory(prefix="code_agent_") as tmp_dir:
+        script_path = Path(tmp_dir) / "candidate.py"
+        script_path.write_text(code)
+
+        runs = [("import check (module-level code only; keep interactive code under `if __name__ == \"__main__\":`)",
+                 ["-c", "import runpy; runpy.run_path('candidate.py', run_name='__sandbox__')"], "")]
+        for n, example in enumerate(example_inputs or [], start=1):
+            runs.append((f"example {n} (stdin={example!r})", [script_path.name], example))
+
+        for label, args, stdin_text in runs:
+            try:
+                result = _run_sandboxed(script_path, args, stdin_text, timeout)
+            except subprocess.TimeoutExpired:
+                return f"Local {label} did not finish within {timeout} seconds. Check for infinite loops or blocking reads."
+            if result.returncode != 0:
+                return (
+                    f"Local {label} failed with exit code {result.returncode}.\n"
+                    f"stderr:\n{_tail(result.stderr)}\n"
+                    f"stdout:\n{_tail(result.stdout)}"
+                )
+    print(" Local validation passed.")
+    return None
+
 def add_comment_header(code:str, use_case:str) -> str:
     comment = f"# This Python program implements the following use case:\n#{use_case.strip()}\n"
     return comment + "\n" + code
@@ -110,7 +289,7 @@ def save_code_to_file(code:str, use_case:str)-> str:
         f"Summarize the following use case into a single lowercase word or phrase,"
         f"no more than 10 characters , suitable for a Python filename:\n\n{use_case}"
     )
-    raw_summary = llm.invoke(summary_prompt).content.strip()
+    raw_summary = get_llm().invoke(summary_prompt).content.strip()
     short_name = re.sub(r"[^a-zA-Z0-9]", "", raw_summary.replace(" ","_").lower())[:10]
     random_suffix = str(random.randint(1000,9999))
     filename = f"{short_name}_{random_suffix}.py"
@@ -122,7 +301,20 @@ def save_code_to_file(code:str, use_case:str)-> str:
     
     
     
-def run_code_agent(use_case:str, goals_input:str, max_iterations:int=5)-> str:
+def print_call_stats(label:str, stats:dict) -> None:
+    print(f" [{label}] LLM calls: {stats['calls']}, "
+          f"input tokens: {stats['input_tokens']}, output tokens: {stats['output_tokens']}")
+
+def run_code_agent(use_case:str, goals_input:str, max_iterations:int=5,
+                   example_inputs:Optional[List[str]]=None, run_timeout:float=10.0,
+                   review_mode:str="structured")-> str:
+    """
+    review_mode="structured" critiques and decides in a single call (review_code),
+    falling back to the two-call path if the structured response is unusable;
+    review_mode="two_call" always uses get_code_feedback followed by goals_met.
+    """
+    if review_mode not in ("structured", "two_call"):
+        raise ValueError(f"Unknown review_mode: {review_mode!r}")
     goals = [g.strip() for g in goals_input.split(",")]
     
     print(f"\n Use Case:{use_case}")
@@ -132,24 +324,52 @@ def run_code_agent(use_case:str, goals_input:str, max_iterations:int=5)-> str:
     
     previous_code = ""
     feedback = ""
+    total_stats = new_call_stats()
     for i in range(max_iterations):
         print(f"\n=== Iteration{i+1} of {max_iterations}===")
+        stats = new_call_stats()
         prompt = generate_prompt(use_case, goals, previous_code, feedback if isinstance(feedback, str) else feedback.content)
         print(" Generating Code...")
-        code_response = llm.invoke(prompt)
+        code_response = get_llm().invoke(prompt)
+        _record_usage(stats, code_response)
         raw_code = code_response.content.strip()
         code = clean_code_block(raw_code)
+
+        local_feedback = validate_code_locally(code, example_inputs, run_timeout)
+        if local_feedback:
+            # Failing code goes straight back to the generator; no reviewer calls are spent on it.
+            print("\n Local validation failed:\n" + "-" *50 + f"\n{local_feedback}\n"+"-"*50)
+            feedback = local_feedback
+            previous_code = code
+            print_call_stats(f"iteration {i+1}", stats)
+            for key in total_stats:
+                total_stats[key] += stats[key]
+            continue
+
         print("\n Submitting code for feedback review..")
-        feedback = get_code_feedback(code, goals)
-        feedback_text = feedback.content.strip()
+        review = review_code(code, goals, stats) if review_mode == "structured" else None
+        if review is not None:
+            feedback_text = format_review(review)
+            approved = review.goals_met
+        else:
+            if review_mode == "structured":
+                print(" Falling back to two-call review...")
+            feedback = get_code_feedback(code, goals, stats)
+            feedback_text = feedback.content.strip()
+            approved = goals_met(feedback_text, goals, stats)
+        feedback = feedback_text
         print("\n Feedback Received:\n" + "-" *50 + f"\n{feedback_text}\n"+"-"*50)
-        
-        if goals_met(feedback_text,goals):
+        print_call_stats(f"iteration {i+1}", stats)
+        for key in total_stats:
+            total_stats[key] += stats[key]
+
+        if approved:
             print(f" LLM Conforms goal met .Stopping iteration")
             break
         print(f"goals not fully met . Preparing for next iteration...")
         previous_code = code
         
+    print_call_stats("total", total_stats)
     final_code = add_comment_header(code, use_case)
     return save_code_to_file(final_code, use_case)
 
@@ -160,7 +380,7 @@ if __name__=="__main__":
     # Eaxmple 1
     # use_case_input = "Write code to find BinaryGap of a given positive integer"
     # goals_input = "Code simple to understand , Functionally correct , Handles comprehensive edge cases, Takes positive integer input only, prints the results with few examples"
-    # run_code_agent(use_case_input, goals_input)
+    # run_code_agent(use_case_input, goals_input, example_inputs=["9", "529", "20"])
     
     # Example 2
     # use_case_input = "Write code to count the number of files in current directory and all its nested directories, and print the total count"
@@ -0,0 +1,244 @@
+import re
+import math
+import time
+from array import array
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from metrics import LatencyStats
+
+# Query path for the context_engineering collection.
+# A question is answered by two retrievers: ANN search over the stored embeddings
+# and an in-process BM25 index over the stored `text` field. BM25 catches exact
+# technical terms (model names, equation labels) that embeddings blur. The two
+# rankings are merged with reciprocal rank fusion, and query embeddings are memoized
+# so a repeated question skips the embedding call.
+
+# Keeps hyphenated/dotted terms such as "gpt-4o", "eq.3" or "bert-base" whole; their
+# parts are indexed too, so "gpt" still matches "gpt-4o".
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+_PARTS = re.compile(r"[-_.]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to was what when where which who why with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = _PARTS.split(token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p and p not in _STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index; documents are referenced by their collection id."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[int] = []
+        self.doc_lengths = array("I")
+        self.total_length = 0
+        # term -> (positions into doc_ids, term frequencies)
+        self.postings: Dict[str, Tuple[array, array]] = defaultdict(lambda: (array("I"), array("I")))
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, doc_id: int, text: str) -> None:
+        tokens = tokenize(text)
+        position = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.doc_lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        for term, tf in Counter(tokens).items():
+            positions, frequencies = self.postings[term]
+            positions.append(position)
+            frequencies.append(tf)
+
+    def add_many(self, rows: Iterable[Tuple[int, str]]) -> None:
+        for doc_id, text in rows:
+            self.add(doc_id, text)
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        if not self.doc_ids:
+            return []
+        n = len(self.doc_ids)
+        avg_length = self.total_length / n or 1.0
+        # Posting arrays are viewed as NumPy buffers, so each term is scored in one vectorized step.
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            positions, frequencies = (np.frombuffer(a, dtype=np.uint32) for a in self.postings[term])
+            idf = math.log(1 + (n - len(positions) + 0.5) / (len(positions) + 0.5))
+            tf = frequencies.astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[positions] / avg_length)
+            scores[positions] += idf * tf * (self.k1 + 1) / (tf + norm)
+        matched = np.flatnonzero(scores)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        best = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.doc_ids[position], float(scores[position])) for position in best]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60,
+                           weights: Optional[Sequence[float]] = None) -> List[Tuple[int, float]]:
+    """Merges ranked id lists: score(d) = sum over rankings of weight / (k + rank of d), rank starting at 1."""
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def iter_collection_texts(client, collection_name: str, batch_size: int = 1000) -> Iterator[Tuple[int, str]]:
+    """Streams (id, text) for every stored chunk, via query_iterator when the client has one."""
+    if hasattr(client, "query_iterator"):
+        iterator = client.query_iterator(collection_name, batch_size=batch_size, filter="id >= 0",
+                                         output_fields=["text"])
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    return
+                for row in rows:
+                    yield row["id"], row["text"]
+        finally:
+            iterator.close()
+    # Paging by primary key (numpy_vector_store returns rows in id order).
+    next_id = 0
+    while True:
+        rows = client.query(collection_name, filter=f"id >= {next_id}", output_fields=["text"], limit=batch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield row["id"], row["text"]
+        next_id = max(row["id"] for row in rows) + 1
+
+
+class HybridRetriever:
+    """
+    Hybrid ANN + BM25 retrieval over a MilvusClient (or numpy_vector_store) collection.
+
+    Each retriever contributes its top `candidates` ids; the fused top `limit` are
+    returned with their text. last_timings holds the per-stage latency of the most
+    recent call in milliseconds; latency_summary() aggregates every call so far.
+    """
+
+    STAGES = ("embed", "ann", "lexical", "fuse")
+
+    def __init__(self, client, collection_name: str, embed_fn: Callable[[List[str]], List[List[float]]],
+                 candidates: int = 50, rrf_k: int = 60, weights: Tuple[float, float] = (1.0, 1.0),
+                 search_params: Optional[dict] = None, cache_size: int = 1024):
+        self.client = client
+        self.collection_name = collection_name
+        self.embed_fn = embed_fn
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.weights = weights
+        self.search_params = search_params
+        self.lexical = BM25Index()
+        self.last_timings: Dict[str, float] = {}
+        self.stage_latency = {stage: LatencyStats() for stage in self.STAGES}
+        self._cached_embed = lru_cache(maxsize=cache_size)(self._embed)
+
+    def build_lexical_index(self, batch_size: int = 1000) -> int:
+        """Indexes every stored chunk's text; returns the number of documents indexed."""
+        start = time.perf_counter()
+        self.lexical = BM25Index()
+        self.lexical.add_many(iter_collection_texts(self.client, self.collection_name, batch_size))
+        print(f"[hybrid] BM25 index over {len(self.lexical)} chunks built in {time.perf_counter() - start:.1f}s")
+        return len(self.lexical)
+
+    def _embed(self, query: str) -> Tuple[float, ...]:
+        return tuple(self.embed_fn([query])[0])
+
+    def embed_query(self, query: str) -> Tuple[float, ...]:
+        # Queries differing only in whitespace share a cache entry.
+        return self._cached_embed(" ".join(query.split()))
+
+    def cache_info(self):
+        return self._cached_embed.cache_info()
+
+    def _fetch_texts(self, ids: List[int]) -> Dict[int, str]:
+        if not ids:
+            return {}
+        rows = self.client.query(self.collection_name, filter=f"id in {ids}", output_fields=["text"])
+        return {row["id"]: row["text"] for row in rows}
+
+    def retrieve(self, query: str, limit: int = 5) -> List[dict]:
+        """
+        Returns up to `limit` chunks as {"id", "text", "score", "vector_rank", "lexical_rank"},
+        best first; a rank is None when that retriever did not return the chunk.
+        """
+        timings = {}
+
+        start = time.perf_counter()
+        vector = self.embed_query(query)
+        timings["embed"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        hits = self.client.search(self.collection_name, [list(vector)], limit=self.candidates,
+                                  output_fields=["text"], anns_field="embedding",
+                                  search_params=self.search_params)[0]
+        timings["ann"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        lexical_hits = self.lexical.search(query, self.candidates)
+        timings["lexical"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vector_ranking = [hit["id"] for hit in hits]
+        lexical_ranking = [doc_id for doc_id, _ in lexical_hits]
+        fused = reciprocal_rank_fusion([vector_ranking, lexical_ranking], k=self.rrf_k, weights=self.weights)[:limit]
+        texts = {hit["id"]: hit["entity"].get("text") for hit in hits}
+        texts.update(self._fetch_texts([doc_id for doc_id, _ in fused if doc_id not in texts]))
+        vector_ranks = {doc_id: rank for rank, doc_id in enumerate(vector_ranking, start=1)}
+        lexical_ranks = {doc_id: rank for rank, doc_id in enumerate(lexical_ranking, start=1)}
+        results = [
+            {"id": doc_id, "text": texts.get(doc_id), "score": score,
+             "vector_rank": vector_ranks.get(doc_id), "lexical_rank": lexical_ranks.get(doc_id)}
+            for doc_id, score in fused
+        ]
+        timings["fuse"] = time.perf_counter() - start
+
+        for stage, seconds in timings.items():
+            self.stage_latency[stage].observe(seconds)
+        self.last_timings = {stage: seconds * 1000 for stage, seconds in timings.items()}
+        self.last_timings["total"] = sum(self.last_timings.values())
+        return results
+
+    def latency_summary(self) -> Dict[str, dict]:
+        return {stage: stats.summary() for stage, stats in self.stage_latency.items()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from context_retrieval import COLLECTION_NAME, client, openai_embedder
+
+    parser = argparse.ArgumentParser(description="Hybrid BM25 + vector search over the context_engineering collection.")
+    parser.add_argument("queries", nargs="+")
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=50)
+    args = parser.parse_args()
+
+    retriever = HybridRetriever(client, COLLECTION_NAME, openai_embedder(), candidates=args.candidates)
+    retriever.build_lexical_index()
+    for question in args.queries:
+        print(f"\n--- {question}")
+        for result in retriever.retrieve(question, args.limit):
+            print(f"[{result['score']:.4f} vec={result['vector_rank']} bm25={result['lexical_rank']}] "
+                  f"{(result['text'] or '')[:120]}")
+        print("timings (ms): " + ", ".join(f"{k}={v:.1f}" for k, v in retriever.last_timings.items()))
@@ -0,0 +1,203 @@
+import re
+import json
+import time
+import random
+import difflib
+from itertools import accumulate
+from array import array
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from metrics import percentile
+
+# Load-once local lookup backend for tool_calling.search_information.
+# Keys are normalized (case, punctuation, whitespace); a query is answered by exact
+# key match first, then by IDF-weighted token overlap through an inverted index,
+# with a fuzzy fallback that maps misspelled query tokens onto the vocabulary.
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it me of on or please tell the to "
+    "was what whats when where which who why with you about".split()
+)
+_NON_WORD = re.compile(r"[^a-z0-9\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+def _content_tokens(normalized: str) -> List[str]:
+    tokens = [t for t in normalized.split(" ") if t and t not in STOPWORDS]
+    return tokens or [t for t in normalized.split(" ") if t]
+
+
+class KnowledgeStore:
+    """
+    In-memory key -> answer store with an inverted index over key tokens.
+
+    min_score is the weighted overlap a token match needs to count as an answer.
+    Candidates are collected from the rarest query tokens first, and collection stops
+    once the remaining tokens could not lift an unseen key to min_score on their own,
+    so common tokens rarely have their (long) posting lists scanned. Lists longer than
+    max_postings are never scanned whole: a query made only of such tokens is answered
+    from the intersection of its two rarest lists.
+    """
+
+    def __init__(self, min_score: float = 0.6, cache_size: int = 4096, max_postings: int = 2_000):
+        self.min_score = min_score
+        self.max_postings = max_postings
+        self.keys: List[str] = []
+        self.answers: List[str] = []
+        self.key_tokens: List[Tuple[str, ...]] = []
+        self.exact: Dict[str, int] = {}
+        self.postings: Dict[str, array] = defaultdict(lambda: array("I"))
+        self.by_prefix: Dict[str, set] = defaultdict(set)
+        self._idf_cache: Dict[str, float] = {}
+        self._cached_lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "KnowledgeStore":
+        """Loads a JSONL file of {"key": ..., "answer": ...} lines, or a JSON object mapping keys to answers."""
+        store = cls(**kwargs)
+        with open(path) as f:
+            if path.endswith(".jsonl"):
+                store.add_many((r["key"], r["answer"]) for r in map(json.loads, filter(str.strip, f)))
+            else:
+                store.add_many(json.load(f).items())
+        return store
+
+    def add_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        for key, answer in items:
+            self._add(key, answer)
+        self._idf_cache.clear()
+        self._cached_lookup.cache_clear()
+
+    def add(self, key: str, answer: str) -> None:
+        self._add(key, answer)
+        self._idf_cache.clear()
+        self._cached_lookup.cache_clear()
+
+    def _add(self, key: str, answer: str) -> None:
+        normalized = normalize(key)
+        if normalized in self.exact:
+            self.answers[self.exact[normalized]] = answer
+            return
+        entry_id = len(self.keys)
+        tokens = tuple(dict.fromkeys(_content_tokens(normalized)))
+        self.keys.append(normalized)
+        self.answers.append(answer)
+        self.key_tokens.append(tokens)
+        self.exact[normalized] = entry_id
+        for token in tokens:
+            if token not in self.postings:
+                self.by_prefix[token[:2]].add(token)
+            self.postings[token].append(entry_id)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _idf(self, token: str) -> float:
+        idf = self._idf_cache.get(token)
+        if idf is None:
+            df = len(self.postings[token]) if token in self.postings else 0
+            idf = self._idf_cache[token] = 1.0 + (len(self.keys) / (1 + df)) ** 0.5
+        return idf
+
+    def _correct(self, token: str) -> Optional[str]:
+        if token in self.postings:
+            return token
+        close = difflib.get_close_matches(token, self.by_prefix.get(token[:2], ()), n=1, cutoff=0.8)
+        return close[0] if close else None
+
+    def _lookup(self, normalized: str) -> Optional[str]:
+        entry_id = self.exact.get(normalized)
+        if entry_id is not None:
+            return self.answers[entry_id]
+
+        query_tokens = [t for t in map(self._correct, dict.fromkeys(_content_tokens(normalized))) if t]
+        if not query_tokens:
+            return None
+        weights = {t: self._idf(t) for t in query_tokens}
+        query_weight = sum(weights.values())
+
+        # A key sharing none of the tokens scanned so far scores at most remaining / query_weight.
+        candidates = set()
+        remaining = query_weight
+        by_rarity = sorted(query_tokens, key=lambda t: len(self.postings[t]))
+        for token in by_rarity:
+            if remaining / query_weight < self.min_score or len(self.postings[token]) > self.max_postings:
+                break
+            candidates.update(self.postings[token])
+            remaining -= weights[token]
+        if not candidates and len(by_rarity) > 1:
+            candidates = set(self.postings[by_rarity[0]]).intersection(self.postings[by_rarity[1]])
+
+        best_id, best_score = None, 0.0
+        for candidate in candidates:
+            entry_tokens = self.key_tokens[candidate]
+            matched = sum(weights[t] for t in entry_tokens if t in weights)
+            entry_weight = sum(map(self._idf, entry_tokens))
+            # Weighted Jaccard between query and key tokens.
+            score = matched / (query_weight + entry_weight - matched)
+            if score > best_score:
+                best_id, best_score = candidate, score
+        if best_id is None or best_score < self.min_score:
+            return None
+        return self.answers[best_id]
+
+    def lookup(self, query: str) -> Optional[str]:
+        """Returns the best matching answer, or None when nothing matches well enough."""
+        return self._cached_lookup(normalize(query))
+
+
+def _benchmark(sizes: Iterable[int], queries: int = 2000, seed: int = 7) -> None:
+    """Lookup latency by store size for exact hits, reworded hits, misses and cached repeats."""
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9)))
+                  for _ in range(200_000)]
+    # Zipf-distributed word choice, so a few tokens are very common and most are rare.
+    cum_weights = list(accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    def make_key():
+        return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(2, 5)))
+
+    print(f"{'entries':>9} {'build s':>8} " + " ".join(f"{name + ' p50/p99 us':>22}"
+                                                       for name in ("exact", "reworded", "miss", "cached")))
+    for size in sizes:
+        start = time.perf_counter()
+        store = KnowledgeStore(cache_size=queries)
+        store.add_many((make_key(), f"answer {i}") for i in range(size))
+        build = time.perf_counter() - start
+
+        picks = [rng.randrange(len(store)) for _ in range(queries)]
+        workloads = {
+            "exact": [store.keys[i] for i in picks],
+            "reworded": ["what is the " + " ".join(reversed(store.keys[i].split())) + "?" for i in picks],
+            "miss": [make_key() + " zzqx" for _ in range(queries)],
+        }
+        workloads["cached"] = workloads["reworded"]
+        cells = []
+        for name, workload in workloads.items():
+            if name != "cached":
+                store._cached_lookup.cache_clear()
+            else:
+                for query in workload:
+                    store.lookup(query)
+            samples = []
+            for query in workload:
+                t = time.perf_counter()
+                store.lookup(query)
+                samples.append(time.perf_counter() - t)
+            cells.append(f"{percentile(samples, 50) * 1e6:>10.1f}/{percentile(samples, 99) * 1e6:<11.1f}")
+        print(f"{size:>9} {build:>8.1f} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Micro-benchmark KnowledgeStore lookups as the store grows.")
+    parser.add_argument("--max-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+    _benchmark([n for n in (1_000, 10_000, 100_000, 1_000_000) if n <= args.max_size])
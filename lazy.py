@@ -0,0 +1,33 @@
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+# Lazily built module attributes.
+#
+# Pattern modules must stay cheap to import: model clients pull in their provider
+# SDKs (a second or more each) and may need API keys, so they are created on first
+# use instead. A module declares its factories once:
+#
+#     _lazy, __getattr__ = lazy_attributes(globals(), {"llm": _create_llm, ...})
+#
+# `module.llm` (PEP 562 module __getattr__) and `_lazy("llm")` inside the module
+# build the value once and store it as a plain module global. Assigning the global
+# (module.llm = FakeChatModel(...)) before first use swaps it for every caller.
+
+
+def lazy_attributes(module_globals: dict, factories: Dict[str, Callable[[], Any]]) -> Tuple[Callable[[str], Any], Callable[[str], Any]]:
+    """Returns (get, __getattr__) for the module whose globals() is passed in."""
+    lock = threading.RLock()  # reentrant: factories may get() other lazy attributes
+
+    def get(name: str) -> Any:
+        if name not in module_globals:
+            with lock:
+                if name not in module_globals:
+                    module_globals[name] = factories[name]()
+        return module_globals[name]
+
+    def __getattr__(name: str) -> Any:
+        if name in factories:
+            return get(name)
+        raise AttributeError(f"module {module_globals['__name__']!r} has no attribute {name!r}")
+
+    return get, __getattr__
@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import time
+import atexit
+import sqlite3
+import hashlib
+import warnings
+import threading
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.globals import set_llm_cache
+from langchain_core.load import dumps, loads
+
+# Persistent exact-match response cache for LangChain chat models.
+#
+# Every pattern script can enable it with a single setting:
+#     LLM_CACHE_PATH=.llm_cache.sqlite python routing.py
+# Optional knobs: LLM_CACHE_TTL (seconds), LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_MB,
+# LLM_CACHE_ALL_TEMPERATURES=1 (also cache non-deterministic, temperature > 0 calls).
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    provider TEXT,
+    model TEXT,
+    temperature REAL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    latency REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+)
+"""
+_TEMPERATURE_PARAM = re.compile(r"\('temperature', ([0-9.]+)\)")
+
+
+def describe_llm_string(llm_string: str) -> Tuple[Optional[str], Optional[str], Optional[float]]:
+    """Extracts (provider, model, temperature) from LangChain's llm_string, best effort."""
+    serialized, _, params = llm_string.partition("---")
+    provider = model = temperature = None
+    try:
+        data = json.loads(serialized)
+        provider = (data.get("id") or [None])[-1]
+        kwargs = data.get("kwargs", {})
+        model = kwargs.get("model_name") or kwargs.get("model")
+        temperature = kwargs.get("temperature")
+    except (ValueError, AttributeError):
+        pass
+    # Call-time overrides such as llm.bind(temperature=...) end up in the param string.
+    override = _TEMPERATURE_PARAM.search(params)
+    if override:
+        temperature = float(override.group(1))
+    return provider, model, temperature
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Canonical JSON for serialized messages, with volatile per-message ids dropped."""
+    try:
+        data = json.loads(prompt)
+    except ValueError:
+        return prompt
+
+    def strip_ids(node):
+        # Message ids are plain strings; the serializer's class paths (also under "id") are lists and stay.
+        if isinstance(node, dict):
+            return {k: strip_ids(v) for k, v in node.items() if k != "id" or not isinstance(v, (str, type(None)))}
+        if isinstance(node, list):
+            return [strip_ids(v) for v in node]
+        return node
+
+    return json.dumps(strip_ids(data), sort_keys=True, separators=(",", ":"))
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    On-disk LLM cache keyed by provider, model, temperature (the full llm_string)
+    and the normalized messages.
+
+    Safe to share between processes: SQLite in WAL mode, one short-lived connection
+    per operation and a busy timeout. Entries expire after ttl seconds and the least
+    recently used ones are evicted beyond max_entries / max_bytes.
+    """
+
+    def __init__(self, path: str = ".llm_cache.sqlite", ttl: Optional[float] = None,
+                 max_entries: Optional[int] = 10_000, max_bytes: Optional[int] = 256 * 1024 * 1024,
+                 deterministic_only: bool = True, pending_timeout: float = 600.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.deterministic_only = deterministic_only
+        self.pending_timeout = pending_timeout
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0,
+                      "evictions": 0, "expired": 0, "latency_saved_s": 0.0}
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache(last_access)")
+
+    @contextmanager
+    def _connect(self):
+        """One short transaction on a fresh connection, committed on success and always closed."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA busy_timeout=30000")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{normalize_prompt(prompt)}".encode()).hexdigest()
+
+    def _cacheable(self, temperature: Optional[float]) -> bool:
+        return not self.deterministic_only or temperature == 0
+
+    def _count(self, name: str, amount=1) -> None:
+        with self._lock:
+            self.stats[name] += amount
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        _, _, temperature = describe_llm_string(llm_string)
+        if not self._cacheable(temperature):
+            self._count("bypassed")
+            return None
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, latency, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and row[2] < now - self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._count("expired")
+                row = None
+            if row is None:
+                self._count("misses")
+                self._start_pending(key)
+                return None
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self.stats["hits"] += 1
+            self.stats["latency_saved_s"] += row[1]
+        with warnings.catch_warnings():
+            # loads() is flagged beta; the payload is our own dumps() output.
+            warnings.simplefilter("ignore")
+            return loads(row[0])
+
+    def _start_pending(self, key: str) -> None:
+        # A miss is timed until its update(). A call that fails in between never reaches
+        # the cache again (BaseCache has no error hook), so its entry is dropped here
+        # once it is older than any call could take.
+        started = time.perf_counter()
+        with self._lock:
+            stale = [k for k, t in self._pending.items() if t < started - self.pending_timeout]
+            for k in stale:
+                del self._pending[k]
+            self._pending[key] = started
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        provider, model, temperature = describe_llm_string(llm_string)
+        if not self._cacheable(temperature):
+            return
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            started = self._pending.pop(key, None)
+        latency = time.perf_counter() - started if started is not None else 0.0
+        value = dumps(return_val)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(key, provider, model, temperature, value, size, latency, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, temperature, value, len(value), latency, now, now),
+            )
+            self._evict(conn)
+        self._count("stores")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        if self.ttl is not None:
+            expired = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+            self._count("expired", expired)
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        evicted = 0
+        while (self.max_entries is not None and count > self.max_entries) or \
+                (self.max_bytes is not None and total > self.max_bytes):
+            # Least recently used first, in small pages so a large cache is never loaded at once.
+            oldest = conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access LIMIT 64").fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                if not ((self.max_entries is not None and count > self.max_entries) or
+                        (self.max_bytes is not None and total > self.max_bytes)):
+                    break
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                count -= 1
+                total -= size
+                evicted += 1
+        if evicted:
+            self._count("evictions", evicted)
+
+    def clear(self, **kwargs) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    def format_stats(self) -> str:
+        s = self.stats
+        lookups = s["hits"] + s["misses"]
+        hit_rate = s["hits"] / lookups if lookups else 0.0
+        return (f"LLM cache {self.path}: {s['hits']} hits, {s['misses']} misses ({hit_rate:.0%} hit rate), "
+                f"{s['bypassed']} bypassed, {s['evictions']} evicted, "
+                f"{s['latency_saved_s']:.2f}s of LLM latency saved")
+
+
+def enable_llm_cache(path: str = ".llm_cache.sqlite", report_on_exit: bool = True, **kwargs) -> SQLiteLLMCache:
+    """Installs a SQLiteLLMCache as the global LangChain cache."""
+    cache = SQLiteLLMCache(path, **kwargs)
+    set_llm_cache(cache)
+    if report_on_exit:
+        atexit.register(lambda: print(cache.format_stats()))
+    return cache
+
+
+def enable_llm_cache_from_env() -> Optional[SQLiteLLMCache]:
+    """Enables the cache when LLM_CACHE_PATH is set; a no-op otherwise."""
+    path = os.getenv("LLM_CACHE_PATH")
+    if not path:
+        return None
+    ttl = os.getenv("LLM_CACHE_TTL")
+    max_entries = os.getenv("LLM_CACHE_MAX_ENTRIES")
+    max_mb = os.getenv("LLM_CACHE_MAX_MB")
+    return enable_llm_cache(
+        path,
+        ttl=float(ttl) if ttl else None,
+        max_entries=int(max_entries) if max_entries else 10_000,
+        max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb else 256 * 1024 * 1024,
+        deterministic_only=os.getenv("LLM_CACHE_ALL_TEMPERATURES", "") not in ("1", "true", "yes"),
+    )
@@ -0,0 +1,406 @@
+import os
+import re
+import json
+import math
+import zlib
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from metrics import LatencyStats
+
+# Local first-stage router for routing.py.
+# A regex rule table catches the obvious requests; a hashed n-gram naive Bayes
+# model scores the rest. Only requests below the confidence threshold go to the
+# LLM router, and its decisions are logged so the local model keeps learning.
+
+ROUTES = ("booker", "info", "unclear")
+
+# (pattern, route, confidence); the first matching rule wins. Booking rules only
+# fire on imperative or request forms ("Book me...", "Can you reserve..."), not on
+# any text that mentions booking and a hotel.
+_BOOKABLE = r"(flights?|hotels?|rooms?|tickets?|seats?)"
+DEFAULT_RULES: List[Tuple[str, str, float]] = [
+    (rf"^\s*(please\s+)?(book|reserve)\b[^.?!]*\b{_BOOKABLE}\b", "booker", 0.99),
+    (rf"^\s*((can|could|would|will)\s+you\s+(please\s+)?|i('d|\s+would)\s+like\s+to\s+|i\s+(want|need)\s+to\s+)"
+     rf"(book|reserve)\b[^.?!]*\b{_BOOKABLE}\b", "booker", 0.97),
+    (r"^\s*(maybe( later)?|hmm+|ok(ay)?|idk|not sure|later|whatever|nothing)\W*$", "unclear", 0.97),
+    # A bare word ("reserve", "room") names no request; the n-gram model is overconfident on it.
+    (r"^\W*\w+\W*$", "unclear", 0.95),
+    (r"^\s*(what|who|where|when|which|how|why)\b[^?]*\?\s*$", "info", 0.93),
+]
+
+# A rule for a route is skipped (the model, then the LLM, decides) when its guard
+# matches: negated requests ("I don't want to book...") and questions about booking
+# for booker; questions that carry a booking request ("Who can book me a flight?") for info.
+DEFAULT_RULE_GUARDS: Dict[str, str] = {
+    "booker": r"\b(not|don'?t|doesn'?t|never|no need|without|instead of)\b"
+              r"|^\s*(what|who|where|when|which|how|why|describe|explain|tell me)\b",
+    "info": rf"\b(book|reserve)\b[^?]*\b{_BOOKABLE}\b",
+}
+
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("Book me a flight to London", "booker"),
+    ("I need a hotel in Paris for two nights", "booker"),
+    ("Reserve a room near the airport", "booker"),
+    ("Find me a cheap flight to New York next Friday", "booker"),
+    ("Can you book a hotel for my trip to Rome", "booker"),
+    ("Get me two tickets on the morning flight to Berlin", "booker"),
+    ("Cancel my hotel reservation", "booker"),
+    ("Who can book me a flight to Paris?", "booker"),
+    ("What is the capital of Italy?", "info"),
+    ("Tell me about the history of the Eiffel Tower", "info"),
+    ("How tall is Mount Everest", "info"),
+    ("Explain how jet engines work", "info"),
+    ("Who wrote Pride and Prejudice", "info"),
+    ("What's the weather like in Tokyo", "info"),
+    ("Define photosynthesis", "info"),
+    ("Maybe later", "unclear"),
+    ("hmm", "unclear"),
+    ("I don't know", "unclear"),
+    ("Do the thing", "unclear"),
+    ("asdf", "unclear"),
+    ("Not sure yet", "unclear"),
+    ("Book a table for two at an Italian restaurant tonight", "booker"),
+    ("I want to fly to Amsterdam on the 14th", "booker"),
+    ("Please get me a hotel near the conference centre", "booker"),
+    ("Reserve two seats for the 7pm show", "booker"),
+    ("Can you get me on the next train to Manchester", "booker"),
+    ("Find a hotel in Barcelona under 150 euros a night", "booker"),
+    ("I'd like to book a double room for three nights", "booker"),
+    ("Move my flight to Thursday morning", "booker"),
+    ("Upgrade my seat to business class", "booker"),
+    ("Book a rental car at the Denver airport", "booker"),
+    ("I need a flight from Boston to Seattle next week", "booker"),
+    ("Cancel my flight to Dublin", "booker"),
+    ("Get me a hotel room in Tokyo for the weekend", "booker"),
+    ("Please book the cheapest flight to Rome in May", "booker"),
+    ("Could you reserve a room with a sea view", "booker"),
+    ("Add an extra night to my hotel booking", "booker"),
+    ("Find me a return flight to Singapore", "booker"),
+    ("Book me into the Marriott downtown for Friday", "booker"),
+    ("I need two tickets to the concert on Saturday", "booker"),
+    ("Change my hotel check-in date to the 3rd", "booker"),
+    ("Schedule a taxi to the airport for 6am", "booker"),
+    ("Book a window seat on my flight to Oslo", "booker"),
+    ("What is the tallest building in the world?", "info"),
+    ("Tell me about the history of Rome", "info"),
+    ("How does a credit card work", "info"),
+    ("Explain the theory of relativity", "info"),
+    ("Who invented the telephone", "info"),
+    ("What language do they speak in Brazil", "info"),
+    ("How many people live in Tokyo", "info"),
+    ("Why do planes fly so high", "info"),
+    ("What is the best time of year to visit Japan", "info"),
+    ("Describe the climate of Iceland", "info"),
+    ("Tell me some facts about octopuses", "info"),
+    ("What's the difference between a virus and a bacterium", "info"),
+    ("How do hotels decide their prices", "info"),
+    ("Explain how airline loyalty programs work", "info"),
+    ("When did the first airplane fly", "info"),
+    ("What currency is used in Switzerland", "info"),
+    ("Summarize the causes of World War One", "info"),
+    ("What does GDP mean", "info"),
+    ("How long is the Great Wall of China", "info"),
+    ("Tell me about the culture of Morocco", "info"),
+    ("Where is the Louvre", "info"),
+    ("What are the main sights in Prague", "info"),
+    ("I'm not sure what I want", "unclear"),
+    ("Can you do something for me", "unclear"),
+    ("that one", "unclear"),
+    ("um, the other thing", "unclear"),
+    ("never mind", "unclear"),
+    ("hi there", "unclear"),
+    ("you know what I mean", "unclear"),
+    ("just do it", "unclear"),
+    ("same as last time", "unclear"),
+]
+
+# Held-out examples, never trained on. LocalRouter.calibrate uses them to pick the
+# model confidence above which its predictions may skip the LLM; with too few of them
+# (or a weak model) no confidence qualifies and every model guess goes to the LLM. The last block are
+# past misroutes, kept as regressions (python local_router.py checks them).
+REGRESSION_EXAMPLES: List[Tuple[str, str]] = [
+    ("Describe the booking process for hotels", "info"),
+    ("I don't want to book anything, just tell me about Paris", "info"),
+    ("reserve", "unclear"),
+    ("Tell me about flights", "info"),
+    ("Which of you can reserve a hotel room for me in Rome?", "booker"),
+]
+
+CALIBRATION_EXAMPLES: List[Tuple[str, str]] = [
+    ("Book two seats on the train to Paris", "booker"),
+    ("Please reserve a table for four at eight", "booker"),
+    ("I'd like a hotel room in Madrid for the weekend", "booker"),
+    ("Can you find me a flight to Lisbon tomorrow", "booker"),
+    ("Get me a room at the Hilton for Tuesday", "booker"),
+    ("Change my flight to the evening one", "booker"),
+    ("I need to fly to Chicago on Monday, book it", "booker"),
+    ("Who painted the Mona Lisa?", "info"),
+    ("How far is the moon from the earth", "info"),
+    ("Tell me about the Roman empire", "info"),
+    ("What time zone is Sydney in", "info"),
+    ("Explain what a hotel star rating means", "info"),
+    ("How do airlines price their flights?", "info"),
+    ("What is the population of Canada", "info"),
+    ("Why is the sky blue", "info"),
+    ("Summarize the plot of Hamlet", "info"),
+    ("uh", "unclear"),
+    ("Something", "unclear"),
+    ("Can you help", "unclear"),
+    ("Whatever works", "unclear"),
+    ("the thing from before", "unclear"),
+    ("?", "unclear"),
+    ("Book me a flight to Athens on Friday", "booker"),
+    ("Reserve a hotel room in Vienna for two nights", "booker"),
+    ("I need a hotel near Heathrow tonight", "booker"),
+    ("Please cancel my hotel reservation in Paris", "booker"),
+    ("Can you book two tickets to the match", "booker"),
+    ("Find me a flight to Toronto next Monday", "booker"),
+    ("Get me a seat on the earliest flight to Madrid", "booker"),
+    ("I'd like to reserve a room for my parents", "booker"),
+    ("Book the hotel we stayed at last year", "booker"),
+    ("Change my return flight to Sunday", "booker"),
+    ("I want a hotel in Lisbon with a pool", "booker"),
+    ("Add a checked bag to my flight", "booker"),
+    ("Tell me about the history of Egypt", "info"),
+    ("What is the capital of Spain?", "info"),
+    ("Explain how vaccines work", "info"),
+    ("How tall is the Eiffel Tower", "info"),
+    ("Who wrote War and Peace", "info"),
+    ("What is the weather usually like in Lisbon in March", "info"),
+    ("Describe the architecture of Barcelona", "info"),
+    ("How do jet lag and time zones work", "info"),
+    ("What is the longest river in Africa", "info"),
+    ("Tell me about the Great Barrier Reef", "info"),
+    ("Explain the rules of cricket", "info"),
+    ("What is the population of Germany", "info"),
+    ("hmm, not sure", "unclear"),
+    ("okay", "unclear"),
+    ("maybe", "unclear"),
+    ("the usual", "unclear"),
+    ("hey", "unclear"),
+    ("do that again", "unclear"),
+    ("I don't know yet", "unclear"),
+    ("room", "unclear"),
+    ("Cancel my room booking for next week", "booker"),
+    ("Find a hotel in Florence for the 10th to the 12th", "booker"),
+    ("I need a flight home on Sunday evening", "booker"),
+    ("Change my seat to an aisle", "booker"),
+    ("Get me a cheap hotel in Berlin tonight", "booker"),
+    ("I want two tickets to Paris on the train", "booker"),
+    ("Move my hotel reservation to next Friday", "booker"),
+    ("Find me a flight from London to Dubai", "booker"),
+    ("I need a room for four people in Prague", "booker"),
+    ("Cancel the hotel in Rome and find one in Naples", "booker"),
+    ("Get me on a flight to Miami tomorrow", "booker"),
+    ("I'd like a flight to Vancouver in June", "booker"),
+    ("Tell me about the history of Japan", "info"),
+    ("Tell me about the museums in Madrid", "info"),
+    ("How tall is Big Ben", "info"),
+    ("How many countries are in Africa", "info"),
+    ("Explain how solar panels work", "info"),
+    ("Who discovered penicillin", "info"),
+    ("What is the capital of Australia", "info"),
+    ("Describe the food of Thailand", "info"),
+    ("Tell me about the Eiffel Tower", "info"),
+    ("What language is spoken in Austria", "info"),
+    ("Explain how hotels rate their rooms", "info"),
+    ("How do I get from the airport to the city centre in Rome", "info"),
+    ("Tell me some facts about flights over the Atlantic", "info"),
+    ("I don't know what to do", "unclear"),
+    ("hmm, maybe", "unclear"),
+    ("not sure about that", "unclear"),
+    ("can you just do it", "unclear"),
+    ("that thing", "unclear"),
+    ("you decide", "unclear"),
+    ("something else", "unclear"),
+] + REGRESSION_EXAMPLES
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+def _features(text: str, n_buckets: int) -> List[int]:
+    """Hashed word unigrams, word bigrams and in-word character trigrams."""
+    words = _TOKEN.findall(text.lower())
+    grams = list(words)
+    grams += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"^{w}$"
+        grams += [f"#{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    # crc32 rather than hash(): stable across processes, so logs and models stay compatible.
+    return [zlib.crc32(g.encode()) % n_buckets for g in grams]
+
+
+class HashedNgramClassifier:
+    """Multinomial naive Bayes over hashed n-gram features; supports incremental updates."""
+
+    def __init__(self, labels: Iterable[str], n_buckets: int = 1 << 18, alpha: float = 0.5):
+        self.labels = list(labels)
+        self.n_buckets = n_buckets
+        self.alpha = alpha
+        self.feature_counts: Dict[str, Dict[int, int]] = {label: defaultdict(int) for label in self.labels}
+        self.total_features = {label: 0 for label in self.labels}
+        self.doc_counts = {label: 0 for label in self.labels}
+
+    def partial_fit(self, text: str, label: str) -> None:
+        counts = self.feature_counts[label]
+        for f in _features(text, self.n_buckets):
+            counts[f] += 1
+            self.total_features[label] += 1
+        self.doc_counts[label] += 1
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "HashedNgramClassifier":
+        for text, label in examples:
+            self.partial_fit(text, label)
+        return self
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        features = _features(text, self.n_buckets)
+        n_docs = sum(self.doc_counts.values())
+        scores = {}
+        for label in self.labels:
+            counts = self.feature_counts[label]
+            denominator = math.log(self.total_features[label] + self.alpha * self.n_buckets)
+            prior = math.log((self.doc_counts[label] + 1) / (n_docs + len(self.labels)))
+            scores[label] = prior + sum(math.log(counts.get(f, 0) + self.alpha) - denominator for f in features)
+        top = max(scores.values())
+        exp_scores = {label: math.exp(s - top) for label, s in scores.items()}
+        norm = sum(exp_scores.values())
+        return {label: v / norm for label, v in exp_scores.items()}
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        Returns (label, confidence). Naive Bayes posteriors are overconfident on text it
+        has barely seen, so the posterior is scaled by the fraction of features seen in training.
+        """
+        proba = self.predict_proba(text)
+        label = max(proba, key=proba.get)
+        features = _features(text, self.n_buckets)
+        if not features:
+            return label, 0.0
+        seen = sum(1 for f in features if any(f in counts for counts in self.feature_counts.values()))
+        return label, proba[label] * seen / len(features)
+
+
+class LocalRouter:
+    """Rule table + hashed n-gram classifier, loaded once and retrained from logged LLM decisions."""
+
+    def __init__(self, threshold: float = 0.9, rules: List[Tuple[str, str, float]] = DEFAULT_RULES,
+                 log_path: Optional[str] = None, rule_guards: Dict[str, str] = DEFAULT_RULE_GUARDS):
+        self.threshold = threshold
+        # Model predictions need this confidence to skip the LLM; calibrate() raises it.
+        self.model_threshold = threshold
+        self.rules = [(re.compile(pattern, re.IGNORECASE), route, conf) for pattern, route, conf in rules]
+        self.rule_guards = {route: re.compile(pattern, re.IGNORECASE) for route, pattern in rule_guards.items()}
+        self.log_path = log_path
+        self.model = HashedNgramClassifier(ROUTES)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, log_path: Optional[str] = None, threshold: float = 0.9) -> "LocalRouter":
+        router = cls(threshold=threshold, log_path=log_path)
+        router.model.fit(SEED_EXAMPLES)
+        if log_path and os.path.exists(log_path):
+            with open(log_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("route") in ROUTES:
+                        router.model.partial_fit(record["request"], record["route"])
+        router.calibrate(CALIBRATION_EXAMPLES)
+        return router
+
+    def calibrate(self, examples: Iterable[Tuple[str, str]], precision: float = 0.95, min_support: int = 10) -> float:
+        """
+        Sets model_threshold from held-out (text, route) examples: the lowest model
+        confidence at which at least `precision` of the examples scored at or above it
+        are routed correctly, over at least min_support examples. Examples a rule
+        answers never reach the model and are left out. If no confidence qualifies,
+        the model never skips the LLM. Returns model_threshold.
+        """
+        predictions = [(self.predict(text), label) for text, label in examples]
+        scored = sorted(((route, confidence, label) for (route, confidence, source), label in predictions
+                         if source == "model"), key=lambda r: r[1], reverse=True)
+        cutoff, correct = math.inf, 0
+        for n, (predicted, confidence, label) in enumerate(scored, start=1):
+            correct += predicted == label
+            at_boundary = n == len(scored) or scored[n][1] < confidence
+            if at_boundary and n >= min_support and correct / n >= precision:
+                cutoff = confidence
+        self.model_threshold = max(self.threshold, cutoff)
+        return self.model_threshold
+
+    def predict(self, text: str) -> Tuple[str, float, str]:
+        """Returns (route, confidence, source) where source is 'rule' or 'model'."""
+        for pattern, route, confidence in self.rules:
+            guard = self.rule_guards.get(route)
+            if pattern.search(text) and not (guard and guard.search(text)):
+                return route, confidence, "rule"
+        with self._lock:
+            route, confidence = self.model.predict(text)
+        return route, confidence, "model"
+
+    def accepts(self, confidence: float, source: str) -> bool:
+        """Whether a local prediction is confident enough to skip the LLM router."""
+        return confidence >= (self.threshold if source == "rule" else self.model_threshold)
+
+    def record_llm_decision(self, text: str, route: str) -> None:
+        """Feeds an LLM routing decision back into the model and appends it to the training log."""
+        route = route.strip().strip("'\".").lower()
+        if route not in ROUTES:
+            return
+        with self._lock:
+            self.model.partial_fit(text, route)
+            if self.log_path:
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps({"request": text, "route": route}) + "\n")
+
+
+class RoutingMetrics:
+    """Fraction of requests routed locally and end-to-end routing latency."""
+
+    def __init__(self):
+        self.sources = defaultdict(int)
+        self.latency = LatencyStats()
+        self._lock = threading.Lock()
+
+    def observe(self, source: str, seconds: float) -> None:
+        with self._lock:
+            self.sources[source] += 1
+        self.latency.observe(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            total = sum(self.sources.values())
+            local = total - self.sources.get("llm", 0)
+        latency = self.latency.summary()
+        return {
+            "requests": total,
+            "local_fraction": local / total if total else 0.0,
+            "p50_ms": latency["p50_ms"],
+            "p99_ms": latency["p99_ms"],
+        }
+
+
+if __name__ == "__main__":
+    import sys
+
+    router = LocalRouter.load()
+    print(f"model threshold after calibration: {router.model_threshold:.4f} (rules: {router.threshold})")
+    predictions = [(router.predict(text), label) for text, label in CALIBRATION_EXAMPLES]
+    model_side = [(route, label) for (route, confidence, source), label in predictions
+                  if source == "model" and router.accepts(confidence, source)]
+    print(f"held-out: {len(model_side)}/{len(predictions)} answered by the model without the LLM, "
+          f"{sum(route == label for route, label in model_side)} of them correct")
+    misroutes = 0
+    for text, expected in REGRESSION_EXAMPLES:
+        route, confidence, source = router.predict(text)
+        local = router.accepts(confidence, source)
+        wrong = local and route != expected
+        misroutes += wrong
+        print(f"{'MISROUTE' if wrong else 'ok':<8} {text!r}: {route} {confidence:.3f} via {source}"
+              f"{'' if local else ' -> LLM'} (expected {expected})")
+    sys.exit(1 if misroutes else 0)
@@ -0,0 +1,45 @@
+import math
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+
+def percentile(values: Iterable[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]. Returns 0.0 for no samples."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class LatencyStats:
+    """Thread-safe latency recorder over a sliding window of the most recent samples (seconds)."""
+
+    def __init__(self, window: Optional[int] = 10_000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            samples = list(self._samples)
+        return percentile(samples, q)
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            samples = list(self._samples)
+        return {
+            "count": self.count,
+            "mean_ms": 1000 * self.total / self.count if self.count else 0.0,
+            "p50_ms": 1000 * percentile(samples, 50),
+            "p95_ms": 1000 * percentile(samples, 95),
+            "p99_ms": 1000 * percentile(samples, 99),
+        }
@@ -0,0 +1,36 @@
+from typing import Dict, Optional, Tuple
+
+# List prices in USD per 1M tokens as (input, output), for cost estimates and telemetry.
+# Update these when providers change their pricing; unknown models cost 0.
+
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4-turbo": (10.00, 30.00),
+    "claude-3-5-sonnet-latest": (3.00, 15.00),
+    "claude-3-5-haiku-latest": (0.80, 4.00),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token) for when no tokenizer is at hand."""
+    return len(text) // 4 + 1
+
+
+def model_price(model: str) -> Optional[Tuple[float, float]]:
+    # Versioned names such as "gemini-2.5-flash-001" fall back to their base model.
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    matches = [name for name in MODEL_PRICES if model.startswith(name)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    price = model_price(model)
+    if price is None:
+        return 0.0
+    return (input_tokens * price[0] + output_tokens * price[1]) / 1_000_000
@@ -0,0 +1,346 @@
+import os
+import re
+import json
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Local, dependency-light alternative to Milvus Lite for the context_engineering collection.
+#
+# Each collection is a directory holding:
+#   meta.json          dimension, metric, row count, IVF state
+#   vectors.f32        float32 [capacity, dim] memory-mapped matrix, L2-normalized for COSINE
+#   rows.jsonl         one JSON object of scalar fields per row (id, text, content_hash, ...)
+#   rows.idx           int64 byte offsets into rows.jsonl, so rows are read on demand
+#   ivf_*.npy          optional k-means coarse quantizer and inverted lists
+#
+# The client mirrors the MilvusClient calls used in this repo: has_collection,
+# create_collection, insert, search and query.
+
+_IN_FILTER = re.compile(r"^\s*(\w+)\s+in\s+(\[.*\])\s*$", re.DOTALL)
+_ID_GTE_FILTER = re.compile(r"^\s*id\s*>=\s*(-?\d+)\s*$")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, ids: np.ndarray, k: int):
+    """Per-row top-k of a [queries, candidates] score matrix, sorted by descending score."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), np.float32), np.empty((scores.shape[0], 0), np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    top_ids = ids[part] if ids.ndim == 1 else np.take_along_axis(ids, part, axis=1)
+    return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(top_ids, order, axis=1)
+
+
+class _Collection:
+    def __init__(self, path: str, indexed_fields: Iterable[str]):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.dim = self.meta["dimension"]
+        self.vector_field = self.meta["vector_field"]
+        self.normalized = self.meta["metric_type"] == "COSINE"
+        self._open_vectors(self.meta["capacity"])
+        self._discard_uncommitted_rows()
+        self.offsets = self._load_offsets()
+        self.indexes: Dict[str, Dict[object, List[int]]] = {name: {} for name in indexed_fields}
+        if self.indexes:
+            for row_id, row in enumerate(self._scan_rows()):
+                self._index_row(row_id, row)
+        self.ivf = self._load_ivf()
+
+    # storage
+    def _open_vectors(self, capacity: int) -> None:
+        path = os.path.join(self.path, "vectors.f32")
+        with open(path, "ab") as f:
+            f.truncate(max(1, capacity) * self.dim * 4)
+        self.vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(max(1, capacity), self.dim))
+
+    def _discard_uncommitted_rows(self) -> None:
+        """
+        insert appends to rows.jsonl and rows.idx before meta.json commits the new
+        count, so a crash in between leaves rows past `count`. Truncate both files back
+        to the committed rows, or the next insert's offsets would follow the stale ones.
+        """
+        idx_path, rows_path = os.path.join(self.path, "rows.idx"), os.path.join(self.path, "rows.jsonl")
+        if not os.path.exists(idx_path):
+            return
+        if os.path.getsize(idx_path) > self.count * 8:
+            with open(idx_path, "r+b") as f:
+                f.truncate(self.count * 8)
+        rows_end = 0
+        if self.count:
+            last = int(np.fromfile(idx_path, dtype=np.int64, count=1, offset=(self.count - 1) * 8)[0])
+            with open(rows_path, "rb") as f:
+                f.seek(last)
+                rows_end = last + len(f.readline())
+        if os.path.exists(rows_path) and os.path.getsize(rows_path) > rows_end:
+            with open(rows_path, "r+b") as f:
+                f.truncate(rows_end)
+
+    def _load_offsets(self) -> List[int]:
+        path = os.path.join(self.path, "rows.idx")
+        if not os.path.exists(path):
+            return []
+        return np.fromfile(path, dtype=np.int64)[: self.count].tolist()
+
+    def _save_meta(self) -> None:
+        tmp_path = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, os.path.join(self.path, "meta.json"))
+
+    @property
+    def count(self) -> int:
+        return self.meta["count"]
+
+    def _scan_rows(self):
+        with open(os.path.join(self.path, "rows.jsonl"), "rb") as f:
+            for offset in self.offsets:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def read_rows(self, row_ids: Iterable[int]) -> List[dict]:
+        with open(os.path.join(self.path, "rows.jsonl"), "rb") as f:
+            rows = []
+            for row_id in row_ids:
+                f.seek(self.offsets[row_id])
+                rows.append(json.loads(f.readline()))
+            return rows
+
+    def _index_row(self, row_id: int, row: dict) -> None:
+        for name, index in self.indexes.items():
+            if name in row:
+                index.setdefault(row[name], []).append(row_id)
+
+    # writes
+    def insert(self, data: List[dict]) -> List[int]:
+        if not data:
+            return []
+        vectors = np.asarray([row[self.vector_field] for row in data], dtype=np.float32)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+        if self.normalized:
+            vectors = _normalize(vectors)
+        start = self.count
+        needed = start + len(data)
+        if needed > self.meta["capacity"]:
+            self.vectors.flush()
+            self.meta["capacity"] = max(needed, 2 * self.meta["capacity"])
+            self._open_vectors(self.meta["capacity"])
+
+        ids = list(range(start, needed))
+        rows_path = os.path.join(self.path, "rows.jsonl")
+        with open(rows_path, "ab") as rows_file, open(os.path.join(self.path, "rows.idx"), "ab") as idx_file:
+            offsets = []
+            for row_id, row in zip(ids, data):
+                scalar = {k: v for k, v in row.items() if k != self.vector_field}
+                scalar["id"] = row_id
+                offsets.append(rows_file.tell())
+                rows_file.write((json.dumps(scalar) + "\n").encode())
+                self._index_row(row_id, scalar)
+            np.asarray(offsets, dtype=np.int64).tofile(idx_file)
+        self.offsets.extend(offsets)
+        self.vectors[start:needed] = vectors
+        self.vectors.flush()
+        self.meta["count"] = needed
+        self._save_meta()
+        return ids
+
+    # IVF coarse quantizer
+    def _load_ivf(self) -> Optional[dict]:
+        if not self.meta.get("ivf_count"):
+            return None
+        return {
+            "centroids": np.load(os.path.join(self.path, "ivf_centroids.npy")),
+            "order": np.load(os.path.join(self.path, "ivf_order.npy"), mmap_mode="r"),
+            "offsets": np.load(os.path.join(self.path, "ivf_offsets.npy")),
+            "count": self.meta["ivf_count"],
+        }
+
+    def _assign(self, centroids: np.ndarray, upto: int, block: int = 65536) -> np.ndarray:
+        assignments = np.empty(upto, dtype=np.int32)
+        for start in range(0, upto, block):
+            end = min(upto, start + block)
+            assignments[start:end] = np.argmax(self.vectors[start:end] @ centroids.T, axis=1)
+        return assignments
+
+    def build_ivf(self, nlist: int, iterations: int = 10, sample_size: Optional[int] = None, seed: int = 0) -> None:
+        """Spherical k-means over a sample, then every stored vector is assigned to its nearest centroid."""
+        n = self.count
+        if n < nlist:
+            raise ValueError(f"need at least nlist={nlist} vectors, have {n}")
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, sample_size or nlist * 64)
+        sample = np.asarray(self.vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            centroids = _normalize(sums)
+
+        assignments = self._assign(centroids, n)
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))]).astype(np.int64)
+        np.save(os.path.join(self.path, "ivf_centroids.npy"), centroids.astype(np.float32))
+        np.save(os.path.join(self.path, "ivf_order.npy"), order)
+        np.save(os.path.join(self.path, "ivf_offsets.npy"), offsets)
+        self.meta["ivf_count"] = n
+        self._save_meta()
+        self.ivf = self._load_ivf()
+
+    # reads
+    def search(self, queries: np.ndarray, limit: int, nprobe: Optional[int] = None, block: int = 65536):
+        if self.normalized:
+            queries = _normalize(queries)
+        n = self.count
+        if self.ivf is not None and nprobe:
+            return self._search_ivf(queries, limit, nprobe)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, n, block):
+            end = min(n, start + block)
+            scores = queries @ self.vectors[start:end].T
+            block_scores, block_ids = _top_k(scores, np.arange(start, end), limit)
+            best_scores, best_ids = _top_k(np.hstack([best_scores, block_scores]),
+                                           np.hstack([best_ids, block_ids]), limit)
+        return best_scores, best_ids
+
+    def _search_ivf(self, queries: np.ndarray, limit: int, nprobe: int):
+        ivf = self.ivf
+        nprobe = min(nprobe, len(ivf["centroids"]))
+        probes = np.argpartition(-(queries @ ivf["centroids"].T), nprobe - 1, axis=1)[:, :nprobe]
+        # Vectors inserted after the IVF build are not in any list; they are always scanned.
+        tail = np.arange(ivf["count"], self.count, dtype=np.int64)
+        per_query_scores = [[] for _ in queries]
+        per_query_ids = [[] for _ in queries]
+        # Each probed list is read from the memmap once per batch and scored against
+        # every query probing it with a single matrix product.
+        for cluster in np.unique(probes):
+            members = np.asarray(ivf["order"][ivf["offsets"][cluster]:ivf["offsets"][cluster + 1]])
+            if not len(members):
+                continue
+            query_idx = np.nonzero((probes == cluster).any(axis=1))[0]
+            scores = queries[query_idx] @ self.vectors[members].T
+            scores, ids = _top_k(scores, members, limit)
+            for row, q in enumerate(query_idx):
+                per_query_scores[q].append(scores[row])
+                per_query_ids[q].append(ids[row])
+        if len(tail):
+            scores, ids = _top_k(queries @ self.vectors[ivf["count"]:self.count].T, tail, limit)
+            for q in range(len(queries)):
+                per_query_scores[q].append(scores[q])
+                per_query_ids[q].append(ids[q])
+        all_scores, all_ids = [], []
+        for scores, ids in zip(per_query_scores, per_query_ids):
+            top_scores, top_ids = _top_k(np.concatenate(scores)[None, :], np.concatenate(ids), limit)
+            all_scores.append(top_scores[0])
+            all_ids.append(top_ids[0])
+        return all_scores, all_ids
+
+
+class NumpyVectorClient:
+    """MilvusClient-compatible subset backed by memory-mapped NumPy files under `root`."""
+
+    def __init__(self, root: str, indexed_fields: Iterable[str] = ("content_hash",)):
+        self.root = root
+        self.indexed_fields = tuple(indexed_fields)
+        self._collections: Dict[str, _Collection] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, collection_name: str) -> str:
+        return os.path.join(self.root, collection_name)
+
+    def _get(self, collection_name: str) -> _Collection:
+        if collection_name not in self._collections:
+            if not self.has_collection(collection_name):
+                raise ValueError(f"collection not found: {collection_name}")
+            self._collections[collection_name] = _Collection(self._path(collection_name), self.indexed_fields)
+        return self._collections[collection_name]
+
+    def has_collection(self, collection_name: str) -> bool:
+        return os.path.exists(os.path.join(self._path(collection_name), "meta.json"))
+
+    def create_collection(self, collection_name: str, dimension: int, metric_type: str = "COSINE",
+                          vector_field_name: str = "vector", capacity: int = 1024, **kwargs) -> None:
+        if metric_type not in ("COSINE", "IP"):
+            raise ValueError(f"unsupported metric_type: {metric_type}")
+        if self.has_collection(collection_name):
+            return
+        path = self._path(collection_name)
+        os.makedirs(path, exist_ok=True)
+        open(os.path.join(path, "rows.jsonl"), "ab").close()
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"dimension": dimension, "metric_type": metric_type, "vector_field": vector_field_name,
+                       "capacity": capacity, "count": 0}, f)
+
+    def drop_collection(self, collection_name: str) -> None:
+        import shutil
+        self._collections.pop(collection_name, None)
+        shutil.rmtree(self._path(collection_name), ignore_errors=True)
+
+    def insert(self, collection_name: str, data: List[dict], **kwargs) -> dict:
+        ids = self._get(collection_name).insert(data)
+        return {"insert_count": len(ids), "ids": ids}
+
+    def build_ivf(self, collection_name: str, nlist: int, iterations: int = 10, sample_size: Optional[int] = None) -> None:
+        self._get(collection_name).build_ivf(nlist, iterations, sample_size)
+
+    def search(self, collection_name: str, data, limit: int = 10, output_fields: Optional[List[str]] = None,
+               search_params: Optional[dict] = None, **kwargs) -> List[List[dict]]:
+        """
+        Batched top-k search. Uses the IVF lists when the collection has them and
+        search_params carries {"params": {"nprobe": n}}; otherwise an exact blocked scan.
+        """
+        collection = self._get(collection_name)
+        queries = np.asarray(data, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        nprobe = ((search_params or {}).get("params") or {}).get("nprobe")
+        scores, ids = collection.search(queries, limit, nprobe)
+        results = []
+        for row_scores, row_ids in zip(scores, ids):
+            row_ids = [int(i) for i in row_ids]
+            rows = collection.read_rows(row_ids) if output_fields else [{} for _ in row_ids]
+            results.append([
+                {"id": row_id, "distance": float(score),
+                 "entity": {k: row[k] for k in output_fields or () if k in row}}
+                for row_id, score, row in zip(row_ids, row_scores, rows)
+            ])
+        return results
+
+    def query(self, collection_name: str, filter: str = "", output_fields: Optional[List[str]] = None,
+              limit: Optional[int] = None, offset: int = 0, **kwargs) -> List[dict]:
+        """Supports the filters used in this repo: '', 'id >= N' and '<field> in [...]'."""
+        collection = self._get(collection_name)
+        fields = set(output_fields or ()) | {"id"}
+        in_match = _IN_FILTER.match(filter)
+        gte_match = _ID_GTE_FILTER.match(filter)
+        if in_match:
+            field, values = in_match.group(1), json.loads(in_match.group(2))
+            if field == "id":
+                row_ids = sorted(v for v in values if 0 <= v < collection.count)
+            elif field in collection.indexes:
+                index = collection.indexes[field]
+                row_ids = sorted(i for v in values for i in index.get(v, ()))
+            else:
+                wanted = set(values)
+                row_ids = [row["id"] for row in collection._scan_rows() if row.get(field) in wanted]
+        elif gte_match or not filter.strip():
+            first = max(0, int(gte_match.group(1))) if gte_match else 0
+            row_ids = range(first, collection.count)
+        else:
+            raise ValueError(f"unsupported filter expression: {filter!r}")
+        row_ids = list(row_ids)[offset: offset + limit if limit is not None else None]
+        return [{k: v for k, v in row.items() if k in fields} for row in collection.read_rows(row_ids)]
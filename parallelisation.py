@@ -1,66 +1,54 @@
 import os
+import time
 import asyncio
-from typing import Optional
+from typing import AsyncIterator, Dict, List, Optional, Sequence
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import Runnable, RunnableParallel, RunnablePassthrough
 
-import os
 from dotenv import load_dotenv
+from lazy import lazy_attributes
+from rate_limiter import RateLimitedScheduler
 load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
 
-try:
-    llm:Optional[ChatOpenAI] = ChatOpenAI(api_key=openai_api_key, model="gpt-4o-mini", temperature=0.7)
-except Exception as e:
-    print(f"Error Initializing language model: {e}")
-    llm = None
+def _create_llm():
+    from langchain_openai import ChatOpenAI
+    from llm_cache import enable_llm_cache_from_env
+    from tracing import enable_tracing_from_env
+
+    # The model runs at temperature 0.7, which the cache skips by default:
+    # set LLM_CACHE_ALL_TEMPERATURES=1 along with LLM_CACHE_PATH to cache its calls.
+    enable_llm_cache_from_env()
+    enable_tracing_from_env()
+    return ChatOpenAI(api_key=os.getenv("OPENAI_API_KEY"), model="gpt-4o-mini", temperature=0.7)
 
 # --- Define Independent Chains ---
 # These three chains represent distinct tasks that can be executed in parallel.
 
-summarise_chain:Runnable = (
-    ChatPromptTemplate.from_messages([
-        ("system","Summarize the following topic concisely."),
-        ("user","{topic}")
-    ])
-    | llm
-    | StrOutputParser()
-)
-
-question_chain:Runnable = (
-    ChatPromptTemplate.from_messages([
-        ("system", "Generate three interesting questions about the following topic:"),
-        ("user","{topic}")
-    ])
-    | llm
-    | StrOutputParser()
-)
-
-terms_chain:Runnable = (
-    ChatPromptTemplate.from_messages([
-        ("message", "Identify 5-10 key terms from the following topic, seperated by commas:"),
-        ("user", "{topic}")
-    ])
-    | llm
-    | StrOutputParser()
-)
+summarise_prompt = ChatPromptTemplate.from_messages([
+    ("system","Summarize the following topic concisely."),
+    ("user","{topic}")
+])
 
-# --- Build the parallel + synthesis chain ---
+question_prompt = ChatPromptTemplate.from_messages([
+    ("system", "Generate three interesting questions about the following topic:"),
+    ("user","{topic}")
+])
 
-# --- Define Independent Chains ---
-# These three chains represent distinct tasks that can be executed in parallel.
+terms_prompt = ChatPromptTemplate.from_messages([
+    ("system", "Identify 5-10 key terms from the following topic, seperated by commas:"),
+    ("user", "{topic}")
+])
 
-map_chain = RunnableParallel(
-    {
-        "summary" : summarise_chain,
-        "questions" : question_chain,
-        "key_terms" : terms_chain,
-        "topic" : RunnablePassthrough(),
+def build_branch_chains(model) -> Dict[str, Runnable]:
+    return {
+        "summary": summarise_prompt | model | StrOutputParser(),
+        "questions": question_prompt | model | StrOutputParser(),
+        "key_terms": terms_prompt | model | StrOutputParser(),
     }
-)
+
+# --- Build the parallel + synthesis chain ---
 
 # 2. Define the final synthesis prompt which will combine the parallel results.
 synthesis_prompt = ChatPromptTemplate.from_messages([
@@ -75,9 +63,120 @@ synthesis_prompt = ChatPromptTemplate.from_messages([
 # 3. Construct the full chain by piping the parallel results directly
 #    into the synthesis prompt, followed by the LLM and output parser.
 
-full_parallel_chain = map_chain | synthesis_prompt | llm | StrOutputParser()
+def build_parallel_chain(model) -> Runnable:
+    """full_parallel_chain on any chat model (e.g. fake_models.FakeChatModel)."""
+    map_chain = RunnableParallel({**build_branch_chains(model), "topic": RunnablePassthrough()})
+    return map_chain | synthesis_prompt | model | StrOutputParser()
+
+# llm and every chain built on it are created on first access, not at import.
+_lazy, __getattr__ = lazy_attributes(globals(), {
+    "llm": _create_llm,
+    "branch_chains": lambda: build_branch_chains(_lazy("llm")),
+    "summarise_chain": lambda: _lazy("branch_chains")["summary"],
+    "question_chain": lambda: _lazy("branch_chains")["questions"],
+    "terms_chain": lambda: _lazy("branch_chains")["key_terms"],
+    "map_chain": lambda: RunnableParallel({**_lazy("branch_chains"), "topic": RunnablePassthrough()}),
+    "full_parallel_chain": lambda: _lazy("map_chain") | synthesis_prompt | _lazy("llm") | StrOutputParser(),
+    "synthesis_chain": lambda: synthesis_prompt | _lazy("llm") | StrOutputParser(),
+})
+
+def get_llm():
+    """The chat model, created on first use; assign parallelisation.llm beforehand to use another one."""
+    return _lazy("llm")
+
+# Streaming runner
+# Runs the three branches concurrently with optional per-branch timeouts, then streams
+# the synthesis tokens as they arrive. A branch that times out or fails is replaced by a
+# placeholder so synthesis still goes ahead with partial results.
+
+async def _run_branch(name:str, chain:Runnable, topic:str, timeout:Optional[float], metrics:dict) -> Optional[str]:
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(chain.ainvoke(topic), timeout)
+    except asyncio.TimeoutError:
+        metrics["timed_out"].append(name)
+    except Exception as e:
+        metrics["failed"][name] = f"{type(e).__name__}: {e}"
+    finally:
+        metrics["branch_latency_s"][name] = time.perf_counter() - start
+    return None
+
+async def astream_parallel(topic:str, branch_timeout:Optional[float]=None,
+                           metrics:Optional[dict]=None) -> AsyncIterator[str]:
+    """
+    Yields synthesis tokens for the topic. If a metrics dict is passed it is filled with
+    per-branch latency, the fan-out critical path (slowest branch), time to first token
+    and total time, all in seconds and measured from the start of the call.
+    """
+    metrics = metrics if metrics is not None else {}
+    metrics.update({"branch_latency_s": {}, "timed_out": [], "failed": {}})
+    start = time.perf_counter()
+
+    branch_chains = _lazy("branch_chains")
+    results = await asyncio.gather(*(
+        _run_branch(name, chain, topic, branch_timeout, metrics) for name, chain in branch_chains.items()
+    ))
+    latencies = metrics["branch_latency_s"]
+    metrics["critical_branch"] = max(latencies, key=latencies.get)
+    metrics["fanout_critical_path_s"] = time.perf_counter() - start
+
+    synthesis_input = {"topic": topic}
+    for name, result in zip(branch_chains, results):
+        synthesis_input[name] = result if result is not None else f"(not available: the {name} step did not complete)"
+
+    async for chunk in _lazy("synthesis_chain").astream(synthesis_input):
+        if "time_to_first_token_s" not in metrics:
+            metrics["time_to_first_token_s"] = time.perf_counter() - start
+        yield chunk
+    metrics["total_s"] = time.perf_counter() - start
+
+async def run_parallel_example(topic:str, branch_timeout:Optional[float]=20.0) -> None:
+    """Streams the synthesized answer for a topic to stdout and prints timing metrics."""
+    try:
+        get_llm()
+    except Exception as e:
+        print(f"Error Initializing language model: {e}")
+        return
+    print(f"\n--- Running Parallel LangChain Example for Topic: '{topic}' ---")
+    metrics = {}
+    try:
+        async for chunk in astream_parallel(topic, branch_timeout, metrics):
+            print(chunk, end="", flush=True)
+    except Exception as e:
+        print(f"\nAn error occurred during chain execution: {e}")
+    print("\n\n--- Metrics ---")
+    for name, seconds in metrics.get("branch_latency_s", {}).items():
+        print(f"  {name:<10} {seconds * 1000:8.0f} ms")
+    if metrics.get("timed_out") or metrics.get("failed"):
+        print(f"  partial results: timed out={metrics.get('timed_out')}, failed={metrics.get('failed')}")
+    for key in ("fanout_critical_path_s", "time_to_first_token_s", "total_s"):
+        if key in metrics:
+            print(f"  {key[:-2]}: {metrics[key] * 1000:.0f} ms")
+
+
+# Multi-topic fan-out under provider rate limits
+# Each topic costs 4 requests (three branches + synthesis). The token estimate is the
+# prompt text plus an assumed output budget per call, with the synthesis call reading
+# the three branch outputs back in.
+
+def estimate_topic_tokens(topic:str, output_tokens_per_call:int=400) -> int:
+    topic_tokens = len(topic) // 4 + 1
+    return 4 * (topic_tokens + 50) + 4 * output_tokens_per_call + 3 * output_tokens_per_call
+
+async def run_topics(topics:Sequence[str], rpm:float=500, tpm:float=200_000, max_workers:int=16,
+                     priorities:Optional[Sequence[float]]=None) -> List:
+    """Runs full_parallel_chain over many topics; lower priority values are scheduled first."""
+    scheduler = RateLimitedScheduler(
+        _lazy("full_parallel_chain").ainvoke, rpm=rpm, tpm=tpm, requests_per_item=4,
+        estimate_tokens=estimate_topic_tokens, max_workers=max_workers,
+    )
+    results = await scheduler.run(topics, priorities)
+    summary = scheduler.summary()
+    print(f"\n--- Scheduler: {summary['completed']} completed, {summary['failed']} failed, "
+          f"{summary['rate_limited']} rate limited, {summary['items_per_s']:.2f} topics/s, "
+          f"{summary['requests_per_min']:.0f} requests/min, throttled {summary['throttled_s']:.1f}s ---")
+    return results
 
-# Run the chain
 
-async def run_parallel_example(topic:str) -> None:
-    pass
+if __name__ == "__main__":
+    asyncio.run(run_parallel_example("The history of space exploration"))
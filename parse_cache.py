@@ -0,0 +1,136 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+from enum import Enum
+from typing import Any, Optional
+
+# Content-addressed cache of document parse results for tensorlake_doc_parser.
+#
+# The key is the SHA-256 of the file bytes, the ParsingOptions and the structured
+# extraction options (including the JSON schema), so renaming or moving a file still
+# hits, while changing a chunking strategy or a schema field misses. Entries are
+# gzip-compressed JSON holding the chunks and structured data. The least recently
+# used entries (by file mtime, bumped on every hit) are evicted past
+# max_entries / max_bytes.
+#
+#     PARSE_CACHE_DIR=.parse_cache python tensorlake_doc_parser.py paper.pdf
+
+CACHE_VERSION = 1
+
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _canonical(value: Any) -> Any:
+    """JSON-able, order-independent form of option objects, pydantic models and schema classes."""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, type) and hasattr(value, "model_json_schema"):
+        return value.model_json_schema()
+    if hasattr(value, "model_dump"):
+        return _canonical(value.model_dump(exclude_none=True))
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+def cache_key(path: str, *options: Any) -> str:
+    payload = json.dumps([CACHE_VERSION, file_digest(path), [_canonical(o) for o in options]],
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    """On-disk parse-result cache; see the module comment for the key and eviction policy."""
+
+    def __init__(self, root: str = ".parse_cache", max_entries: int = 1000, max_bytes: int = 1 << 30):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json.gz")
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            # Missing, or a partial/corrupt entry, which is simply re-parsed.
+            self.stats["misses"] += 1
+            return None
+        os.utime(path)
+        self.stats["hits"] += 1
+        return record
+
+    def put(self, key: str, record: dict) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(record, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        self.stats["stores"] += 1
+        self._evict()
+
+    def _entries(self):
+        for shard in os.scandir(self.root):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".json.gz"):
+                        stat = entry.stat()
+                        yield stat.st_mtime, stat.st_size, entry.path
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in entries:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total -= size
+            self.stats["evictions"] += 1
+
+    def format_stats(self) -> str:
+        s = self.stats
+        return (f"parse cache: {s['hits']} hits, {s['misses']} misses, {s['stores']} stored, "
+                f"{s['evictions']} evicted")
+
+
+def parse_cache_from_env() -> Optional[ParseCache]:
+    """ParseCache at PARSE_CACHE_DIR (default .parse_cache); PARSE_CACHE_DIR="" disables caching."""
+    root = os.getenv("PARSE_CACHE_DIR", ".parse_cache")
+    if not root:
+        return None
+    max_entries = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "1000"))
+    max_bytes = int(float(os.getenv("PARSE_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+    return ParseCache(root, max_entries=max_entries, max_bytes=max_bytes)
+
+
+def result_record(result: Any, source: str) -> dict:
+    """Compact, JSON-able form of a DocumentAI ParseResult."""
+    return {
+        "source": source,
+        "parsed_at": time.time(),
+        "chunks": [{"page_number": c.page_number, "content": c.content} for c in result.chunks or []],
+        "structured_data": [_canonical(d) for d in result.structured_data or []],
+    }
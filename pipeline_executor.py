@@ -0,0 +1,196 @@
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from metrics import LatencyStats
+
+# Pipelined execution of a multi-stage pipeline over a batch of items.
+# Running a SequentialAgent once per item leaves every stage but one idle; here
+# each stage has its own workers and a bounded input queue, so stage 1 works on
+# item k+1 while stage 2 handles item k. A full queue blocks the stage feeding it
+# (backpressure), so a slow stage cannot accumulate an unbounded backlog.
+
+_DONE = object()
+
+
+class Stage:
+    """One pipeline step: `fn(value) -> value` run by `workers` tasks, fed by a queue of `queue_size` items."""
+
+    def __init__(self, name: str, fn: Callable[[Any], Awaitable[Any]], workers: int = 1,
+                 queue_size: Optional[int] = None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+
+
+class StageMetrics:
+    def __init__(self, stage: Stage):
+        self.name = stage.name
+        self.workers = stage.workers
+        self.items = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self.blocked_s = 0.0  # time spent waiting for room in the next stage's queue
+        self.max_depth = 0
+        self.service = LatencyStats()
+        self.wait = LatencyStats()
+
+    def summary(self, wall_s: float) -> Dict[str, float]:
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items": self.items,
+            "errors": self.errors,
+            "utilization": self.busy_s / (self.workers * wall_s) if wall_s else 0.0,
+            "service_p50_s": self.service.percentile(50),
+            "service_p95_s": self.service.percentile(95),
+            "wait_p95_s": self.wait.percentile(95),
+            "blocked_s": self.blocked_s,
+            "max_queue_depth": self.max_depth,
+        }
+
+
+class PipelineExecutor:
+    """
+    Runs `stages` in order over a batch of items. Each item's value is passed from
+    one stage's fn to the next; an item whose stage raises skips the remaining
+    stages and is returned with the error.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 4):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.metrics = [StageMetrics(s) for s in stages]
+        self.wall_s = 0.0
+
+    async def _put(self, index: int, job, metrics: Optional[StageMetrics]) -> None:
+        queue = self._queues[index]
+        start = time.monotonic()
+        await queue.put(job)
+        if metrics is not None:
+            metrics.blocked_s += time.monotonic() - start
+        if job is not _DONE:
+            self.metrics[index].max_depth = max(self.metrics[index].max_depth, queue.qsize())
+
+    async def _worker(self, index: int) -> None:
+        stage, metrics = self.stages[index], self.metrics[index]
+        last = index == len(self.stages) - 1
+        while True:
+            job = await self._queues[index].get()
+            if job is _DONE:
+                return
+            item, value, enqueued = job
+            start = time.monotonic()
+            metrics.wait.observe(start - enqueued)
+            try:
+                value = await stage.fn(value)
+            except Exception as e:
+                metrics.errors += 1
+                self._results[item] = {"index": item, "value": None, "error": f"{stage.name}: {e!r}"}
+                continue
+            finally:
+                elapsed = time.monotonic() - start
+                metrics.busy_s += elapsed
+                metrics.service.observe(elapsed)
+                metrics.items += 1
+            if last:
+                self._results[item] = {"index": item, "value": value, "error": None}
+            else:
+                await self._put(index + 1, (item, value, time.monotonic()), metrics)
+
+    async def _run_stage(self, index: int) -> None:
+        workers = [asyncio.create_task(self._worker(index)) for _ in range(self.stages[index].workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+        if index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].workers):
+                await self._put(index + 1, _DONE, None)
+
+    async def run(self, items: Iterable[Any]) -> List[dict]:
+        """Returns one {"index", "value", "error"} per item, in input order."""
+        self._queues = [asyncio.Queue(maxsize=s.queue_size or self.queue_size) for s in self.stages]
+        self._results: Dict[int, dict] = {}
+        start = time.monotonic()
+        stages = [asyncio.create_task(self._run_stage(i)) for i in range(len(self.stages))]
+        try:
+            count = 0
+            for count, value in enumerate(items, 1):
+                await self._put(0, (count - 1, value, time.monotonic()), None)
+            for _ in range(self.stages[0].workers):
+                await self._put(0, _DONE, None)
+            await asyncio.gather(*stages)
+        finally:
+            for task in stages:
+                task.cancel()
+            self.wall_s = time.monotonic() - start
+        return [self._results[i] for i in range(count)]
+
+    def summary(self) -> List[Dict[str, float]]:
+        return [m.summary(self.wall_s) for m in self.metrics]
+
+    def format_metrics(self) -> str:
+        lines = [f"wall clock {self.wall_s:.2f}s",
+                 f"{'stage':<16} {'workers':>7} {'items':>5} {'errors':>6} {'util':>5} {'p50 s':>6} {'p95 s':>6} "
+                 f"{'wait p95':>8} {'blocked s':>9} {'max q':>5}"]
+        for s in self.summary():
+            lines.append(f"{s['stage']:<16} {s['workers']:>7} {s['items']:>5} {s['errors']:>6} "
+                         f"{s['utilization']:>5.0%} {s['service_p50_s']:>6.2f} {s['service_p95_s']:>6.2f} "
+                         f"{s['wait_p95_s']:>8.2f} {s['blocked_s']:>9.2f} {s['max_queue_depth']:>5}")
+        return "\n".join(lines)
+
+
+# --- ADK pipelines ---
+# Each sub-agent of a SequentialAgent becomes a stage. An item is one session: the
+# first stage sends the item text as the user message and creates the session;
+# later stages continue that session and invocation without a new message, so each
+# agent sees the same conversation and session state (e.g. draft_text) as it does
+# inside the SequentialAgent.
+
+def adk_stages(pipeline, workers: Optional[Dict[str, int]] = None, session_service=None,
+               user_id: str = "user") -> List[Stage]:
+    from google.adk.sessions import InMemorySessionService
+    from adk_runner import continue_session, make_runner, run_agent, user_message
+
+    service = session_service or InMemorySessionService()
+    # Later stages run under a runner rooted at the pipeline, so every agent's events are known to it.
+    pipeline_runner = make_runner(pipeline, service)
+    workers = workers or {}
+    stages = []
+    for index, agent in enumerate(pipeline.sub_agents):
+        if index == 0:
+            runner = make_runner(agent, service)
+
+            async def run_stage(item: dict, runner=runner, agent=agent) -> dict:
+                result = await run_agent(agent, item["text"], runner=runner, user_id=user_id)
+                invocation_id = result["events"][0].invocation_id if result["events"] else None
+                return {**item, "session_id": result["session_id"], "invocation_id": invocation_id,
+                        "state": result["state"], "outputs": {agent.name: result["text"]}}
+        else:
+            async def run_stage(item: dict, agent=agent) -> dict:
+                result = await continue_session(agent, pipeline_runner, item["session_id"], user_id=user_id,
+                                                invocation_id=item["invocation_id"],
+                                                user_content=user_message(item["text"]))
+                return {**item, "state": result["state"], "outputs": {**item["outputs"], agent.name: result["text"]}}
+
+        stages.append(Stage(agent.name, run_stage, workers=workers.get(agent.name, 1)))
+    return stages
+
+
+async def run_pipelined(pipeline, texts: Iterable[str], workers: Optional[Dict[str, int]] = None,
+                        queue_size: int = 4, session_service=None):
+    """Runs a SequentialAgent-style pipeline over many inputs with overlapping stages. Returns (results, executor)."""
+    executor = PipelineExecutor(adk_stages(pipeline, workers, session_service), queue_size=queue_size)
+    results = await executor.run({"text": text} for text in texts)
+    return results, executor
+
+
+async def run_one_by_one(pipeline, texts: Iterable[str], session_service=None) -> List[dict]:
+    """Baseline: the whole pipeline agent once per input, one input at a time."""
+    from adk_runner import make_runner, run_agent
+
+    runner = make_runner(pipeline, session_service)
+    return [await run_agent(pipeline, text, runner=runner) for text in texts]
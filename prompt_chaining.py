@@ -1,17 +1,28 @@
-from langchain_openai import  ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.exceptions import OutputParserException
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
 import os
+import csv
+import threading
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from pydantic import BaseModel, Field, ValidationError
+from lazy import lazy_attributes
 
 
 
 load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
 
+def _create_llm():
+    from langchain_openai import ChatOpenAI
+    from llm_cache import enable_llm_cache_from_env
+    from tracing import enable_tracing_from_env
 
+    enable_llm_cache_from_env()
+    enable_tracing_from_env()
+    return ChatOpenAI(api_key=os.getenv("OPENAI_API_KEY"), temperature=0)
 
-llm = ChatOpenAI(api_key=openai_api_key, temperature=0)
 # prompt 1
 prompt_extract = ChatPromptTemplate.from_template(
 "Extract the technical specifications from the following text:\n\n{text_input}")
@@ -23,23 +34,201 @@ prompt_transform = ChatPromptTemplate.from_template(
 
 # Build the chain using LCEL
 
-extraction_chain = prompt_extract | llm | StrOutputParser()
-
-full_chain = (
-    {"specifications": extraction_chain}
-    | prompt_transform
-    | llm
-    | StrOutputParser()
-)
-
-# Run the chain
-input_text = " The new laptop model features a 3.5 GHz octacore processor , 16 GB of RAM , and a 1 TB NVMe SSD."
-
-# Execute the chain with the input text dictionary
-
-final_result = full_chain.invoke({"text_input" : input_text})
-
-print(f"result: {final_result}")
-
-
-
+def build_full_chain(model):
+    """extract -> transform on any chat model (the benchmarks pass a fake one)."""
+    extraction_chain = prompt_extract | model | StrOutputParser()
+    return (
+        {"specifications": extraction_chain}
+        | prompt_transform
+        | model
+        | StrOutputParser()
+    )
+
+# llm and the chains on it are created on first access, not at import.
+_lazy, __getattr__ = lazy_attributes(globals(), {
+    "llm": _create_llm,
+    "extraction_chain": lambda: prompt_extract | _lazy("llm") | StrOutputParser(),
+    "full_chain": lambda: build_full_chain(_lazy("llm")),
+})
+
+def get_llm():
+    """The chat model, created on first use; assign prompt_chaining.llm beforehand to use another one."""
+    return _lazy("llm")
+
+# --- Packed batch mode ---
+# full_chain makes two calls per description, each repeating the instructions.
+# Here K descriptions are packed into one numbered extraction prompt and one
+# transform prompt, both with structured output keyed by record number, so a
+# catalog of N descriptions takes about 2*N/K calls. Records missing from a
+# packed response (or a whole pack whose response fails to parse) are re-run
+# alone through the same prompts.
+
+class ExtractedSpecs(BaseModel):
+    id: int = Field(description="The record number, as given in the input")
+    specifications: str = Field(description="The technical specifications found in that record")
+
+
+class ExtractedBatch(BaseModel):
+    records: List[ExtractedSpecs]
+
+
+class SpecRow(BaseModel):
+    id: int = Field(description="The record number, as given in the input")
+    cpu: Optional[str] = Field(default=None, description="Processor, e.g. '3.5 GHz octa-core'")
+    memory: Optional[str] = Field(default=None, description="RAM, e.g. '16 GB'")
+    storage: Optional[str] = Field(default=None, description="Storage, e.g. '1 TB NVMe SSD'")
+
+
+class SpecTable(BaseModel):
+    records: List[SpecRow]
+
+
+COLUMNS = ["id", "cpu", "memory", "storage"]
+
+prompt_extract_packed = ChatPromptTemplate.from_template(
+    "Extract the technical specifications from each of the following numbered product descriptions. "
+    "Return exactly one entry per record, using its number as the id.\n\n{records}")
+
+prompt_transform_packed = ChatPromptTemplate.from_template(
+    "Transform each of the following numbered specifications into a table row with 'cpu', 'memory' "
+    "and 'storage' columns (null when a value is not given). Return exactly one row per record, using "
+    "its number as the id.\n\n{records}")
+
+
+def _numbered(records: Dict[int, str]) -> str:
+    return "\n\n".join(f"[{i}] {text.strip()}" for i, text in records.items())
+
+
+def _by_id(items, expected) -> dict:
+    # Drops ids that were not asked for and ids that came back twice.
+    counts: Dict[int, int] = {}
+    for item in items:
+        counts[item.id] = counts.get(item.id, 0) + 1
+    return {item.id: item for item in items if item.id in expected and counts[item.id] == 1}
+
+
+class PackedRunStats:
+    def __init__(self):
+        self.records = 0
+        self.packs = 0
+        self.calls = 0
+        self.rerun_records = 0
+        self.failed_records = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts) -> None:
+        # Packs run on LangChain's batch thread pool.
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def summary(self) -> str:
+        # Savings are per extracted record: failed records still cost calls but produced nothing.
+        extracted = self.records - self.failed_records
+        unpacked_calls = 2 * extracted
+        per_record = self.calls / extracted if extracted else float("inf")
+        saved = (unpacked_calls - self.calls) / extracted if extracted else 0.0
+        return (f"{self.records} records in {self.packs} packs: {self.calls} calls vs {unpacked_calls} unpacked "
+                f"({per_record:.2f} calls/extracted record, {saved:.2f} calls saved per extracted record, "
+                f"{unpacked_calls / max(1, self.calls):.1f}x fewer calls); "
+                f"{self.rerun_records} record(s) re-run alone, {self.failed_records} failed")
+
+
+class PackedSpecChain:
+    """Extract + transform over packs of `pack_size` descriptions; run(texts) returns one row dict per text."""
+
+    def __init__(self, model=None, pack_size: int = 20, max_concurrency: int = 4):
+        model = model or get_llm()
+        self.pack_size = pack_size
+        self.max_concurrency = max_concurrency
+        self.extract = prompt_extract_packed | model.with_structured_output(ExtractedBatch)
+        self.transform = prompt_transform_packed | model.with_structured_output(SpecTable)
+        self.stats = PackedRunStats()
+
+    def _call(self, chain, records: Dict[int, str]):
+        self.stats.add(calls=1)
+        # Only bad output is retried record by record; transport errors (429s, timeouts,
+        # auth) propagate, as re-running every record alone would only multiply them.
+        try:
+            result = chain.invoke({"records": _numbered(records)})
+        except (OutputParserException, ValidationError) as e:
+            result = None
+            print(f"pack of {len(records)} failed to parse: {type(e).__name__}")
+        return result.records if result is not None else []
+
+    def _run_pack(self, records: Dict[int, str]) -> Tuple[Dict[int, SpecRow], List[int]]:
+        extracted = _by_id(self._call(self.extract, records), records)
+        specs = {i: extracted[i].specifications for i in records if i in extracted}
+        rows = _by_id(self._call(self.transform, specs), specs) if specs else {}
+        return rows, [i for i in records if i not in rows]
+
+    def _process(self, records: Dict[int, str]) -> Dict[int, SpecRow]:
+        rows, missing = self._run_pack(records)
+        if len(records) > 1:
+            for i in missing:
+                self.stats.add(rerun_records=1)
+                rows.update(self._run_pack({i: records[i]})[0])
+        self.stats.add(failed_records=sum(1 for i in records if i not in rows))
+        return rows
+
+    def run(self, texts: List[str]) -> List[dict]:
+        records = dict(enumerate(texts, 1))
+        ids = list(records)
+        packs = [{i: records[i] for i in ids[start:start + self.pack_size]}
+                 for start in range(0, len(ids), self.pack_size)]
+        self.stats.add(records=len(records), packs=len(packs))
+        rows: Dict[int, SpecRow] = {}
+        for pack_rows in RunnableLambda(self._process).batch(packs, config={"max_concurrency": self.max_concurrency}):
+            rows.update(pack_rows)
+        return [rows[i].model_dump() if i in rows else {"id": i, "cpu": None, "memory": None, "storage": None}
+                for i in ids]
+
+
+def write_table(rows: List[dict], path: str) -> None:
+    """Writes rows to .csv, or to .xlsx when openpyxl is installed."""
+    if path.endswith(".xlsx"):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("Writing .xlsx needs openpyxl (pip install openpyxl); use a .csv path instead.")
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.title = "specifications"
+        sheet.append(COLUMNS)
+        for row in rows:
+            sheet.append([row.get(c) for c in COLUMNS])
+        workbook.save(path)
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract cpu/memory/storage specs from product descriptions.")
+    parser.add_argument("--input", help="text file with one product description per line (packed batch mode)")
+    parser.add_argument("--output", default="specifications.csv", help=".csv or .xlsx")
+    parser.add_argument("--pack-size", type=int, default=20)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    if not args.input:
+        # Run the chain
+        input_text = " The new laptop model features a 3.5 GHz octacore processor , 16 GB of RAM , and a 1 TB NVMe SSD."
+
+        # Execute the chain with the input text dictionary
+
+        final_result = _lazy("full_chain").invoke({"text_input" : input_text})
+
+        print(f"result: {final_result}")
+    else:
+        with open(args.input) as f:
+            texts = [line.strip() for line in f if line.strip()]
+        packed = PackedSpecChain(pack_size=args.pack_size, max_concurrency=args.max_concurrency)
+        rows = packed.run(texts)
+        write_table(rows, args.output)
+        print(f"wrote {len(rows)} rows to {args.output}")
+        print(packed.stats.summary())
@@ -0,0 +1,209 @@
+import time
+import random
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+from metrics import LatencyStats
+
+# Rate-limit-aware scheduler for fanning many items out to an LLM provider.
+# Work is drawn from a priority queue and admitted through two token buckets
+# (requests per minute and tokens per minute). On a 429 the whole scheduler pauses
+# for Retry-After (or an exponential backoff) and halves its admitted rate, then
+# recovers additively on success.
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if status == 429:
+        return True
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    return type(exc).__name__ in ("RateLimitError", "ResourceExhausted", "TooManyRequests")
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Reads a Retry-After hint from the exception or its HTTP response, if there is one."""
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        return float(retry_after)
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute * factor; holds at most burst_seconds worth."""
+
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 10.0):
+        self.rate_per_minute = rate_per_minute
+        self.burst_seconds = burst_seconds
+        self.factor = 1.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def rate_per_second(self) -> float:
+        return self.rate_per_minute * self.factor / 60
+
+    @property
+    def capacity(self) -> float:
+        return self.rate_per_minute / 60 * self.burst_seconds
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_second)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # Requests larger than the bucket are admitted once it is full rather than never.
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate_per_second
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimitedScheduler:
+    """
+    Runs `fn(item)` for every item under requests-per-minute and tokens-per-minute limits.
+
+    requests_per_item is how many provider calls one item makes (4 for a
+    full_parallel_chain topic: three branches plus synthesis); estimate_tokens(item)
+    returns the tokens one item is expected to consume across those calls.
+    """
+
+    def __init__(self, fn: Callable[[Any], Awaitable[Any]], rpm: float, tpm: float,
+                 requests_per_item: int = 1, estimate_tokens: Callable[[Any], int] = lambda item: 1000,
+                 max_workers: int = 16, max_retries: int = 5, base_backoff: float = 1.0,
+                 max_backoff: float = 60.0, burst_seconds: float = 10.0):
+        self.fn = fn
+        self.requests = TokenBucket(rpm, burst_seconds)
+        self.tokens = TokenBucket(tpm, burst_seconds)
+        self.requests_per_item = requests_per_item
+        self.estimate_tokens = estimate_tokens
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.pause_until = 0.0
+        self.latency = LatencyStats()
+        self.stats = {"completed": 0, "failed": 0, "retries": 0, "rate_limited": 0, "throttled_s": 0.0}
+
+    def _set_rate_factor(self, factor: float) -> None:
+        factor = min(1.0, max(0.05, factor))
+        self.requests.factor = self.tokens.factor = factor
+
+    async def _acquire(self, lock: asyncio.Lock, tokens: int) -> None:
+        # One waiter at a time, so admission is FIFO in priority order.
+        async with lock:
+            while True:
+                now = time.monotonic()
+                wait = max(self.pause_until - now,
+                           self.requests.wait_time(self.requests_per_item, now),
+                           self.tokens.wait_time(tokens, now))
+                if wait <= 0:
+                    self.requests.consume(self.requests_per_item)
+                    self.tokens.consume(tokens)
+                    return
+                self.stats["throttled_s"] += wait
+                await asyncio.sleep(wait)
+
+    def _backoff(self, exc: BaseException, attempt: int) -> float:
+        hinted = retry_after_seconds(exc)
+        if hinted is not None:
+            return hinted
+        delay = min(self.max_backoff, self.base_backoff * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def run(self, items: Sequence[Any], priorities: Optional[Sequence[float]] = None) -> List[Any]:
+        """Returns one result per item, in input order; items that ultimately fail yield their exception."""
+        queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        for index, item in enumerate(items):
+            priority = priorities[index] if priorities is not None else 0
+            queue.put_nowait((priority, index, 0))
+        results: List[Any] = [None] * len(items)
+        lock = asyncio.Lock()
+        start = time.monotonic()
+
+        async def worker():
+            while True:
+                try:
+                    priority, index, attempt = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                item = items[index]
+                await self._acquire(lock, self.estimate_tokens(item))
+                call_start = time.monotonic()
+                try:
+                    results[index] = await self.fn(item)
+                except Exception as e:
+                    if is_rate_limit_error(e) and attempt < self.max_retries:
+                        delay = self._backoff(e, attempt)
+                        self.stats["rate_limited"] += 1
+                        self.stats["retries"] += 1
+                        self.pause_until = max(self.pause_until, time.monotonic() + delay)
+                        self._set_rate_factor(self.requests.factor / 2)
+                        queue.put_nowait((priority, index, attempt + 1))
+                        continue
+                    results[index] = e
+                    self.stats["failed"] += 1
+                    continue
+                self.latency.observe(time.monotonic() - call_start)
+                self.stats["completed"] += 1
+                self._set_rate_factor(self.requests.factor + 0.05)
+
+        # Retried items are re-queued, so workers keep draining until the queue stays empty.
+        while not queue.empty():
+            await asyncio.gather(*(worker() for _ in range(min(self.max_workers, queue.qsize()))))
+        self.stats["elapsed_s"] = time.monotonic() - start
+        return results
+
+    def summary(self) -> dict:
+        elapsed = self.stats.get("elapsed_s") or 0.0
+        done = self.stats["completed"]
+        return {
+            **self.stats,
+            "items_per_s": done / elapsed if elapsed else 0.0,
+            "requests_per_min": 60 * done * self.requests_per_item / elapsed if elapsed else 0.0,
+            "rate_factor": self.requests.factor,
+            "latency": self.latency.summary(),
+        }
+
+
+if __name__ == "__main__":
+    # Offline demo: 30 topics, 4 calls each, against a fake provider allowing 8 requests/second.
+    from fake_models import FakeRateLimitedModel
+
+    provider = FakeRateLimitedModel(max_requests=8, window=1.0, latency=0.05)
+    topics = [f"topic {i}" for i in range(30)]
+
+    async def fan_out(topic: str) -> str:
+        branches = await asyncio.gather(*(provider.ainvoke(f"{task}: {topic}") for task in ("summary", "questions", "terms")))
+        return await provider.ainvoke(" | ".join(branches))
+
+    async def main():
+        start = time.monotonic()
+        results = await asyncio.gather(*(fan_out(t) for t in topics), return_exceptions=True)
+        ok = sum(1 for r in results if not isinstance(r, Exception))
+        print(f"unbounded gather: {ok}/{len(topics)} ok, {provider.rejected} provider rejections, "
+              f"{time.monotonic() - start:.1f}s")
+
+        provider.reset()
+        scheduler = RateLimitedScheduler(fan_out, rpm=440, tpm=1_000_000, requests_per_item=4,
+                                         max_workers=16, base_backoff=0.5, burst_seconds=1)
+        results = await scheduler.run(topics)
+        ok = sum(1 for r in results if not isinstance(r, Exception))
+        summary = scheduler.summary()
+        print(f"scheduler:        {ok}/{len(topics)} ok, {provider.rejected} provider rejections, "
+              f"{summary['retries']} retries, {summary['items_per_s']:.2f} topics/s, {summary['elapsed_s']:.1f}s")
+
+    asyncio.run(main())
@@ -0,0 +1,288 @@
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+from rate_limiter import is_rate_limit_error, retry_after_seconds
+from routing_policy import RoutingTelemetry
+
+# Recovery layer for agent and LLM calls under provider brownouts:
+#   retry_async    jittered exponential retries inside one total deadline,
+#   CircuitBreaker fails fast while a model's recent calls mostly fail or time out,
+#   FallbackChain  ordered steps (primary -> faster model -> cached answer).
+# Breaker transitions and every fallback (with its reason) go to a RoutingTelemetry.
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"circuit {name!r} is open, retry in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class AllFallbacksFailed(Exception):
+    def __init__(self, attempts: List[dict]):
+        super().__init__("all fallbacks failed: " + ", ".join(f"{a['step']} ({a['reason']})" for a in attempts))
+        self.attempts = attempts
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Rate limits, 5xx responses, timeouts and connection errors are worth retrying; anything else is not."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if is_rate_limit_error(exc) or isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    return type(exc).__name__ in ("APITimeoutError", "APIConnectionError", "ServiceUnavailable",
+                                  "InternalServerError", "ServerError", "DeadlineExceeded")
+
+
+def failure_reason(exc: BaseException) -> str:
+    if isinstance(exc, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(exc, (DeadlineExceeded, TimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    if is_rate_limit_error(exc):
+        return "rate_limited"
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    return f"http_{status}" if isinstance(status, int) else type(exc).__name__
+
+
+async def retry_async(fn: Callable[[], Awaitable[T]], attempts: int = 4, base_delay: float = 0.25,
+                      max_delay: float = 4.0, deadline_s: Optional[float] = 20.0,
+                      attempt_timeout_s: Optional[float] = None,
+                      retry_on: Callable[[BaseException], bool] = is_retryable,
+                      on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+                      rng: Optional[random.Random] = None) -> T:
+    """
+    Calls fn() up to `attempts` times with full-jitter exponential backoff
+    (uniform(0, min(max_delay, base_delay * 2**n)), at least any Retry-After).
+    Every attempt and sleep fits inside deadline_s: an attempt is cut off when
+    the deadline passes, and no retry is started that the backoff would push past
+    it. attempt_timeout_s additionally bounds each single attempt.
+    """
+    rng = rng or random
+    deadline = time.monotonic() + deadline_s if deadline_s is not None else None
+    for attempt in range(attempts):
+        timeout = attempt_timeout_s
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"deadline of {deadline_s}s exceeded after {attempt} attempt(s)")
+            timeout = min(timeout, remaining) if timeout is not None else remaining
+        try:
+            if timeout is None:
+                return await fn()
+            return await asyncio.wait_for(fn(), timeout)
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError) and deadline is not None and time.monotonic() >= deadline:
+                raise DeadlineExceeded(f"deadline of {deadline_s}s exceeded after {attempt + 1} attempt(s)") from e
+            if attempt + 1 >= attempts or not retry_on(e):
+                raise
+            delay = rng.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            delay = max(delay, retry_after_seconds(e) or 0.0)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise DeadlineExceeded(f"next retry in {delay:.2f}s would pass the {deadline_s}s deadline") from e
+            if on_retry:
+                on_retry(attempt + 1, e, delay)
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker over the last `window` calls. It opens when at least
+    min_calls have been seen and the failure rate (calls slower than slow_call_s
+    count as failures) reaches failure_rate; while open, calls fail fast with
+    CircuitOpenError. Set slow_call_s when callers use timeouts, so calls cut off
+    by them are counted too. After reset_timeout_s it lets half_open_calls probes
+    through: they close it on success or reopen it on failure.
+    """
+
+    def __init__(self, name: str, failure_rate: float = 0.5, window: int = 20, min_calls: int = 5,
+                 reset_timeout_s: float = 30.0, half_open_calls: int = 1, slow_call_s: Optional[float] = None,
+                 telemetry: Optional[RoutingTelemetry] = None):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout_s = reset_timeout_s
+        self.half_open_calls = half_open_calls
+        self.slow_call_s = slow_call_s
+        self.telemetry = telemetry or RoutingTelemetry()
+        self.outcomes = deque(maxlen=window)
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probes = 0
+        self.rejected = 0
+
+    def _transition(self, state: str, reason: str) -> None:
+        if state == self.state:
+            return
+        self.telemetry.emit("breaker", name=self.name, state=state, previous=self.state, reason=reason,
+                            failure_rate=round(self.current_failure_rate(), 3))
+        self.state = state
+        if state == "open":
+            self.opened_at = time.monotonic()
+        if state != "half_open":
+            self.probes = 0
+        if state == "closed":
+            self.outcomes.clear()
+
+    def current_failure_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def allow(self) -> None:
+        """Raises CircuitOpenError unless a call may go through now."""
+        if self.state == "open":
+            retry_in = self.opened_at + self.reset_timeout_s - time.monotonic()
+            if retry_in > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, retry_in)
+            self._transition("half_open", "reset timeout elapsed")
+        if self.state == "half_open":
+            if self.probes >= self.half_open_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, 0.0)
+            self.probes += 1
+
+    def record(self, ok: bool, latency_s: float = 0.0) -> None:
+        if ok and self.slow_call_s is not None and latency_s > self.slow_call_s:
+            ok = False
+        if self.state == "half_open":
+            self._transition("closed" if ok else "open", "probe succeeded" if ok else "probe failed")
+            return
+        self.outcomes.append(ok)
+        if (self.state == "closed" and len(self.outcomes) >= self.min_calls
+                and self.current_failure_rate() >= self.failure_rate):
+            self._transition("open", f"failure rate {self.current_failure_rate():.0%} over {len(self.outcomes)} calls")
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        self.allow()
+        start = time.monotonic()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # A call cut off by a timeout after running past slow_call_s counts as slow;
+            # any other cancellation (e.g. a hedge losing) says nothing about the provider.
+            if self.slow_call_s is not None and time.monotonic() - start > self.slow_call_s:
+                self.record(False, time.monotonic() - start)
+            elif self.state == "half_open":
+                self.probes -= 1
+            raise
+        except Exception as e:
+            # Errors caused by the request itself (bad input) do not count against the provider.
+            self.record(not is_retryable(e), time.monotonic() - start)
+            raise
+        self.record(True, time.monotonic() - start)
+        return result
+
+    def snapshot(self) -> dict:
+        return {"name": self.name, "state": self.state, "failure_rate": round(self.current_failure_rate(), 3),
+                "calls_in_window": len(self.outcomes), "rejected": self.rejected}
+
+
+class Fallback:
+    """One step of a FallbackChain: fn(*args) retried with `retry` kwargs, guarded by an optional breaker."""
+
+    def __init__(self, name: str, fn: Callable[..., Awaitable[Any]], breaker: Optional[CircuitBreaker] = None,
+                 retry: Optional[dict] = None):
+        self.name = name
+        self.fn = fn
+        self.breaker = breaker
+        self.retry = retry if retry is not None else {}
+
+
+class FallbackChain:
+    """
+    Tries each step in order until one succeeds. A step whose breaker is open
+    is skipped at once. With cache_size > 0, successful answers are kept by
+    key_fn(*args) and served as the last resort ("cache" step). Every fallback
+    is emitted as a "fallback" telemetry event with the failing step and reason.
+    deadline_s bounds the whole chain: each step gets at most what is left of it.
+    """
+
+    def __init__(self, steps: List[Fallback], cache_size: int = 0,
+                 key_fn: Callable[..., Hashable] = lambda *args: args, deadline_s: Optional[float] = None,
+                 telemetry: Optional[RoutingTelemetry] = None):
+        self.steps = steps
+        self.deadline_s = deadline_s
+        self.cache_size = cache_size
+        self.key_fn = key_fn
+        self.cache: Dict[Hashable, Any] = {}
+        self.telemetry = telemetry or RoutingTelemetry()
+        for step in steps:
+            if step.breaker is not None:
+                step.breaker.telemetry = self.telemetry
+        self.served: Dict[str, int] = {}
+        self.fallback_reasons: Dict[str, int] = {}
+        self.last_attempts: List[dict] = []
+
+    def _remember(self, key: Hashable, result: Any) -> None:
+        if self.cache_size <= 0:
+            return
+        self.cache.pop(key, None)
+        self.cache[key] = result
+        while len(self.cache) > self.cache_size:
+            self.cache.pop(next(iter(self.cache)))
+
+    def _fell_back(self, attempts: List[dict], step: str, reason: str, start: float) -> None:
+        attempts.append({"step": step, "reason": reason, "latency_s": round(time.monotonic() - start, 4)})
+        key = f"{step}:{reason}"
+        self.fallback_reasons[key] = self.fallback_reasons.get(key, 0) + 1
+        self.telemetry.emit("fallback", step=step, reason=reason)
+
+    async def call(self, *args) -> Any:
+        key = self.key_fn(*args)
+        attempts: List[dict] = []
+        self.last_attempts = attempts
+        deadline = time.monotonic() + self.deadline_s if self.deadline_s is not None else None
+        for step in self.steps:
+            start = time.monotonic()
+            retry = dict(step.retry)
+            if deadline is not None:
+                if deadline - start <= 0:
+                    self._fell_back(attempts, step.name, "chain_deadline", start)
+                    continue
+                step_deadline = retry.get("deadline_s", 20.0)
+                retry["deadline_s"] = min(step_deadline, deadline - start) if step_deadline else deadline - start
+
+            async def attempt(step=step):
+                if step.breaker is not None:
+                    return await step.breaker.call(lambda: step.fn(*args))
+                return await step.fn(*args)
+
+            def retried(n, exc, delay, step=step):
+                self.telemetry.emit("retry", step=step.name, attempt=n, reason=failure_reason(exc),
+                                    delay_s=round(delay, 3))
+
+            try:
+                result = await retry_async(attempt, on_retry=retried, **retry)
+            except Exception as e:
+                self._fell_back(attempts, step.name, failure_reason(e), start)
+                continue
+            self._remember(key, result)
+            self.served[step.name] = self.served.get(step.name, 0) + 1
+            attempts.append({"step": step.name, "reason": "ok", "latency_s": round(time.monotonic() - start, 4)})
+            return result
+        if self.cache_size > 0:
+            if key in self.cache:
+                self.served["cache"] = self.served.get("cache", 0) + 1
+                attempts.append({"step": "cache", "reason": "ok", "latency_s": 0.0})
+                return self.cache[key]
+            self._fell_back(attempts, "cache", "miss", time.monotonic())
+        raise AllFallbacksFailed(attempts)
+
+    def snapshot(self) -> dict:
+        return {"served": dict(self.served), "fallback_reasons": dict(self.fallback_reasons),
+                "breakers": [s.breaker.snapshot() for s in self.steps if s.breaker is not None]}
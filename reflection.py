@@ -1,18 +1,37 @@
 import os
+import re
+import time
+import asyncio
+from functools import lru_cache
+from typing import Callable, List, Optional
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, HumanMessage
+from lazy import lazy_attributes
+from model_pricing import estimate_tokens
 
 load_dotenv()
 
-if not os.getenv("OPENAI_API_KEY"):
-    raise ValueError("OPENAI_API_KEY not found in .env file.")
+def _create_llm():
+    from langchain_openai import ChatOpenAI
+    from llm_cache import enable_llm_cache_from_env
+    from tracing import enable_tracing_from_env
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0.1)
+    if not os.getenv("OPENAI_API_KEY"):
+        raise ValueError("OPENAI_API_KEY not found in .env file.")
+    # The model runs at temperature 0.1 (candidates at --temperature), which the cache skips
+    # by default: set LLM_CACHE_ALL_TEMPERATURES=1 along with LLM_CACHE_PATH to cache its calls.
+    enable_llm_cache_from_env()
+    enable_tracing_from_env()
+    return ChatOpenAI(model="gpt-4o", temperature=0.1)
 
-def run_reflection_loop():
-    task_prompt = """
+# Created on first use; assign reflection.llm beforehand to use another model.
+_lazy, __getattr__ = lazy_attributes(globals(), {"llm": _create_llm})
+
+def get_llm():
+    return _lazy("llm")
+
+TASK_PROMPT = """
     You task is to create a Python function named `calculate_factorial`.
     This function should do the following:
     1. Accept a single integer `n` as input.
@@ -22,56 +41,342 @@ def run_reflection_loop():
     5. Handle Invalid input: Raise a ValueError if the input is a negative number.
     """
 
-    max_iterations = 3
+REFLECTOR_SYSTEM_PROMPT = """ You are a senior software engineer and an expert
+            in Python.
+            Your role is to perform a meticulous code review.
+            Critically evaluate the provided Python code based
+            on the original task requirements.
+            Look for bugs, style issues, missing edge cases,
+            and areas for improvement.
+            If the code is perfect and meets all requirements,
+            respond with the single phrase 'CODE_IS_PERFECT'.
+            Otherwise, provide a bulleted list of your critiques. """
+
+# --- Token counting ---
+# Uses the offline ~4 characters per token estimate. Setting REFLECTION_TOKENIZER to a
+# tokenizer.json path or a Hugging Face hub name (e.g. gpt2) opts in to exact counts
+# with the `tokenizers` package; hub downloads are skipped when HF_HUB_OFFLINE=1, and
+# the estimate is used whenever the tokenizer cannot be loaded.
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    name = os.getenv("REFLECTION_TOKENIZER")
+    if not name:
+        return None
+    try:
+        from tokenizers import Tokenizer
+        if os.path.exists(name):
+            return Tokenizer.from_file(name)
+        if os.getenv("HF_HUB_OFFLINE") == "1":
+            return None
+        return Tokenizer.from_pretrained(name)
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    tokenizer = _tokenizer()
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode(text).ids)
+
+def message_tokens(messages: List[BaseMessage]) -> int:
+    # A few tokens of per-message framing, as chat formats add role markers.
+    return sum(count_tokens(m.content) + 4 for m in messages)
+
+# --- History compaction ---
+# The full history resends every code version and critique on each refinement, so
+# prompt tokens grow quadratically with iterations. The compact history keeps only the
+# task, the latest code and the latest critique, plus an extractive summary of older
+# critiques, and fits it to a token budget.
+
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.*\S)")
+
+def _critique_points(critique: str):
+    for line in critique.splitlines():
+        match = _BULLET.match(line)
+        point = (match.group(1) if match else line).strip()
+        yield point, re.sub(r"\W+", " ", point.lower()).strip()
+
+def summarize_critiques(critiques: List[str], max_tokens: int, exclude: str = "") -> str:
+    """
+    Extractive rolling summary: distinct bullet points of older critiques, newest
+    first, within max_tokens. Points already in `exclude` (the latest critique) are skipped.
+    """
+    points = []
+    seen = {key for _, key in _critique_points(exclude)}
+    for critique in reversed(critiques):
+        for point, key in _critique_points(critique):
+            if len(key) < 8 or key in seen:
+                continue
+            seen.add(key)
+            points.append(f"- {point}")
+    summary, used = [], 0
+    for point in points:
+        cost = count_tokens(point) + 1
+        if used + cost > max_tokens:
+            break
+        summary.append(point)
+        used += cost
+    return "\n".join(summary)
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    # Cut proportionally, then trim until it fits.
+    cut = text[: max(0, int(len(text) * max_tokens / max(1, count_tokens(text))))]
+    while cut and count_tokens(cut + " [...]") > max_tokens:
+        cut = cut[: int(len(cut) * 0.9)]
+    return cut + " [...]"
+
+def build_refine_messages(task: str, code: str, critique: str, older_critiques: List[str],
+                          token_budget: int = 3000, summary_tokens: int = 300) -> List[BaseMessage]:
+    """
+    Task, latest code, latest critique (+ summary of older ones) and the refine
+    instruction. The task and code are always kept; when over token_budget the
+    summary is shrunk, then dropped, then the critique is truncated.
+    """
+    fixed = [HumanMessage(content=task), AIMessage(content=code),
+             HumanMessage(content="Please refine the code using the critiques provided.")]
+    available = token_budget - message_tokens(fixed) - 4
+
+    summary = summarize_critiques(older_critiques, min(summary_tokens, max(0, available // 3)), exclude=critique)
+    critique_text = f"Critique of the previous code:\n{critique}"
+    if summary:
+        critique_text += f"\n\nStill relevant from earlier reviews:\n{summary}"
+    if count_tokens(critique_text) > available:
+        critique_text = _truncate_to_tokens(f"Critique of the previous code:\n{critique}", max(0, available))
+    return [fixed[0], fixed[1], HumanMessage(content=critique_text), fixed[2]]
+
+def _record(log: List[dict], messages: List[BaseMessage], response, start: float, iteration: int, stage: str,
+            **extra) -> None:
+    usage = getattr(response, "usage_metadata", None) or {}
+    log.append({
+        "iteration": iteration,
+        "stage": stage,
+        "prompt_tokens": usage.get("input_tokens") or message_tokens(messages),
+        "output_tokens": usage.get("output_tokens") or count_tokens(response.content),
+        "latency_s": time.perf_counter() - start,
+        **extra,
+    })
+
+def _invoke(messages: List[BaseMessage], log: List[dict], iteration: int, stage: str):
+    start = time.perf_counter()
+    response = get_llm().invoke(messages)
+    _record(log, messages, response, start, iteration, stage)
+    return response
+
+async def _ainvoke(model, messages: List[BaseMessage], log: List[dict], iteration: int, stage: str,
+                   semaphore: asyncio.Semaphore, **extra):
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            response = await model.ainvoke(messages)
+        except asyncio.CancelledError:
+            # The prompt was sent, so count it; whatever was generated before the cancel is unknown.
+            log.append({"iteration": iteration, "stage": stage, "prompt_tokens": message_tokens(messages),
+                        "output_tokens": 0, "latency_s": time.perf_counter() - start, "cancelled": True, **extra})
+            raise
+        except Exception as e:
+            log.append({"iteration": iteration, "stage": stage, "prompt_tokens": message_tokens(messages),
+                        "output_tokens": 0, "latency_s": time.perf_counter() - start,
+                        "error": f"{type(e).__name__}: {e}", **extra})
+            raise
+    _record(log, messages, response, start, iteration, stage, **extra)
+    return response
+
+def print_iteration_log(log: List[dict]) -> None:
+    print(f"\n{'iter':>4} {'stage':<14} {'prompt tok':>10} {'output tok':>10} {'latency s':>9}")
+    for row in log:
+        stage = row["stage"] + (f" #{row['candidate']}" if "candidate" in row else "")
+        stage += " (x)" if row.get("cancelled") else " (!)" if row.get("error") else ""
+        print(f"{row['iteration']:>4} {stage:<14} {row['prompt_tokens']:>10} {row['output_tokens']:>10} "
+              f"{row['latency_s']:>9.2f}")
+    print(f"total prompt tokens: {sum(r['prompt_tokens'] for r in log)}, "
+          f"total latency: {sum(r['latency_s'] for r in log):.2f}s")
+
+def run_reflection_loop(task_prompt: str = TASK_PROMPT, max_iterations: int = 3, history: str = "compact",
+                        token_budget: int = 3000, summary_tokens: int = 300) -> dict:
+    """
+    Generate -> critique -> refine until the reviewer answers CODE_IS_PERFECT or
+    max_iterations is reached. history is "compact" (token-budgeted, see
+    build_refine_messages) or "full" (every version and critique is resent).
+    Returns {"code", "iterations", "log"}.
+    """
     current_code = ""
+    critiques: List[str] = []
     message_history = [HumanMessage(content=task_prompt)]
+    log: List[dict] = []
+    started = time.perf_counter()
 
     for i in range(max_iterations):
         print("\n" + "="*25 + f" REFLECTION LOOP: ITERATION {i+1} " +"="*25)
-    # -- 1. Generate /Refine stage --
-    # In the first iteration , it generates.In subsequent iterations, it refines.
+        # -- 1. Generate /Refine stage --
+        # In the first iteration , it generates.In subsequent iterations, it refines.
         if i==0:
             print("\n>>> STAGE 1: GENERATING initial code..")
             # The first stage is just task prompt
-            response = llm.invoke(message_history)
-            current_code = response.content
+            response = _invoke(message_history, log, i + 1, "generate")
         else:
             print("\n>>> STAGE 1: Refine code based on previous critique...")
-            # The message history now contains the task,
-            # the last code , and the last critique.
-            # we construct the model to apply the critiques
-            message_history.append(HumanMessage(content="Please refine the code using the critiques provided."))
-            response = llm.invoke(message_history)
-            current_code = response.content
-            print("\n--- Generated code (v" + str(i+1)+") ---\n"+ current_code)
-            message_history.append(response)
-
-            # ---2. REFLECT STAGE:
-            print("\n>>> STAGE 2: REFLECTING on the generated code...")
-            # Create a specific prompt for the reflector agent.
-            # This asks the model to act as a senior code reviewer.
-            reflector_prompt = [SystemMessage(content=""" You are a senior software engineer and an expert 
-            in Python. 
-            Your role is to perform a meticulous code review. 
-            Critically evaluate the provided Python code based 
-            on the original task requirements. 
-            Look for bugs, style issues, missing edge cases, 
-            and areas for improvement. 
-            If the code is perfect and meets all requirements, 
-            respond with the single phrase 'CODE_IS_PERFECT'. 
-            Otherwise, provide a bulleted list of your critiques. """),
-            HumanMessage(content=f"Original Task:\n{task_prompt}\n\nCode to Review:\n{current_code}") ]
-            critique_response = llm.invoke(reflector_prompt)
-            critique = critique_response.content
-            # ---3. STOPPING CONDITION ---
-            if "CODE_IS_PERFECT" in critique:
-                print("\n---Critique---\nNo further critique found.The code is satisfactory.")
+            if history == "full":
+                message_history.append(HumanMessage(content="Please refine the code using the critiques provided."))
+                messages = message_history
+            else:
+                messages = build_refine_messages(task_prompt, current_code, critiques[-1], critiques[:-1],
+                                                 token_budget, summary_tokens)
+            response = _invoke(messages, log, i + 1, "refine")
+        current_code = response.content
+        print("\n--- Generated code (v" + str(i+1)+") ---\n"+ current_code)
+        message_history.append(response)
+
+        # ---2. REFLECT STAGE:
+        print("\n>>> STAGE 2: REFLECTING on the generated code...")
+        # The reviewer only ever sees the task and the current code.
+        reflector_prompt = [SystemMessage(content=REFLECTOR_SYSTEM_PROMPT),
+                            HumanMessage(content=f"Original Task:\n{task_prompt}\n\nCode to Review:\n{current_code}")]
+        critique = _invoke(reflector_prompt, log, i + 1, "critique").content
+        # ---3. STOPPING CONDITION ---
+        if "CODE_IS_PERFECT" in critique:
+            print("\n---Critique---\nNo further critique found.The code is satisfactory.")
+            break
+        print("\n---Critique---\n" + critique)
+        critiques.append(critique)
+        message_history.append(HumanMessage(content=f"Critique of the previous code:\n{critique}"))
+
+    print("\n"+"="*30 + "FINAL RESULT"+"="*30)
+    print("\nFinal refine code after the reflection process:\n")
+    print(current_code)
+    print_iteration_log(log)
+    return {"code": current_code, "iterations": log[-1]["iteration"] if log else 0, "log": log,
+            "wall_clock_s": time.perf_counter() - started}
+
+# --- Best-of-N ---
+# Round 1 samples N candidates concurrently and critiques each one as soon as it is
+# generated. When a critique is accepted the remaining candidates are cancelled;
+# otherwise only the best-scored candidate is carried into the refine rounds.
+# Wall-clock drops to roughly one generate + critique per round, at the cost of
+# up to N times the round-1 tokens.
+
+def critique_score(critique: str) -> int:
+    """Number of critique points (lower is better); 0 for CODE_IS_PERFECT."""
+    if "CODE_IS_PERFECT" in critique:
+        return 0
+    return max(1, sum(1 for line in critique.splitlines() if _BULLET.match(line)))
+
+def is_perfect(critique: str) -> bool:
+    return critique_score(critique) == 0
+
+def _reviewer_messages(task_prompt: str, code: str) -> List[BaseMessage]:
+    return [SystemMessage(content=REFLECTOR_SYSTEM_PROMPT),
+            HumanMessage(content=f"Original Task:\n{task_prompt}\n\nCode to Review:\n{code}")]
+
+async def run_best_of_n(task_prompt: str = TASK_PROMPT, n: int = 3, max_concurrency: Optional[int] = None,
+                        max_iterations: int = 3, accept: Callable[[str], bool] = is_perfect,
+                        early_stop: bool = True, temperature: float = 0.8, token_budget: int = 3000,
+                        summary_tokens: int = 300) -> dict:
+    """
+    Best-of-N variant of run_reflection_loop. n candidates are generated at
+    `temperature` with at most max_concurrency (default n) LLM calls in flight.
+    accept(critique) decides when a candidate is done; with early_stop the first
+    accepted candidate cancels the rest, otherwise all n finish and the best wins.
+    A candidate whose generate or critique call fails is dropped (the error is in
+    the log); the run fails only when every candidate does.
+    Returns {"code", "iterations", "log", "wall_clock_s", "candidates"}.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or n)
+    llm = get_llm()
+    sampler = llm.bind(temperature=temperature) if n > 1 else llm
+    log: List[dict] = []
+    started = time.perf_counter()
+
+    async def candidate(index: int):
+        response = await _ainvoke(sampler, [HumanMessage(content=task_prompt)], log, 1, "generate", semaphore,
+                                  candidate=index)
+        critique = (await _ainvoke(llm, _reviewer_messages(task_prompt, response.content), log, 1, "critique",
+                                   semaphore, candidate=index)).content
+        return index, response.content, critique
+
+    print("\n" + "="*25 + f" BEST-OF-{n}: ITERATION 1 " + "="*25)
+    tasks = [asyncio.create_task(candidate(i + 1)) for i in range(n)]
+    results, errors = [], []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            # A failed candidate is only a lost sample; the call is already in `log`.
+            try:
+                index, code, critique = await next_done
+            except Exception as e:
+                errors.append(e)
+                print(f"candidate failed: {type(e).__name__}: {e}")
+                continue
+            results.append((critique_score(critique), index, code, critique))
+            print(f"candidate #{index}: {critique_score(critique)} critique point(s)")
+            if early_stop and accept(critique):
                 break
-            print("\n---Critique---\n" + critique)
-            message_history.append(HumanMessage(content=f"Critique of the previous code:\n{critique}"))
-            print("\n"+"="*30 + "FINAL RESULT"+"="*30)
-            print("\nFinal refine code after the reflection process:\n")
-            print(current_code)
+    finally:
+        pending = [t for t in tasks if not t.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            print(f"cancelled {len(pending)} pending candidate(s)")
+
+    if not results:
+        raise RuntimeError(f"all {n} candidates failed") from (errors[-1] if errors else None)
+    score, index, current_code, critique = min(results, key=lambda r: (not accept(r[3]), r[0]))
+    print(f"best candidate: #{index} ({score} critique point(s))")
+    critiques: List[str] = []
+    iteration = 1
+    while not accept(critique) and iteration < max_iterations:
+        iteration += 1
+        critiques.append(critique)
+        print("\n" + "="*25 + f" BEST-OF-{n}: ITERATION {iteration} " + "="*25)
+        messages = build_refine_messages(task_prompt, current_code, critiques[-1], critiques[:-1],
+                                         token_budget, summary_tokens)
+        current_code = (await _ainvoke(llm, messages, log, iteration, "refine", semaphore)).content
+        critique = (await _ainvoke(llm, _reviewer_messages(task_prompt, current_code), log, iteration, "critique",
+                                   semaphore)).content
+        print(f"refined: {critique_score(critique)} critique point(s)")
+
+    print("\n"+"="*30 + "FINAL RESULT"+"="*30)
+    print(current_code)
+    print_iteration_log(log)
+    return {"code": current_code, "iterations": iteration, "log": log, "candidates": len(results),
+            "wall_clock_s": time.perf_counter() - started}
+
+def print_tradeoffs(runs: dict) -> None:
+    """Wall-clock vs. tokens for {label: result} from run_reflection_loop / run_best_of_n."""
+    print(f"\n{'mode':<16} {'wall s':>7} {'llm s':>7} {'calls':>5} {'cancelled':>9} {'prompt tok':>10} "
+          f"{'output tok':>10}")
+    for label, run in runs.items():
+        log = run["log"]
+        print(f"{label:<16} {run['wall_clock_s']:>7.2f} {sum(r['latency_s'] for r in log):>7.2f} {len(log):>5} "
+              f"{sum(1 for r in log if r.get('cancelled')):>9} {sum(r['prompt_tokens'] for r in log):>10} "
+              f"{sum(r['output_tokens'] for r in log):>10}")
+
 if __name__=="__main__":
-    run_reflection_loop()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate/critique/refine reflection loop.")
+    parser.add_argument("--max-iterations", type=int, default=3)
+    parser.add_argument("--history", choices=("compact", "full"), default="compact")
+    parser.add_argument("--token-budget", type=int, default=3000)
+    parser.add_argument("--candidates", type=int, default=1, help="best-of-N candidates per first round")
+    parser.add_argument("--concurrency", type=int, default=None, help="max LLM calls in flight (default: candidates)")
+    parser.add_argument("--accept-points", type=int, default=0,
+                        help="accept a candidate with at most this many critique points (0 = CODE_IS_PERFECT only)")
+    parser.add_argument("--no-early-stop", action="store_true", help="let all candidates finish before choosing")
+    parser.add_argument("--temperature", type=float, default=0.8, help="sampling temperature for candidates")
+    parser.add_argument("--compare", action="store_true", help="run the sequential loop too and compare")
+    args = parser.parse_args()
 
+    runs = {}
+    if args.candidates <= 1 or args.compare:
+        runs["sequential"] = run_reflection_loop(max_iterations=args.max_iterations, history=args.history,
+                                                 token_budget=args.token_budget)
+    if args.candidates > 1:
+        runs[f"best-of-{args.candidates}"] = asyncio.run(run_best_of_n(
+            n=args.candidates, max_concurrency=args.concurrency, max_iterations=args.max_iterations,
+            accept=lambda critique: critique_score(critique) <= args.accept_points,
+            early_stop=not args.no_early_stop, temperature=args.temperature, token_budget=args.token_budget))
+    if len(runs) > 1:
+        print_tradeoffs(runs)
@@ -1,27 +1,61 @@
-from google_adk.agents import SequentialAgent, LlmAgent
+from google.adk.agents import SequentialAgent, LlmAgent
+from tracing import enable_tracing_from_env, instrument_agent
 
-generator = LlmAgent(
-    name = "DraftWriter",
-    decsription="Generated initial draft content on a given subject.",
-    instruction = "Write a short, informative paragraph about the user's subject.",
-    output_key = "draft_text"
-)
+def build_review_pipeline(generator_model="gemini-2.5-flash", reviewer_model="gemini-2.5-flash") -> SequentialAgent:
+    """DraftWriter -> FactChecker. Models can be names or BaseLlm instances (e.g. fake_adk_llm.StubLlm)."""
+    generator = LlmAgent(
+        name = "DraftWriter",
+        model = generator_model,
+        description="Generated initial draft content on a given subject.",
+        instruction = "Write a short, informative paragraph about the user's subject.",
+        output_key = "draft_text"
+    )
 
-reviewer = LlmAgent(
-    name = "FactChecker",
-    description= "Reviews a given text for factual accuracy and provides a structured critique.",
-    instruction = """
-    You are a meticulous fact-checker.
-    1. Read the text provided in the state key 'draft_text'.
-    2. Carefully verify the factual accuracy of all claims.
-    3. Your final output must be a dictionary containing two keys:
-       -"status":A string, either "ACCURATE" or "INACCURATE".
-       -"reasoning": A string providing a clear explanation for your status ,citing specific issues if any are found.
-       """,
-    output_key = "review_output"
-)
+    reviewer = LlmAgent(
+        name = "FactChecker",
+        model = reviewer_model,
+        description= "Reviews a given text for factual accuracy and provides a structured critique.",
+        instruction = """
+        You are a meticulous fact-checker.
+        1. Read the text provided in the state key 'draft_text'.
+        2. Carefully verify the factual accuracy of all claims.
+        3. Your final output must be a dictionary containing two keys:
+           -"status":A string, either "ACCURATE" or "INACCURATE".
+           -"reasoning": A string providing a clear explanation for your status ,citing specific issues if any are found.
+           """,
+        output_key = "review_output"
+    )
 
-review_pipeline = SequentialAgent(
-    name = "WriteAndReview_Pipeline",
-    sub_agents = [generator, reviewer]
-)
+    return SequentialAgent(
+        name = "WriteAndReview_Pipeline",
+        sub_agents = [generator, reviewer]
+    )
+
+review_pipeline = build_review_pipeline()
+generator, reviewer = review_pipeline.sub_agents
+tracer = enable_tracing_from_env()
+if tracer:
+    instrument_agent(review_pipeline, tracer)
+
+if __name__ == "__main__":
+    import asyncio
+    import argparse
+    from pipeline_executor import run_pipelined
+
+    parser = argparse.ArgumentParser(description="Draft and fact-check many subjects with overlapping stages.")
+    parser.add_argument("subjects", nargs="+")
+    parser.add_argument("--writers", type=int, default=1)
+    parser.add_argument("--checkers", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=4)
+    args = parser.parse_args()
+
+    results, executor = asyncio.run(run_pipelined(
+        review_pipeline, args.subjects, workers={"DraftWriter": args.writers, "FactChecker": args.checkers},
+        queue_size=args.queue_size))
+    for subject, result in zip(args.subjects, results):
+        print(f"\n=== {subject} ===")
+        if result["error"]:
+            print("error:", result["error"])
+        else:
+            print(result["value"]["state"].get("review_output"))
+    print("\n" + executor.format_metrics())
@@ -1,8 +1,15 @@
-from typing import AsyncGenerator
+import os
+import time
+import asyncio
+from typing import Any, AsyncGenerator, List
 
 from google.adk.agents import Agent
+from pydantic import Field
 
-from retrieval import response
+from model_pricing import estimate_tokens
+from routing_policy import AdaptivePolicy, ExecutionMetrics, RoutingTelemetry, heuristic_confidence
+from routing_policy import run_cascade, run_hedged
+from tracing import enable_tracing_from_env, instrument_agent
 
 gemini_pro_agent = Agent(
     name= "GeminiProAgent",
@@ -23,23 +30,122 @@ gemini_flash_agent = Agent(
 from google.adk.agents import BaseAgent
 from google.adk.events import Event
 from google.adk.agents.invocation_context import InvocationContext
-import asyncio
+
+def default_policy() -> AdaptivePolicy:
+    """Adaptive routing between the two agents' models; ROUTING_* env vars tune it."""
+    budget = os.getenv("ROUTING_SESSION_BUDGET_USD")
+    slo = os.getenv("ROUTING_LATENCY_SLO_S")
+    return AdaptivePolicy(
+        cheap=gemini_flash_agent.model,
+        strong=gemini_pro_agent.model,
+        threshold=float(os.getenv("ROUTING_THRESHOLD", "0.5")),
+        budget_usd=float(budget) if budget else None,
+        latency_slo_s=float(slo) if slo else None,
+        telemetry=RoutingTelemetry(os.getenv("ROUTING_TELEMETRY_PATH")),
+    )
+
+
+def _content_text(content) -> str:
+    parts = getattr(content, "parts", None) or []
+    return "".join(part.text for part in parts if getattr(part, "text", None))
+
 
 class QueryRouterAgent(BaseAgent):
     name:str= "QueryRouter"
     description:str = "Routes user queries to the appropriate LLM agent based on complexity"
+    policy: Any = Field(default_factory=default_policy)
+    # "route": one model per query, streamed.
+    # "cascade": queries within cascade_margin of the policy threshold try the cheap
+    #   model first and escalate when self_check(answer) < accept_confidence.
+    # "hedge": a backup request goes to policy.hedge_model(routed model) (the stronger
+    #   model, or the same one again) once the routed one has run past its p95
+    #   latency; the slower request is cancelled, with its input tokens charged.
+    mode: str = Field(default_factory=lambda: os.getenv("ROUTING_MODE", "route"))
+    cascade_margin: float = 0.2
+    accept_confidence: float = 0.6
+    self_check: Any = heuristic_confidence
+    metrics: Any = Field(default_factory=ExecutionMetrics)
+
+    def _agent_for(self, model: str) -> BaseAgent:
+        return next(a for a in self.sub_agents if a.model == model)
+
+    async def _run_model(self, decision, context: InvocationContext) -> List[Event]:
+        """Runs the decided agent to completion, buffering its events, and reports the outcome to the policy."""
+        start = time.monotonic()
+        events = []
+        output_tokens = 0
+        try:
+            async for event in self._agent_for(decision.model).run_async(context):
+                text = _content_text(event.content)
+                if text:
+                    output_tokens += estimate_tokens(text)
+                events.append(event)
+        except asyncio.CancelledError:
+            # The losing side of a hedge: its input tokens are charged, its censored latency is not recorded.
+            self.policy.observe_cancelled(decision, time.monotonic() - start)
+            raise
+        except Exception:
+            self.policy.observe(decision, time.monotonic() - start, output_tokens, ok=False)
+            raise
+        self.policy.observe(decision, time.monotonic() - start, output_tokens)
+        return events
 
     async def _run_async_impl(self, context: InvocationContext) -> AsyncGenerator[Event, None]:
-        user_query = context.current_message.text
-        query_length = len(user_query.split())
-        if query_length < 20:
-            print(f"Route to gemini flash agent for short query(length:{query_length})")
-            response = await gemini_flash_agent.run_async(context.current_message)
-            yield Event(author=self.name, content=f"Flash Agent processed:{response}")
-        else:
-            print(f"Routing to gemini pro agent for complex queries(length:{query_length})")
-            response = await  gemini_pro_agent.run_async(context.current_message)
-            yield Event(author=self.name, content=f"Pro Agent processed:{response}")
+        user_query = _content_text(context.user_content)
+        session_id = context.session.id
+        decision = self.policy.choose(user_query, session_id)
+        policy = self.policy
+
+        if self.mode == "cascade" and abs(decision.score - policy.threshold) <= self.cascade_margin:
+            print(f"Cascade: trying {policy.cheap} first (complexity {decision.score:.2f})")
+            events, escalated = await run_cascade(
+                lambda: self._run_model(policy.decision_for(policy.cheap, user_query, session_id, "cascade", decision.score), context),
+                lambda: self._run_model(policy.decision_for(policy.strong, user_query, session_id, "escalation", decision.score), context),
+                confidence=lambda events: self.self_check("".join(_content_text(e.content) for e in events)),
+                accept=self.accept_confidence,
+                metrics=self.metrics,
+            )
+            if escalated:
+                print(f"Cascade: escalated to {policy.strong}")
+            for event in events:
+                yield event
+            return
+
+        if self.mode == "hedge":
+            backup_model = policy.hedge_model(decision.model)
+            delay = policy.hedge_delay(decision.model)
+            print(f"Hedged: {decision.model}, backup {backup_model} after {delay:.2f}s")
+            events, winner = await run_hedged(
+                lambda: self._run_model(decision, context),
+                lambda: self._run_model(policy.decision_for(backup_model, user_query, session_id, "hedge", decision.score), context),
+                delay_s=delay,
+                metrics=self.metrics,
+            )
+            for event in events:
+                yield event
+            return
+
+        agent = self._agent_for(decision.model)
+        print(f"Routing to {agent.name} ({decision.reason}, complexity {decision.score:.2f})")
+        start = time.monotonic()
+        output_tokens = 0
+        ok = False
+        try:
+            async for event in agent.run_async(context):
+                text = _content_text(event.content)
+                if text:
+                    output_tokens += estimate_tokens(text)
+                yield event
+            ok = True
+        finally:
+            self.policy.observe(decision, time.monotonic() - start, output_tokens, ok)
+            self.metrics.observe("route", time.monotonic() - start)
+
+
+query_router_agent = QueryRouterAgent(sub_agents=[gemini_flash_agent, gemini_pro_agent])
+tracer = enable_tracing_from_env()
+if tracer:
+    instrument_agent(query_router_agent, tracer)
 
 CRITIC_SYSTEM_PROMPT="""
 You are the **Critic Agent**, serving as the quality assurance arm of our collaborative research
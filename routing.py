@@ -1,27 +1,32 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough, RunnableBranch, RunnableLambda
+from langchain_core.runnables import Runnable, RunnablePassthrough, RunnableBranch, RunnableLambda
 import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
+from lazy import lazy_attributes
+from local_router import LocalRouter, RoutingMetrics
 
 load_dotenv()
-google_api_key = os.getenv("GOOGLE_API_KEY")
 
-try:
-    llm = ChatGoogleGenerativeAI(
+def _create_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from llm_cache import enable_llm_cache_from_env
+    from tracing import enable_tracing_from_env
+
+    enable_llm_cache_from_env()
+    enable_tracing_from_env()
+    return ChatGoogleGenerativeAI(
         model="gemini-2.5-flash",
         temperature=0,
-        google_api_key=google_api_key  # optional if env is set
+        google_api_key=os.getenv("GOOGLE_API_KEY")  # optional if env is set
     )
-    print(f"Language model initiated: {llm.model}")
-except Exception as e:
-    print(f"Error Initializing language model: {e}")
-    llm = None  # only set None on failure
-
-if llm is None:
-    print("\nSkipping execution time due to LLM initialization failure.")
-    raise SystemExit(1)
 
 # Handlers
 def booking_handler(request: str) -> str:
@@ -45,7 +50,41 @@ coordinator_router_prompt = ChatPromptTemplate.from_messages([
 ONLY output one word: 'booker', 'info', or 'unclear'."""),
     ("user", "{request}")
 ])
-router_chain = coordinator_router_prompt | llm | StrOutputParser()
+def build_router_chain(model) -> Runnable:
+    return coordinator_router_prompt | model | StrOutputParser()
+
+# Local fast path: rules + hashed n-gram classifier, loaded on first use. Only requests
+# it is unsure about reach router_chain, and those LLM decisions are logged for retraining.
+def _load_local_router() -> LocalRouter:
+    return LocalRouter.load(
+        log_path=os.getenv("ROUTER_LOG_PATH", "router_decisions.jsonl"),
+        threshold=float(os.getenv("LOCAL_ROUTER_THRESHOLD", "0.9")),
+    )
+
+routing_metrics = RoutingMetrics()
+
+def build_hybrid_router(router_chain: Runnable, local_router: LocalRouter, metrics: RoutingMetrics) -> Runnable:
+    def route_request(x: dict) -> str:
+        start = time.perf_counter()
+        route, confidence, source = local_router.predict(x["request"])
+        if not local_router.accepts(confidence, source):
+            route = router_chain.invoke(x)
+            local_router.record_llm_decision(x["request"], route)
+            source = "llm"
+        metrics.observe(source, time.perf_counter() - start)
+        return route
+
+    async def aroute_request(x: dict) -> str:
+        start = time.perf_counter()
+        route, confidence, source = local_router.predict(x["request"])
+        if not local_router.accepts(confidence, source):
+            route = await router_chain.ainvoke(x)
+            local_router.record_llm_decision(x["request"], route)
+            source = "llm"
+        metrics.observe(source, time.perf_counter() - start)
+        return route
+
+    return RunnableLambda(route_request, afunc=aroute_request)
 
 # Helpers
 to_text = RunnableLambda(lambda x: x["request"])
@@ -60,14 +99,169 @@ branch = RunnableBranch(
     to_text | unclear_r,  # default
 )
 
-# Full pipeline
-coordinator_agent = (
-    RunnableLambda(lambda x: {"request": x} if isinstance(x, str) else x)
-    | RunnablePassthrough.assign(route=router_chain)
-    | branch
-)
+def build_coordinator_agent(hybrid_router: Runnable) -> Runnable:
+    return (
+        RunnableLambda(lambda x: {"request": x} if isinstance(x, str) else x)
+        | RunnablePassthrough.assign(route=hybrid_router)
+        | branch
+    )
+
+# llm, router_chain, local_router, hybrid_router and the full coordinator_agent
+# pipeline are built on first access, so importing this module makes no client.
+_lazy, __getattr__ = lazy_attributes(globals(), {
+    "llm": _create_llm,
+    "router_chain": lambda: build_router_chain(_lazy("llm")),
+    "local_router": _load_local_router,
+    "hybrid_router": lambda: build_hybrid_router(_lazy("router_chain"), _lazy("local_router"), routing_metrics),
+    "coordinator_agent": lambda: build_coordinator_agent(_lazy("hybrid_router")),
+})
+
+def get_llm():
+    """The router model, created on first use; assign routing.llm beforehand to use another one."""
+    return _lazy("llm")
+
+# Batch runner
+# Streams a JSONL file (or stdin) through coordinator_agent with bounded concurrency.
+# The checkpoint stores how many input lines are done and the output byte offset at
+# that point, so a resumed run truncates any partial window and never duplicates output.
+
+def _load_checkpoint(path: str) -> dict:
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"lines_done": 0, "output_offset": 0}
+
+def _save_checkpoint(path: str, lines_done: int, output_offset: int) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"lines_done": lines_done, "output_offset": output_offset}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _parse_request_line(line: str) -> Tuple[Optional[dict], Optional[str]]:
+    """Accepts {"request": ...} objects (extra keys such as request_id are kept) or bare JSON strings."""
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return None, f"invalid JSON: {e}"
+    if isinstance(record, str):
+        return {"request": record}, None
+    if isinstance(record, dict) and isinstance(record.get("request"), str):
+        return record, None
+    return None, "expected a JSON string or an object with a string 'request' field"
+
+def _read_windows(stream, skip: int, window: int) -> Iterator[List[Tuple[int, str]]]:
+    numbered = enumerate(stream, start=1)
+    for _ in islice(numbered, skip):
+        pass
+    while True:
+        batch = list(islice(numbered, window))
+        if not batch:
+            return
+        yield batch
+
+def _result_record(line_no: int, record: dict, result) -> dict:
+    out = {"line": line_no, "request_id": record.get("request_id")}
+    if isinstance(result, Exception):
+        out["error"] = f"{type(result).__name__}: {result}"
+    else:
+        out["result"] = result
+    return out
+
+async def run_batch(input_path: str = "-", output_path: str = "routing_results.jsonl",
+                    checkpoint_path: Optional[str] = None, concurrency: int = 16,
+                    window: int = 512, ordered: bool = True) -> dict:
+    """
+    Routes every request in input_path ('-' for stdin) and appends one JSON result per line
+    to output_path. ordered=True keeps input order within each window (abatch); ordered=False
+    writes results as they complete (abatch_as_completed). Both run at most `concurrency`
+    requests at a time and checkpoint after every window.
+    """
+    checkpoint_path = checkpoint_path or output_path + ".checkpoint"
+    state = _load_checkpoint(checkpoint_path)
+    lines_done, offset = state["lines_done"], state["output_offset"]
+    if lines_done:
+        print(f"Resuming after line {lines_done}", file=sys.stderr)
+
+    coordinator_agent = _lazy("coordinator_agent")
+    config = {"max_concurrency": concurrency}
+    counts = {"processed": 0, "failed": 0}
+    start = time.perf_counter()
+    source = sys.stdin if input_path == "-" else open(input_path)
+    out = open(output_path, "r+b" if os.path.exists(output_path) else "wb")
+
+    def write(output: dict) -> None:
+        out.write((json.dumps(output) + "\n").encode())
+        counts["processed"] += 1
+        counts["failed"] += "error" in output
+
+    try:
+        out.truncate(offset)
+        out.seek(offset)
+        for batch in _read_windows(source, lines_done, window):
+            lines, records, inputs, outputs = [], [], [], []
+            for line_no, line in batch:
+                if not line.strip():
+                    continue
+                record, error = _parse_request_line(line)
+                if error:
+                    outputs.append({"line": line_no, "error": error})
+                    continue
+                lines.append(line_no)
+                records.append(record)
+                inputs.append({"request": record["request"]})
+
+            if ordered:
+                results = await coordinator_agent.abatch(inputs, config=config, return_exceptions=True)
+                outputs += [_result_record(lines[idx], records[idx], result) for idx, result in enumerate(results)]
+                outputs.sort(key=lambda r: r["line"])
+            else:
+                async for idx, result in coordinator_agent.abatch_as_completed(inputs, config=config, return_exceptions=True):
+                    write(_result_record(lines[idx], records[idx], result))
+            for output in outputs:
+                write(output)
+
+            out.flush()
+            os.fsync(out.fileno())
+            lines_done = batch[-1][0]
+            _save_checkpoint(checkpoint_path, lines_done, out.tell())
+            elapsed = time.perf_counter() - start
+            print(f"[batch] {lines_done} lines done, {counts['processed'] / elapsed:.1f} req/s", file=sys.stderr)
+    finally:
+        out.close()
+        if source is not sys.stdin:
+            source.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "processed": counts["processed"],
+        "failed": counts["failed"],
+        "lines_done": lines_done,
+        "seconds": elapsed,
+        "requests_per_second": counts["processed"] / elapsed if elapsed else 0.0,
+        "routing": routing_metrics.summary(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Route requests through coordinator_agent.")
+    parser.add_argument("--input", help="JSONL file of requests, or '-' for stdin. Runs the demo when omitted.")
+    parser.add_argument("--output", default="routing_results.jsonl")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--window", type=int, default=512, help="Requests per abatch call / checkpoint interval")
+    parser.add_argument("--unordered", action="store_true", help="Write results as they complete")
+    args = parser.parse_args()
 
-# Demo
-print(coordinator_agent.invoke({"request": "Book me a flight to London"}))
-print(coordinator_agent.invoke({"request": "What is the capital of Italy?"}))
-print(coordinator_agent.invoke({"request": "Maybe later"}))
+    if args.input:
+        summary = asyncio.run(run_batch(args.input, args.output, args.checkpoint,
+                                        args.concurrency, args.window, not args.unordered))
+        print(json.dumps(summary, indent=2), file=sys.stderr)
+    else:
+        # Demo
+        coordinator_agent = _lazy("coordinator_agent")
+        print(coordinator_agent.invoke({"request": "Book me a flight to London"}))
+        print(coordinator_agent.invoke({"request": "What is the capital of Italy?"}))
+        print(coordinator_agent.invoke({"request": "Maybe later"}))
+        print(f"Routing metrics: {routing_metrics.summary()}")
@@ -0,0 +1,408 @@
+import re
+import json
+import math
+import time
+import asyncio
+import threading
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+
+from metrics import LatencyStats
+from model_pricing import estimate_cost, estimate_tokens
+
+# Model-selection policies for resource-optimization.py's QueryRouterAgent.
+#
+# A policy picks a model for each query and is told how the call went afterwards:
+#     decision = policy.choose(query, session_id)
+#     ... run decision.model ...
+#     policy.observe(decision, latency_s, output_tokens, ok)
+# AdaptivePolicy scores query complexity from lexical features (optionally blended
+# with a small local classifier), keeps EWMA latency and cost per model, enforces a
+# per-session budget and emits a telemetry event for every decision and result.
+# run_cascade and run_hedged are the cascade and hedged execution strategies.
+
+_MULTI_STEP = re.compile(
+    r"\b(step[- ]by[- ]step|compare|contrast|analy[sz]e|evaluate|prove|derive|design|architect|"
+    r"trade-?offs?|optimi[sz]e|plan|strategy|explain why|justify|critique|pros and cons|debug|refactor|"
+    r"implement|algorithm|complexity|implications?|why (does|do|is|are|can)|how (do|does|would|can|should) (you|i|we))\b",
+    re.IGNORECASE)
+_TRIVIAL = re.compile(
+    r"^\s*(hi|hello|hey|thanks|thank you|what is|what's|who is|who was|when (is|was|did)|where is|define|"
+    r"translate|spell|convert|how many|how much|how do you say)\b", re.IGNORECASE)
+_CODE = re.compile(r"```|\bdef |\bclass |\breturn\b|[{};]\s*$|\bSELECT\b|\w+\(\)", re.MULTILINE)
+_MATH = re.compile(r"\d\s*[-+*/^=]\s*\d|\\frac|\\sum|\bintegral\b|\bderivative\b|\bequation\b|\bmatrix\b",
+                   re.IGNORECASE)
+_CONSTRAINT = re.compile(r"\b(must|should|without|at least|at most|only if|unless|given that|assume|such that)\b",
+                         re.IGNORECASE)
+
+
+class ComplexityScorer:
+    """
+    Scores a query in [0, 1]; higher means it needs the stronger model.
+
+    Length only counts logarithmically, so a long but trivial question (a pasted
+    paragraph with "what is X?") stays low while a short "prove ..." scores high.
+    With a classifier (e.g. local_router.HashedNgramClassifier trained on
+    "simple"/"complex" labels), its probability of `label` is blended in at
+    classifier_weight.
+    """
+
+    # Hand-tuned on the "tune" split of routing_queries.jsonl only; benchmark_routing_policy.py
+    # reports accuracy on the "heldout" split, which must not be used to adjust them.
+    WEIGHTS = {"length": 0.25, "multi_step": 0.4, "code": 0.25, "math": 0.2, "constraints": 0.15,
+               "questions": 0.1, "trivial": -0.35}
+    BIAS = 0.1
+
+    def __init__(self, classifier=None, label: str = "complex", classifier_weight: float = 0.5):
+        self.classifier = classifier
+        self.label = label
+        self.classifier_weight = classifier_weight
+
+    def features(self, query: str) -> Dict[str, float]:
+        words = len(query.split())
+        return {
+            "length": min(1.0, math.log1p(words) / math.log1p(200)),
+            "multi_step": min(1.0, len(_MULTI_STEP.findall(query))),
+            "code": 1.0 if _CODE.search(query) else 0.0,
+            "math": 1.0 if _MATH.search(query) else 0.0,
+            "constraints": min(1.0, len(_CONSTRAINT.findall(query)) / 3),
+            "questions": min(1.0, max(0, query.count("?") - 1) / 3),
+            "trivial": 1.0 if _TRIVIAL.search(query) else 0.0,
+        }
+
+    def lexical_score(self, query: str) -> float:
+        features = self.features(query)
+        raw = self.BIAS + sum(self.WEIGHTS[name] * value for name, value in features.items())
+        return min(1.0, max(0.0, raw))
+
+    def score(self, query: str) -> float:
+        lexical = self.lexical_score(query)
+        if self.classifier is None:
+            return lexical
+        learned = self.classifier.predict_proba(query).get(self.label, 0.0)
+        return (1 - self.classifier_weight) * lexical + self.classifier_weight * learned
+
+
+class EWMA:
+    """Exponentially weighted moving average; `value` is None until the first update."""
+
+    def __init__(self, alpha: float = 0.2, initial: Optional[float] = None):
+        self.alpha = alpha
+        self.value = initial
+
+    def update(self, sample: float) -> float:
+        self.value = sample if self.value is None else self.alpha * sample + (1 - self.alpha) * self.value
+        return self.value
+
+
+class ModelStats:
+    def __init__(self, alpha: float = 0.2, latency_s: Optional[float] = None, output_tokens: float = 400):
+        self.latency_s = EWMA(alpha, latency_s)
+        self.cost = EWMA(alpha)
+        self.output_tokens = EWMA(alpha, output_tokens)
+        # Recent latency distribution, for percentile-based hedge delays.
+        self.recent_latency = LatencyStats(window=500)
+        self.calls = 0
+        self.errors = 0
+
+    def snapshot(self) -> dict:
+        return {"calls": self.calls, "errors": self.errors, "ewma_latency_s": self.latency_s.value,
+                "ewma_cost_usd": self.cost.value, "ewma_output_tokens": self.output_tokens.value}
+
+
+class SessionBudget:
+    def __init__(self, limit_usd: float):
+        self.limit_usd = limit_usd
+        self.spent_usd = 0.0
+
+    @property
+    def remaining_usd(self) -> float:
+        return self.limit_usd - self.spent_usd
+
+    def can_afford(self, cost_usd: float) -> bool:
+        return cost_usd <= self.remaining_usd
+
+    def charge(self, cost_usd: float) -> None:
+        self.spent_usd += cost_usd
+
+
+class RoutingTelemetry:
+    """Keeps recent routing events in memory, optionally appends them to a JSONL file and notifies listeners."""
+
+    def __init__(self, path: Optional[str] = None, maxlen: int = 10_000):
+        self.path = path
+        self.events = deque(maxlen=maxlen)
+        self.listeners: List[Callable[[dict], None]] = []
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields) -> dict:
+        record = {"ts": time.time(), "event": event, **fields}
+        with self._lock:
+            self.events.append(record)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+        for listener in self.listeners:
+            listener(record)
+        return record
+
+
+class RoutingDecision(NamedTuple):
+    model: str
+    score: float
+    reason: str
+    session_id: str
+    input_tokens: int
+    estimated_cost_usd: float
+
+
+class RoutingPolicy:
+    """Base policy: subclasses implement choose(); observe() keeps per-model stats, budgets and telemetry."""
+
+    def __init__(self, models: List[str], budget_usd: Optional[float] = None,
+                 telemetry: Optional[RoutingTelemetry] = None, alpha: float = 0.2):
+        self.models = list(models)
+        self.stats = {model: ModelStats(alpha) for model in self.models}
+        self.budget_usd = budget_usd
+        self.budgets: Dict[str, SessionBudget] = {}
+        self.telemetry = telemetry or RoutingTelemetry()
+
+    def budget(self, session_id: str) -> Optional[SessionBudget]:
+        if self.budget_usd is None:
+            return None
+        if session_id not in self.budgets:
+            self.budgets[session_id] = SessionBudget(self.budget_usd)
+        return self.budgets[session_id]
+
+    def expected_cost(self, model: str, input_tokens: int) -> float:
+        return estimate_cost(model, input_tokens, int(self.stats[model].output_tokens.value))
+
+    def _decide(self, model: str, score: float, reason: str, session_id: str, input_tokens: int) -> RoutingDecision:
+        decision = RoutingDecision(model, score, reason, session_id, input_tokens,
+                                   self.expected_cost(model, input_tokens))
+        budget = self.budget(session_id)
+        self.telemetry.emit("route", model=model, score=round(score, 3), reason=reason, session_id=session_id,
+                            estimated_cost_usd=decision.estimated_cost_usd,
+                            budget_remaining_usd=budget.remaining_usd if budget else None)
+        return decision
+
+    def choose(self, query: str, session_id: str = "default") -> RoutingDecision:
+        raise NotImplementedError
+
+    def decision_for(self, model: str, query: str, session_id: str, reason: str, score: float = 0.0) -> RoutingDecision:
+        """A decision for an explicitly chosen model, e.g. a cascade escalation or a hedge."""
+        return self._decide(model, score, reason, session_id, estimate_tokens(query))
+
+    def hedge_delay(self, model: str, q: float = 95, default: float = 5.0, min_samples: int = 20) -> float:
+        """The model's q-th percentile latency, or `default` until there are min_samples observations."""
+        stats = self.stats[model].recent_latency
+        return stats.percentile(q) if stats.count >= min_samples else default
+
+    def hedge_model(self, model: str) -> str:
+        """
+        Backup model for a hedge on `model`: the next model up self.models (ordered
+        cheapest first), or `model` itself at the top, so a hedge never trades the
+        routed model's quality for latency.
+        """
+        i = self.models.index(model)
+        return self.models[min(i + 1, len(self.models) - 1)]
+
+    def observe_cancelled(self, decision: RoutingDecision, latency_s: float) -> float:
+        """
+        Records a call cancelled mid-flight (the losing side of a hedge) and returns
+        its cost: the input tokens were sent, the output is unknown and not charged.
+        The censored latency is not fed to the latency stats.
+        """
+        cost = estimate_cost(decision.model, decision.input_tokens, 0)
+        budget = self.budget(decision.session_id)
+        if budget:
+            budget.charge(cost)
+        self.telemetry.emit("cancelled", model=decision.model, session_id=decision.session_id,
+                            latency_s=round(latency_s, 4), cost_usd=cost)
+        return cost
+
+    def observe(self, decision: RoutingDecision, latency_s: float, output_tokens: int, ok: bool = True) -> float:
+        """Records the outcome of a routed call and returns its cost in USD."""
+        stats = self.stats[decision.model]
+        stats.calls += 1
+        cost = estimate_cost(decision.model, decision.input_tokens, output_tokens)
+        if ok:
+            stats.latency_s.update(latency_s)
+            stats.recent_latency.observe(latency_s)
+            stats.output_tokens.update(output_tokens)
+            stats.cost.update(cost)
+        else:
+            stats.errors += 1
+        budget = self.budget(decision.session_id)
+        if budget:
+            budget.charge(cost)
+        self.telemetry.emit("result", model=decision.model, session_id=decision.session_id, ok=ok,
+                            latency_s=round(latency_s, 4), output_tokens=output_tokens, cost_usd=cost)
+        return cost
+
+    def snapshot(self) -> dict:
+        return {model: stats.snapshot() for model, stats in self.stats.items()}
+
+
+class WordCountPolicy(RoutingPolicy):
+    """The original rule: fewer than `threshold` words go to the cheap model."""
+
+    def __init__(self, cheap: str = "gemini-2.5-flash", strong: str = "gemini-2.5-pro", threshold: int = 20, **kwargs):
+        super().__init__([cheap, strong], **kwargs)
+        self.cheap, self.strong, self.threshold = cheap, strong, threshold
+
+    def choose(self, query: str, session_id: str = "default") -> RoutingDecision:
+        words = len(query.split())
+        model = self.cheap if words < self.threshold else self.strong
+        return self._decide(model, float(words), f"{words} words", session_id, estimate_tokens(query))
+
+
+class AdaptivePolicy(RoutingPolicy):
+    """
+    Complexity-scored routing between a cheap and a strong model.
+
+    Queries scoring at least `threshold` go to the strong model unless the session
+    budget cannot cover its expected cost, or its EWMA latency exceeds
+    latency_slo_s and the query is within `slo_margin` of the threshold. In both
+    cases the query is downgraded to the cheap model.
+    """
+
+    def __init__(self, cheap: str = "gemini-2.5-flash", strong: str = "gemini-2.5-pro", threshold: float = 0.5,
+                 scorer: Optional[ComplexityScorer] = None, latency_slo_s: Optional[float] = None,
+                 slo_margin: float = 0.15, **kwargs):
+        super().__init__([cheap, strong], **kwargs)
+        self.cheap, self.strong = cheap, strong
+        self.threshold = threshold
+        self.scorer = scorer or ComplexityScorer()
+        self.latency_slo_s = latency_slo_s
+        self.slo_margin = slo_margin
+
+    def choose(self, query: str, session_id: str = "default") -> RoutingDecision:
+        score = self.scorer.score(query)
+        input_tokens = estimate_tokens(query)
+        if score < self.threshold:
+            return self._decide(self.cheap, score, "low complexity", session_id, input_tokens)
+
+        budget = self.budget(session_id)
+        if budget and not budget.can_afford(self.expected_cost(self.strong, input_tokens)):
+            return self._decide(self.cheap, score, "session budget", session_id, input_tokens)
+        strong_latency = self.stats[self.strong].latency_s.value
+        if (self.latency_slo_s is not None and strong_latency is not None and strong_latency > self.latency_slo_s
+                and score < self.threshold + self.slo_margin):
+            return self._decide(self.cheap, score, "latency slo", session_id, input_tokens)
+        return self._decide(self.strong, score, "high complexity", session_id, input_tokens)
+
+
+# Execution strategies
+# Cascade: run the cheap model first and escalate to the strong one only when a
+# self-check rejects the answer. Hedge: start a second request when the first has
+# not finished after a delay (its model's p95), keep whichever finishes first and
+# cancel the other.
+
+T = TypeVar("T")
+
+_UNSURE = re.compile(r"\b(i'?m not sure|i do not know|i don'?t know|cannot (answer|determine)|unable to|"
+                     r"not enough information|it depends)\b", re.IGNORECASE)
+
+
+def heuristic_confidence(answer: str) -> float:
+    """Cheap self-check without an extra model call: empty, very short or hedging answers score low."""
+    if not answer.strip():
+        return 0.0
+    confidence = 0.9
+    if _UNSURE.search(answer):
+        confidence -= 0.5
+    if len(answer.split()) < 5:
+        confidence -= 0.3
+    return max(0.0, confidence)
+
+
+class ExecutionMetrics:
+    """Escalation rate, hedge fire/win rates and latency per execution mode."""
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.latency: Dict[str, LatencyStats] = defaultdict(LatencyStats)
+
+    def observe(self, mode: str, latency_s: float) -> None:
+        self.counts[mode] += 1
+        self.latency[mode].observe(latency_s)
+
+    def summary(self, baseline: str = "route") -> dict:
+        c = self.counts
+        summary = {
+            "escalation_rate": c["escalations"] / c["cascade"] if c["cascade"] else 0.0,
+            "hedge_fire_rate": c["hedges_fired"] / c["hedge"] if c["hedge"] else 0.0,
+            # Share of fired hedges where the backup request finished first.
+            "hedge_win_rate": c["hedge_wins"] / c["hedges_fired"] if c["hedges_fired"] else 0.0,
+            "latency": {mode: stats.summary() for mode, stats in self.latency.items()},
+        }
+        base = self.latency.get(baseline)
+        hedged = self.latency.get("hedge")
+        if base and hedged and base.count and hedged.count:
+            summary["hedge_tail_improvement"] = {
+                f"p{q}": 1 - hedged.percentile(q) / base.percentile(q) if base.percentile(q) else 0.0
+                for q in (95, 99)
+            }
+        return summary
+
+
+async def run_cascade(cheap: Callable[[], Awaitable[T]], strong: Callable[[], Awaitable[T]],
+                      confidence: Callable[[T], float], accept: float = 0.6,
+                      metrics: Optional[ExecutionMetrics] = None) -> Tuple[T, bool]:
+    """Returns (result, escalated). A cheap call that raises also escalates."""
+    start = time.monotonic()
+    escalated = True
+    try:
+        result = await cheap()
+        escalated = confidence(result) < accept
+    except Exception:
+        result = None
+    if escalated:
+        result = await strong()
+    if metrics is not None:
+        metrics.counts["escalations"] += escalated
+        metrics.observe("cascade", time.monotonic() - start)
+    return result, escalated
+
+
+async def run_hedged(primary: Callable[[], Awaitable[T]], backup: Callable[[], Awaitable[T]], delay_s: float,
+                     metrics: Optional[ExecutionMetrics] = None) -> Tuple[T, str]:
+    """
+    Returns (result, winner) with winner "primary" or "backup". The backup starts
+    after delay_s, or at once if the primary fails first; the slower request is
+    cancelled. Raises the last error if both fail.
+    """
+    start = time.monotonic()
+    tasks = {asyncio.ensure_future(primary()): "primary"}
+    fired = False
+    try:
+        done, _ = await asyncio.wait(set(tasks), timeout=delay_s)
+        if done and next(iter(done)).exception() is None:
+            winner_task = next(iter(done))
+        else:
+            fired = True
+            tasks[asyncio.ensure_future(backup())] = "backup"
+            pending = {task for task in tasks if not task.done()}
+            winner_task, error = None, None
+            while pending and winner_task is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner_task = task
+                        break
+                    error = task.exception()
+            if winner_task is None:
+                raise error or next(iter(tasks)).exception()
+        winner = tasks[winner_task]
+        if metrics is not None:
+            metrics.counts["hedges_fired"] += fired
+            metrics.counts["hedge_wins"] += winner == "backup"
+            metrics.observe("hedge", time.monotonic() - start)
+        return winner_task.result(), winner
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        # Let the loser run its cancellation handling (cost accounting) before returning.
+        await asyncio.gather(*pending, return_exceptions=True)
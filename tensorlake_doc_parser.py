@@ -2,7 +2,13 @@ from tensorlake.documentai import DocumentAI, ParsingOptions, ChunkingStrategy
 from tensorlake.documentai import TableOutputMode, StructuredExtractionOptions
 from pydantic import BaseModel, Field
 import os
+import time
+import asyncio
+from typing import AsyncIterator, Iterable, Optional
 from dotenv import load_dotenv
+
+from parse_cache import ParseCache, cache_key, parse_cache_from_env, result_record
+
 load_dotenv()
 tensorlake_api_key= os.getenv("TENSORLAKE_API_KEY")
 
@@ -17,9 +23,6 @@ class ResearchPaper(BaseModel):
     abstract: str = Field(description="The paper's abstract")
     sections: str = Field(description="Sections with headings and summaries")
 
-doc_ai = DocumentAI(api_key=tensorlake_api_key)
-file_id = doc_ai.upload(path="/Users/deepakmishra/git/agentic-design-pattern/1706.03762v7.pdf")
-
 
 reserach_paper_extraction = StructuredExtractionOptions(
     schema_name="research_paper",
@@ -28,18 +31,239 @@ reserach_paper_extraction = StructuredExtractionOptions(
 parsing_options = ParsingOptions(
     chunking_strategy= ChunkingStrategy.SECTION,
     table_output_mode= TableOutputMode.MARKDOWN
-    
+
 )
 
-parse_id = doc_ai.parse(
-    file= file_id,
-    parsing_options = parsing_options,
-    structured_extraction_options = reserach_paper_extraction
 
-)
+class ParseFailed(RuntimeError):
+    """A parse job ended without a successful result; nothing was cached."""
+
+
+def _status(result) -> str:
+    return getattr(result.status, "value", result.status)
+
+
+def parse_document(path: str, doc_ai=None, cache: Optional[ParseCache] = None,
+                   parsing_options: ParsingOptions = parsing_options,
+                   extraction_options: StructuredExtractionOptions = reserach_paper_extraction) -> dict:
+    """
+    Parses one document and returns {"source", "chunks", "structured_data", "cached"}.
+    With a cache, an unchanged file parsed with the same options and schema is
+    returned without uploading or parsing. Raises ParseFailed when the job fails.
+    """
+    doc_ai = doc_ai or DocumentAI(api_key=tensorlake_api_key)
+    key = None
+    if cache is not None:
+        # The backend is part of the key, so offline fake results never stand in for real ones.
+        key = cache_key(path, type(doc_ai).__name__, parsing_options, extraction_options)
+        record = cache.get(key)
+        if record is not None:
+            # The key is the file content, so the hit may have been stored for another path.
+            return {**record, "source": path, "cached": True}
+
+    file_id = doc_ai.upload(path=path)
+    parse_id = doc_ai.parse(
+        file= file_id,
+        parsing_options = parsing_options,
+        structured_extraction_options = extraction_options
+
+    )
+    # wait_for_completion returns (rather than raises) a failed result on a parse_failed
+    # event or when its retries run out; caching that would serve it as a hit forever.
+    result = doc_ai.wait_for_completion(parse_id)
+    status = _status(result)
+    if status != "successful":
+        raise ParseFailed(f"{path}: parse {status}: {getattr(result, 'error', None) or 'no result'}")
+    record = result_record(result, path)
+    if cache is not None:
+        cache.put(key, record)
+    return {**record, "cached": False}
+
+
+# Batch mode
+# Uploads run concurrently under a bounded pool, and each parse job is submitted as
+# soon as its upload finishes. One poller checks every outstanding parse_id with
+# get_parsed_result, backing off per job, instead of blocking on each document.
+# Results are yielded in completion order, so downstream embedding can start on the
+# first finished paper.
+
+_DONE_STATUSES = ("successful", "failure")
+
+
+async def parse_documents(paths: Iterable[str], doc_ai=None, cache: Optional[ParseCache] = None,
+                          upload_concurrency: int = 8, max_outstanding: int = 64,
+                          poll_interval: float = 0.5, max_poll_interval: float = 10.0,
+                          max_poll_failures: int = 5, job_timeout: float = 3600.0,
+                          parsing_options: ParsingOptions = parsing_options,
+                          extraction_options: StructuredExtractionOptions = reserach_paper_extraction
+                          ) -> AsyncIterator[dict]:
+    """
+    Yields one record per path as soon as it is ready, in completion order: the same
+    dict parse_document returns, or {"source", "error"} when an upload or parse fails.
+    At most max_outstanding documents are uploading or parsing at any time. A job is
+    given up as an error after max_poll_failures polls in a row raise (bad parse_id,
+    auth) or when it is still unfinished job_timeout seconds after submission.
+    """
+    doc_ai = doc_ai or DocumentAI(api_key=tensorlake_api_key)
+    done: asyncio.Queue = asyncio.Queue()
+    jobs = {}  # parse_id -> [path, cache key, next poll time, current poll interval, poll failures in a row, deadline]
+    new_job = asyncio.Event()
+    uploads = asyncio.Semaphore(upload_concurrency)
+    outstanding = asyncio.Semaphore(max_outstanding)
+    remaining = 0
+
+    async def submit(path: str) -> None:
+        key = None
+        try:
+            if cache is not None:
+                # Hashing a large PDF is file I/O; keep it off the event loop.
+                key = await asyncio.to_thread(cache_key, path, type(doc_ai).__name__, parsing_options,
+                                              extraction_options)
+                record = cache.get(key)
+                if record is not None:
+                    outstanding.release()
+                    done.put_nowait({**record, "source": path, "cached": True})
+                    return
+            async with uploads:
+                file_id = await doc_ai.upload_async(path)
+            parse_id = await doc_ai.parse_async(
+                file_id,
+                parsing_options=parsing_options,
+                structured_extraction_options=extraction_options,
+            )
+        except Exception as e:
+            outstanding.release()
+            done.put_nowait({"source": path, "error": f"{type(e).__name__}: {e}"})
+            return
+        now = time.monotonic()
+        jobs[parse_id] = [path, key, now + poll_interval, poll_interval, 0, now + job_timeout]
+        new_job.set()
+
+    def give_up(parse_id: str, error: str) -> None:
+        path = jobs.pop(parse_id)[0]
+        outstanding.release()
+        done.put_nowait({"source": path, "error": error})
+
+    async def check(parse_id: str) -> None:
+        path, key, _, interval, failures, deadline = jobs[parse_id]
+        try:
+            result = await doc_ai.get_parsed_result_async(parse_id)
+            failures = 0
+        except Exception as e:
+            # A transient poll error pushes the next poll back; a persistent one fails the job.
+            failures += 1
+            print(f"[parse] poll {failures}/{max_poll_failures} failed for {path}: {e}")
+            if failures >= max_poll_failures:
+                give_up(parse_id, f"polling failed {failures} times in a row: {type(e).__name__}: {e}")
+                return
+            result = None
+        status = _status(result) if result is not None else None
+        if status not in _DONE_STATUSES:
+            if time.monotonic() >= deadline:
+                give_up(parse_id, f"parse {status or 'unknown'} after {job_timeout:g}s, giving up")
+                return
+            interval = min(max_poll_interval, interval * 1.5)
+            jobs[parse_id][2:5] = [time.monotonic() + interval, interval, failures]
+            return
+        del jobs[parse_id]
+        outstanding.release()
+        if status == "failure":
+            done.put_nowait({"source": path, "error": result.error or "parse failed"})
+            return
+        record = result_record(result, path)
+        if cache is not None:
+            cache.put(key, record)
+        done.put_nowait({**record, "cached": False})
+
+    async def poller() -> None:
+        while True:
+            now = time.monotonic()
+            due = [parse_id for parse_id, job in jobs.items() if job[2] <= now]
+            if due:
+                await asyncio.gather(*(check(parse_id) for parse_id in due))
+                continue
+            wake_at = min((job[2] for job in jobs.values()), default=now + max_poll_interval)
+            new_job.clear()
+            try:
+                await asyncio.wait_for(new_job.wait(), timeout=max(0.0, wake_at - now))
+            except asyncio.TimeoutError:
+                pass
+
+    async def feeder() -> None:
+        nonlocal remaining
+        tasks = []
+        for path in paths:
+            await outstanding.acquire()
+            remaining += 1
+            tasks.append(asyncio.create_task(submit(path)))
+        await asyncio.gather(*tasks)
+
+    feeder_task = asyncio.create_task(feeder())
+    poller_task = asyncio.create_task(poller())
+    try:
+        while not (feeder_task.done() and remaining == 0):
+            getter = asyncio.ensure_future(done.get())
+            finished, _ = await asyncio.wait({getter, feeder_task} if not feeder_task.done() else {getter},
+                                             return_when=asyncio.FIRST_COMPLETED)
+            if getter not in finished:
+                getter.cancel()
+                continue
+            remaining -= 1
+            yield getter.result()
+        feeder_task.result()
+    finally:
+        for task in (feeder_task, poller_task):
+            task.cancel()
+
+
+async def _parse_all(paths, doc_ai, cache) -> None:
+    start = time.perf_counter()
+    total_chunks = 0
+    async for parsed in parse_documents(paths, doc_ai=doc_ai, cache=cache):
+        if "error" in parsed:
+            print(f"{parsed['source']}: FAILED ({parsed['error']})")
+            continue
+        total_chunks += len(parsed["chunks"])
+        print(f"{parsed['source']}: {len(parsed['chunks'])} chunks, "
+              f"{'cache hit' if parsed['cached'] else 'parsed'} at {time.perf_counter() - start:.2f}s")
+    print(f"{len(paths)} documents, {total_chunks} chunks in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parse a research paper into RAG chunks and structured data.")
+    parser.add_argument("paths", nargs="*", default=["1706.03762v7.pdf"],
+                        help="PDF files or directories of PDFs; more than one document runs in batch mode")
+    parser.add_argument("--no-cache", action="store_true", help="always upload and parse")
+    parser.add_argument("--fake", action="store_true", help="use the offline FakeDocumentAI")
+    args = parser.parse_args()
 
-result = doc_ai.wait_for_completion(parse_id)
-rag_chunks = [chunk.content for chunk in result.chunks]
-extracted_data = result.structured_data
+    if args.fake:
+        from fake_document_ai import FakeDocumentAI
+        doc_ai = FakeDocumentAI()
+    else:
+        doc_ai = DocumentAI(api_key=tensorlake_api_key)
+    cache = None if args.no_cache else parse_cache_from_env()
 
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(".pdf")))
+        else:
+            paths.append(path)
 
+    if len(paths) == 1:
+        start = time.perf_counter()
+        try:
+            parsed = parse_document(paths[0], doc_ai=doc_ai, cache=cache)
+        except ParseFailed as e:
+            raise SystemExit(f"FAILED: {e}")
+        rag_chunks = [chunk["content"] for chunk in parsed["chunks"]]
+        extracted_data = parsed["structured_data"]
+        print(f"{paths[0]}: {len(rag_chunks)} chunks, {len(extracted_data)} structured records, "
+              f"{'cache hit' if parsed['cached'] else 'parsed'} in {time.perf_counter() - start:.2f}s")
+    else:
+        asyncio.run(_parse_all(paths, doc_ai, cache))
+    if cache is not None:
+        print(cache.format_stats())
@@ -1,28 +1,39 @@
-import os, getpass
+import os
+import time
 import asyncio
-import nest_asyncio
-from typing import List
+from typing import List, Optional, TYPE_CHECKING
 from dotenv import load_dotenv
-import logging
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.tools import tool as langchain_tool
-from langchain.agents import create_tool_calling_agent, AgentExecutor
-from sympy.physics.units import temperature
+from knowledge_store import KnowledgeStore
+from lazy import lazy_attributes
+
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
+
 load_dotenv()
-google_api_key = os.getenv("GOOGLE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
-try:
+
+def _create_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     llm = ChatGoogleGenerativeAI(
         model="gemini-2.0-flash",
         temperature = 0
     )
-
     print(f"language model initialized:{llm.model}")
-except Exception as e:
-    print(f"error initializing in llm model:{e}")
-    llm = None
+    return llm
+
+#-- knowledge store, loaded once on first lookup
+KNOWLEDGE_BASE_PATH = os.getenv(
+    "KNOWLEDGE_BASE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base.jsonl"),
+)
+
+def _load_knowledge_store() -> KnowledgeStore:
+    store = KnowledgeStore.load(KNOWLEDGE_BASE_PATH)
+    print(f"knowledge store loaded: {len(store)} entries from {KNOWLEDGE_BASE_PATH}")
+    return store
 
 #-- defining tool
 
@@ -35,16 +46,9 @@ def search_information(query:str) -> str:
     :return:
     """
     print(f"\n--- Tool called: search_information with query: f'{query}' ---")
-    # Simulate a search tool with a dictionary of predefined results:
-    simulated_results = {
-        "weather in London" : "The weather in london is currently cloudy with a tem of 15 degree C",
-        "Capital of France" : "The capital of france is paris.",
-        "population of earth": "The estimatated population of earth is around 8 billion people.",
-        "tallest mountain" : "Mount everest is the tallest mountain above the sea level",
-        "default": f"Simulated search result for '{query}': No specific information found, but the topic seems interesting."
-    }
-
-    result = simulated_results.get(query.lower(), simulated_results["default"])
+    result = _lazy("knowledge_store").lookup(query)
+    if result is None:
+        result = f"Simulated search result for '{query}': No specific information found, but the topic seems interesting."
 
     print(f"--- TOOL RESULT:{result}")
     return result
@@ -53,43 +57,106 @@ tools = [search_information]
 
 # Create a tool-calling agent
 
-if llm:
-    # This prompt requires an `agent_scratchpad` placeholder for the agent's internal steps.
-    agent_prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a helpful assistant"),
-        ("human", "{input}"),
-        ("placeholder", "{agent_scratchpad}")
-    ])
+# This prompt requires an `agent_scratchpad` placeholder for the agent's internal steps.
+agent_prompt = ChatPromptTemplate.from_messages([
+    ("system", "You are a helpful assistant. When a question needs several independent lookups, "
+               "request all of the tool calls at once."),
+    ("human", "{input}"),
+    ("placeholder", "{agent_scratchpad}")
+])
+
+def build_agent_executor(model, verbose:bool=True) -> "AgentExecutor":
+    from langchain.agents import create_tool_calling_agent, AgentExecutor
 
     # create agent, binding the placeholder, tools and prompts together.
-    agent = create_tool_calling_agent(llm, tools, agent_prompt)
+    agent = create_tool_calling_agent(model, tools, agent_prompt)
     # AgentExecutor is the runtime that invokes the agent and executes the chosen tools.
-    # The 'tools' argument is not needed here as they are already bound to the agent.
-    agent_executor = AgentExecutor(agent=agent, verbose=True, tools=tools)
+    # On the async path AgentExecutor runs all tool calls from one model step concurrently.
+    return AgentExecutor(agent=agent, verbose=verbose, tools=tools)
 
-async def run_agent_with_tools(query:str):
+# llm, knowledge_store and agent_executor are created on first access, not at import.
+_lazy, __getattr__ = lazy_attributes(globals(), {
+    "llm": _create_llm,
+    "knowledge_store": _load_knowledge_store,
+    "agent_executor": lambda: build_agent_executor(_lazy("llm")),
+})
+
+def get_llm():
+    """The agent's model, created on first use; assign tool_calling.llm beforehand to use another one."""
+    return _lazy("llm")
+
+async def run_agent_with_tools(query:str) -> str:
     """
-    Invoke the agent executor with a query and prints the final response
+    Invoke the agent executor with a query, print and return the final response.
     :param query:
-    :return:
+    :return: the agent's final answer
     """
     print(f"\n--- Running agent with query:'{query}' ---")
-    try:
-        response = await agent_executor.ainvoke({"input":query})
-        print(f"\n--- Final agent response ---")
-    except Exception as e:
-        print(f"\n An error occured during agent execution: {e}")
+    response = await _lazy("agent_executor").ainvoke({"input":query})
+    output = response["output"]
+    print(f"\n--- Final agent response ---\n{output}")
+    return output
 
-async def main():
-    """ Runs all agent queries concurrently."""
-    tasks = [
-        run_agent_with_tools("What is the capital of france?"),
-        run_agent_with_tools("weather in london?"),
-        run_agent_with_tools("Tell me something about india")
-    ]
-    await asyncio.gather(*tasks)
-nest_asyncio.apply()
-asyncio.run(main())
+async def run_queries(queries:List[str], max_concurrency:int=4, timeout:float=60.0,
+                      total_timeout:Optional[float]=None) -> List[dict]:
+    """
+    Runs queries on a pool of max_concurrency workers.
+    Each query gets `timeout` seconds; when total_timeout expires the workers are cancelled
+    and every query still running or not yet started is reported as cancelled.
+    Returns one result dict per query, in input order, with query, status
+    (ok / timeout / error / cancelled), output, error and latency_s.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for index, query in enumerate(queries):
+        queue.put_nowait((index, query))
+    results: List[Optional[dict]] = [None] * len(queries)
 
+    async def worker():
+        while True:
+            try:
+                index, query = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            result = {"query": query, "status": "ok", "output": None, "error": None}
+            try:
+                result["output"] = await asyncio.wait_for(run_agent_with_tools(query), timeout)
+            except asyncio.TimeoutError:
+                result.update(status="timeout", error=f"no answer within {timeout}s")
+            except Exception as e:
+                result.update(status="error", error=f"{type(e).__name__}: {e}")
+            result["latency_s"] = time.perf_counter() - start
+            results[index] = result
 
+    workers = [asyncio.create_task(worker()) for _ in range(min(max_concurrency, len(queries)))]
+    if workers:
+        _, pending = await asyncio.wait(workers, timeout=total_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    return [
+        result if result is not None else
+        {"query": query, "status": "cancelled", "output": None, "error": "deadline exceeded", "latency_s": None}
+        for query, result in zip(queries, results)
+    ]
+
+async def main():
+    """ Runs the agent queries on a bounded worker pool and prints the structured results."""
+    try:
+        get_llm()
+    except Exception as e:
+        print(f"error initializing in llm model:{e}")
+        return
+    results = await run_queries([
+        "What is the capital of france?",
+        "weather in london?",
+        "Tell me something about india",
+    ], max_concurrency=2, timeout=60.0)
+    print("\n--- Results ---")
+    for result in results:
+        latency = f"{result['latency_s']:.2f}s" if result["latency_s"] is not None else "-"
+        print(f"[{result['status']:>9}] {latency:>7}  {result['query']} -> {result['output'] or result['error']}")
 
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,379 @@
+import os
+import json
+import time
+import atexit
+import random
+import threading
+import contextvars
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from metrics import percentile
+from model_pricing import estimate_cost
+
+# Span tracing for the pattern scripts: one span per chain / LLM call / tool /
+# retriever (LangChain) or agent / model call / tool (ADK), with wall time, queue
+# time, token usage and estimated cost. Finished traces are appended to a JSONL
+# file and can be exported as Chrome trace events (chrome://tracing, Perfetto).
+#
+# Enable for every LangChain call in a script with:
+#     TRACE_PATH=traces.jsonl TRACE_CHROME_PATH=trace.json python routing.py
+# Optional: TRACE_SAMPLE_RATE (fraction of root runs traced, default 1.0).
+# Queue time is measured when the caller puts an epoch timestamp under
+# metadata["enqueued_at"] (LangChain config) or state["enqueued_at"] (ADK session).
+
+
+class Tracer:
+    """
+    Thread-safe span store. Spans of a trace are buffered until its root span
+    ends, then written to `path` in one append; the last max_spans spans are kept
+    in memory for summary() and write_chrome_trace().
+    """
+
+    def __init__(self, path: Optional[str] = None, sample_rate: float = 1.0, max_spans: int = 100_000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.spans = deque(maxlen=max_spans)
+        self._open: Dict[Any, dict] = {}
+        self._pending: Dict[Any, List[dict]] = {}
+        self._dropped = set()
+        self._lanes = 0
+        self._lock = threading.Lock()
+
+    def start(self, key: Any, name: str, kind: str, parent_key: Any = None,
+              enqueued_at: Optional[float] = None, **attrs) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            parent = self._open.get(parent_key) if parent_key is not None else None
+            if parent is None and parent_key in self._dropped or (
+                    parent is None and self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+                self._dropped.add(key)
+                return None
+            span = {"name": name, "kind": kind, "span_id": str(key), "start": now, "thread": threading.get_ident(),
+                    **attrs}
+            if parent is None:
+                self._lanes += 1
+                span.update(trace_id=str(key), parent_id=None, lane=self._lanes)
+                self._pending[key] = []
+            else:
+                # Children share the parent's lane unless a sibling already does (parallel branches).
+                span.update(trace_id=parent["trace_id"], parent_id=parent["span_id"], _root=parent.get("_root", parent_key))
+                if parent.get("_lane_busy"):
+                    self._lanes += 1
+                    span["lane"] = self._lanes
+                else:
+                    parent["_lane_busy"] = True
+                    span["lane"], span["_parent"] = parent["lane"], parent
+            # Metadata is inherited by child runs; queue time belongs to the first span that carries it.
+            if enqueued_at and (parent is None or parent.get("_enqueued_at") != enqueued_at):
+                span["queue_s"] = round(max(0.0, now - float(enqueued_at)), 6)
+            if enqueued_at:
+                span["_enqueued_at"] = enqueued_at
+            self._open[key] = span
+            return span
+
+    def end(self, key: Any, error: Optional[BaseException] = None, **fields) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            if key in self._dropped:
+                self._dropped.discard(key)
+                return None
+            span = self._open.pop(key, None)
+            if span is None:
+                return None
+            span.update(fields)
+            span["end"] = now
+            span["wall_s"] = round(now - span["start"], 6)
+            if error is not None:
+                span["error"] = f"{type(error).__name__}: {error}"[:500]
+            model = span.get("model")
+            if model and ("input_tokens" in span or "output_tokens" in span):
+                span["cost_usd"] = estimate_cost(model, span.get("input_tokens", 0), span.get("output_tokens", 0))
+            parent = span.pop("_parent", None)
+            if parent is not None:
+                parent["_lane_busy"] = False
+            span.pop("_lane_busy", None)
+            span.pop("_enqueued_at", None)
+            root = span.pop("_root", key)
+            self.spans.append(span)
+            batch = self._pending.get(root)
+            if batch is not None:
+                batch.append(span)
+            if root != key:
+                return span
+            batch = self._pending.pop(key, [])
+        self._write(batch)
+        return span
+
+    def end_matching(self, match: Callable[[Any], bool], error: Optional[BaseException] = None) -> int:
+        """
+        Ends every open span whose key satisfies match, children before parents, so a
+        run aborted without its end callbacks still writes its trace. Returns the count.
+        """
+        with self._lock:
+            self._dropped -= {key for key in self._dropped if match(key)}
+            keys = sorted((key for key in self._open if match(key)), key=lambda k: self._open[k]["start"],
+                          reverse=True)
+        for key in keys:
+            self.end(key, error=error)
+        return len(keys)
+
+    def _write(self, batch: List[dict]) -> None:
+        if not self.path or not batch:
+            return
+        lines = "".join(json.dumps(span, default=str) + "\n" for span in batch)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(lines)
+
+    def summary(self) -> List[dict]:
+        """Per span name: count, total/p50/p95 wall time, queue time, tokens and cost, slowest first."""
+        groups: Dict[tuple, List[dict]] = {}
+        for span in list(self.spans):
+            groups.setdefault((span["kind"], span["name"]), []).append(span)
+        rows = []
+        for (kind, name), spans in groups.items():
+            walls = [s["wall_s"] for s in spans]
+            rows.append({"kind": kind, "name": name, "count": len(spans), "total_s": sum(walls),
+                         "p50_s": percentile(walls, 50), "p95_s": percentile(walls, 95),
+                         "queue_s": sum(s.get("queue_s", 0.0) for s in spans),
+                         "tokens": sum(s.get("input_tokens", 0) + s.get("output_tokens", 0) for s in spans),
+                         "cost_usd": sum(s.get("cost_usd", 0.0) for s in spans),
+                         "errors": sum(1 for s in spans if "error" in s)})
+        return sorted(rows, key=lambda r: -r["total_s"])
+
+    def format_summary(self, limit: int = 20) -> str:
+        lines = [f"{'kind':<9} {'name':<28} {'count':>5} {'total s':>8} {'p50 s':>6} {'p95 s':>6} {'queue s':>7} "
+                 f"{'tokens':>7} {'cost $':>8} {'errors':>6}"]
+        for r in self.summary()[:limit]:
+            lines.append(f"{r['kind']:<9} {r['name'][:28]:<28} {r['count']:>5} {r['total_s']:>8.2f} {r['p50_s']:>6.2f} "
+                         f"{r['p95_s']:>6.2f} {r['queue_s']:>7.2f} {r['tokens']:>7} {r['cost_usd']:>8.4f} "
+                         f"{r['errors']:>6}")
+        return "\n".join(lines)
+
+    def chrome_events(self) -> List[dict]:
+        events = []
+        for span in list(self.spans):
+            args = {k: v for k, v in span.items()
+                    if k not in ("name", "kind", "start", "end", "lane", "thread", "wall_s")}
+            events.append({"name": span["name"], "cat": span["kind"], "ph": "X", "pid": 1, "tid": span["lane"],
+                           "ts": int(span["start"] * 1e6), "dur": max(1, int(span["wall_s"] * 1e6)), "args": args})
+            if span.get("queue_s"):
+                events.append({"name": f"queued: {span['name']}", "cat": "queue", "ph": "X", "pid": 1,
+                               "tid": span["lane"], "ts": int((span["start"] - span["queue_s"]) * 1e6),
+                               "dur": max(1, int(span["queue_s"] * 1e6))})
+        return events
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.chrome_events(), "displayTimeUnit": "ms"}, f)
+
+
+# --- LangChain ---
+
+def _token_usage(response) -> tuple:
+    input_tokens = output_tokens = 0
+    for generations in response.generations or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if not (input_tokens or output_tokens):
+        usage = (response.llm_output or {}).get("token_usage") or (response.llm_output or {}).get("usage") or {}
+        input_tokens = usage.get("prompt_tokens") or usage.get("input_tokens") or 0
+        output_tokens = usage.get("completion_tokens") or usage.get("output_tokens") or 0
+    return input_tokens, output_tokens
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """LangChain callback handler feeding a Tracer; inputs and outputs are not recorded."""
+
+    run_inline = True  # bookkeeping only, no need for the callback thread pool
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+
+    @staticmethod
+    def _name(serialized, kwargs, default: str) -> str:
+        if kwargs.get("name"):
+            return kwargs["name"]
+        serialized = serialized or {}
+        return serialized.get("name") or (serialized.get("id") or [default])[-1]
+
+    def _start(self, kind: str, serialized, run_id: UUID, parent_run_id: Optional[UUID], kwargs, **attrs) -> None:
+        metadata = kwargs.get("metadata") or {}
+        self.tracer.start(run_id, self._name(serialized, kwargs, kind), kind, parent_run_id,
+                          enqueued_at=metadata.get("enqueued_at"), **attrs)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._start("chain", serialized, run_id, parent_run_id, kwargs)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self.tracer.end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self.tracer.end(run_id, error=error)
+
+    def _model(self, kwargs) -> Optional[str]:
+        params = kwargs.get("invocation_params") or {}
+        metadata = kwargs.get("metadata") or {}
+        return params.get("model_name") or params.get("model") or metadata.get("ls_model_name")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start("llm", serialized, run_id, parent_run_id, kwargs, model=self._model(kwargs))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start("llm", serialized, run_id, parent_run_id, kwargs, model=self._model(kwargs))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens, output_tokens = _token_usage(response)
+        fields = {"input_tokens": input_tokens, "output_tokens": output_tokens}
+        model = (response.llm_output or {}).get("model_name")
+        if model:
+            fields["model"] = model
+        self.tracer.end(run_id, **fields)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.tracer.end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._start("tool", serialized, run_id, parent_run_id, kwargs)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self.tracer.end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self.tracer.end(run_id, error=error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start("retriever", serialized, run_id, parent_run_id, kwargs)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self.tracer.end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self.tracer.end(run_id, error=error)
+
+
+_tracing_handler: contextvars.ContextVar[Optional[TracingCallbackHandler]] = contextvars.ContextVar(
+    "agentic_patterns_tracing", default=None)
+register_configure_hook(_tracing_handler, inheritable=True)
+
+
+# --- ADK ---
+# Callbacks that instrument_agent() appends to every agent in a tree (existing
+# callbacks keep running). Agent spans are keyed by invocation and agent name, so
+# sub-agents run concurrently (hedged or parallel) get separate spans.
+
+def _agent_key(context) -> tuple:
+    return (context.invocation_id, context.agent_name)
+
+
+def instrument_agent(agent, tracer: Tracer):
+    """Adds tracing callbacks to `agent` and all its sub-agents; returns the agent."""
+
+    def before_agent(callback_context):
+        current = callback_context._invocation_context.agent
+        parent = getattr(current, "parent_agent", None)
+        tracer.start(_agent_key(callback_context), callback_context.agent_name, "agent",
+                     (callback_context.invocation_id, parent.name) if parent is not None else None,
+                     enqueued_at=callback_context.state.get("enqueued_at"))
+
+    def after_agent(callback_context):
+        tracer.end(_agent_key(callback_context))
+
+    def before_model(callback_context, llm_request):
+        tracer.start(_agent_key(callback_context) + ("model",), llm_request.model or "model", "llm",
+                     _agent_key(callback_context), model=llm_request.model)
+
+    def after_model(callback_context, llm_response):
+        usage = llm_response.usage_metadata
+        if getattr(llm_response, "partial", False):
+            return None
+        tracer.end(_agent_key(callback_context) + ("model",),
+                   input_tokens=getattr(usage, "prompt_token_count", None) or 0,
+                   output_tokens=getattr(usage, "candidates_token_count", None) or 0)
+
+    def abort_invocation(context, error) -> None:
+        # The error callbacks run after any existing ones, so none of those recovered: the
+        # error aborts the invocation and no after_agent callback fires. End its agent
+        # spans here, or the trace is never written and its spans stay open.
+        invocation_id = context.invocation_id
+        tracer.end_matching(lambda key: isinstance(key, tuple) and key[0] == invocation_id, error=error)
+
+    def on_model_error(callback_context, llm_request, error):
+        tracer.end(_agent_key(callback_context) + ("model",), error=error)
+        abort_invocation(callback_context, error)
+
+    def before_tool(tool, args, tool_context):
+        tracer.start(_agent_key(tool_context) + ("tool", tool.name), tool.name, "tool", _agent_key(tool_context))
+
+    def after_tool(tool, args, tool_context, tool_response):
+        tracer.end(_agent_key(tool_context) + ("tool", tool.name))
+
+    def on_tool_error(tool, args, tool_context, error):
+        tracer.end(_agent_key(tool_context) + ("tool", tool.name), error=error)
+        abort_invocation(tool_context, error)
+
+    def add(target, field: str, callback) -> None:
+        if field not in type(target).model_fields:
+            return
+        existing = getattr(target, field)
+        callbacks = existing if isinstance(existing, list) else [existing] if existing else []
+        setattr(target, field, callbacks + [callback])
+
+    def visit(node) -> None:
+        add(node, "before_agent_callback", before_agent)
+        add(node, "after_agent_callback", after_agent)
+        add(node, "before_model_callback", before_model)
+        add(node, "after_model_callback", after_model)
+        add(node, "on_model_error_callback", on_model_error)
+        add(node, "before_tool_callback", before_tool)
+        add(node, "after_tool_callback", after_tool)
+        add(node, "on_tool_error_callback", on_tool_error)
+        for child in node.sub_agents:
+            visit(child)
+
+    visit(agent)
+    return agent
+
+
+# --- Setup ---
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def enable_tracing(path: Optional[str] = "traces.jsonl", chrome_path: Optional[str] = None,
+                   sample_rate: float = 1.0, report_on_exit: bool = True) -> Tracer:
+    """Traces every LangChain run in this process (and its threads/tasks) with a new Tracer."""
+    global _tracer
+    _tracer = Tracer(path, sample_rate=sample_rate)
+    _tracing_handler.set(TracingCallbackHandler(_tracer))
+    tracer = _tracer
+
+    def finish():
+        if chrome_path and tracer.spans:
+            tracer.write_chrome_trace(chrome_path)
+        if report_on_exit and tracer.spans:
+            print(tracer.format_summary())
+
+    atexit.register(finish)
+    return tracer
+
+
+def enable_tracing_from_env() -> Optional[Tracer]:
+    """Enables tracing when TRACE_PATH or TRACE_CHROME_PATH is set; a no-op otherwise."""
+    path = os.getenv("TRACE_PATH")
+    chrome_path = os.getenv("TRACE_CHROME_PATH")
+    if not (path or chrome_path):
+        return None
+    return enable_tracing(path, chrome_path, sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")))